@@ -2,8 +2,12 @@ from __future__ import absolute_import
 import sys
 import os
 import time
+import bisect
+import mmap
 
-from ..utils import serverfiles
+import numpy
+
+from ..utils import serverfiles, snapshot
 
 from .. import taxonomy as obiTaxonomy
 from .. import kegg as obiKEGG
@@ -81,6 +85,37 @@ class GeneHistory(object):
             setattr(self, attr, value)
 
 
+def _gene_info_index(fname):
+    """
+    Return lists of gene ids and byte offsets of their lines in a gene
+    info file. The index is saved to a snapshot next to the file and
+    rebuilt when the file changes.
+    """
+    version = "%d_%d" % (int(os.path.getmtime(fname)), os.path.getsize(fname))
+    path = fname + ".index"
+    try:
+        arrays, _ = snapshot.load(path, version=version)
+    except (IOError, OSError, ValueError, KeyError):
+        ids, offsets = [], []
+        offset = 0
+        with open(fname, "rb") as f:
+            for line in f:
+                if line.strip() and not line.startswith(b"#"):
+                    gene_id = line.split(b"\t", 2)[1]
+                    if not isinstance(gene_id, str):
+                        gene_id = gene_id.decode("utf-8")
+                    ids.append(gene_id)
+                    offsets.append(offset)
+                offset += len(line)
+        arrays = snapshot.StringPool.from_strings(ids).arrays("ids")
+        arrays["offsets"] = numpy.array(offsets, dtype=numpy.int64)
+        try:
+            snapshot.save(path, arrays, version)
+        except (IOError, OSError):
+            pass #use the index without saving it
+    ids = snapshot.StringPool.from_arrays(arrays, "ids").tolist()
+    return ids, arrays["offsets"].tolist()
+
 class NCBIGeneInfo(dict):
     TAX_MAP = {
             "2104": "272634",  # Mycoplasma pneumoniae
@@ -88,11 +123,20 @@ class NCBIGeneInfo(dict):
             "5833": "36329",  # Plasmodium falciparum
             "4932": "559292",  # Saccharomyces cerevisiae
             }
-       
-    def __init__(self, organism, genematcher=None):
+
+
+    #default gene matchers (with gene ids as targets) of indexed gene infos
+    _matchers = {}
+
+    def __init__(self, organism, genematcher=None, indexed=False):
         """ An dictionary like object for accessing NCBI gene info
         Arguments::
                 - *organism*    Organism id
+                - *indexed*     If True, load only gene ids and offsets of
+                                their lines (from an index saved next to the
+                                gene info file) and read gene info lazily.
+                                The default gene matcher is shared between
+                                indexed gene infos of the same organism.
 
         Example::
             >>> info = NCBIGeneInfo("Homo sapiens")
@@ -102,8 +146,19 @@ class NCBIGeneInfo(dict):
 
 
         fname = serverfiles.localpath_download("NCBI_geneinfo", "gene_info.%s.db" % self.taxid)
-        file = open(fname, "rt")
-        self.update(dict([(line.split("\t", 3)[1], line) for line in file.read().splitlines() if line.strip() and not line.startswith("#")]))
+        self._fname = fname
+        self._mmap = None
+        if indexed:
+            ids, offsets = _gene_info_index(fname)
+            self.update(zip(ids, offsets))
+        else:
+            file = open(fname, "rt")
+            self.update(dict([(line.split("\t", 3)[1], line) for line in file.read().splitlines() if line.strip() and not line.startswith("#")]))
+
+        matcherkey = (self.taxid, os.path.getmtime(fname), len(self)) if indexed and genematcher == None else None
+        if matcherkey in self._matchers:
+            self.matcher = self._matchers[matcherkey]
+            return
 
         self.matcher = genematcher
         if self.matcher == None:
@@ -114,6 +169,26 @@ class NCBIGeneInfo(dict):
 
         #if this is done with a gene matcher, pool target names
         self.matcher.set_targets(self.keys())
+        if matcherkey != None:
+            self._matchers[matcherkey] = self.matcher
+
+    def _line(self, value):
+        """ Return a gene info line (values of indexed infos are offsets). """
+        if isinstance(value, basestring):
+            return value
+        if self._mmap is None:
+            with open(self._fname, "rb") as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        end = self._mmap.find(b"\n", value)
+        line = self._mmap[value:end if end >= 0 else len(self._mmap)].rstrip(b"\r")
+        if not isinstance(line, str):
+            line = line.decode("utf-8")
+        return line
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state["_mmap"] = None
+        return state
         
     def history(self):
         if getattr(self, "_history", None) is None:
@@ -177,7 +252,7 @@ class NCBIGeneInfo(dict):
 
     def __getitem__(self, key):
 #        return self.get(gene_id, self.matcher[gene_id])
-        return GeneInfo(dict.__getitem__(self, key))
+        return GeneInfo(self._line(dict.__getitem__(self, key)))
 
     def __setitem__(self, key, value):
         if type(value) == str:
@@ -193,7 +268,7 @@ class NCBIGeneInfo(dict):
 
     def itervalues(self):
         for val in dict.itervalues(self):
-            yield GeneInfo(val)
+            yield GeneInfo(self._line(val))
 
     def iteritems(self):
         for key, val in zip(self.iterkeys(), self.itervalues()):
@@ -207,10 +282,10 @@ class NCBIGeneInfo(dict):
             return list(self.iteritems())
     else:
         def values(self):
-            return map(GeneInfo, super().values())
+            return (GeneInfo(self._line(value)) for value in super().values())
 
         def items(self):
-            return ((key, GeneInfo(value)) for key, value in super().items())
+            return ((key, GeneInfo(self._line(value))) for key, value in super().items())
 
     @staticmethod
     def get_geneinfo_from_ncbi(file, progressCallback=None):
@@ -386,6 +461,104 @@ def create_mapping(groups, lower=False):
 
     return togroup
 
+def _ranges(starts, lengths):
+    """ Concatenated ranges of given starts and lengths. """
+    ends = numpy.cumsum(lengths)
+    total = int(ends[-1]) if len(ends) else 0
+    return numpy.repeat(starts - ends + lengths, lengths) + \
+        numpy.arange(total)
+
+def _intern_sets(lsets, lower=False):
+    """
+    Replace aliases in lists of groups of aliases with integer ids.
+
+    Return a tuple of a list of (unique) aliases, an array of keys for
+    comparing the aliases (ids of their lower case forms if lower is True)
+    and (indptr, indices) CSR arrays of alias ids of groups of each list.
+    """
+    ids = {}
+    interned = []
+    for groups in lsets:
+        groups = list(groups)
+        indptr = numpy.zeros(len(groups) + 1, dtype=numpy.int64)
+        numpy.cumsum([ len(g) for g in groups ], out=indptr[1:])
+        indices = numpy.fromiter(
+            (ids.setdefault(a, len(ids)) for g in groups for a in g),
+            dtype=numpy.int64, count=int(indptr[-1]))
+        interned.append((indptr, indices))
+    aliases = [None] * len(ids)
+    for alias, i in ids.items():
+        aliases[i] = alias
+    if lower:
+        keyids = {}
+        keys = numpy.fromiter(
+            (keyids.setdefault(a.lower(), len(keyids)) for a in aliases),
+            dtype=numpy.int64, count=len(aliases))
+    else:
+        keys = numpy.arange(len(aliases))
+    return aliases, keys, interned
+
+def _join_ids(set1, set2, keys):
+    """
+    join_sets on CSR arrays of alias ids (see _intern_sets), where
+    aliases are compared by their keys.
+    """
+    (indptr1, indices1), (indptr2, indices2) = set1, set2
+    len1, len2 = numpy.diff(indptr1), numpy.diff(indptr2)
+    n1 = len(len1)
+
+    #pairs of groups (from set1, from set2) sharing a key, ordered as
+    #in join_sets: by groups from set2, then by groups from set1
+    groups1 = numpy.repeat(numpy.arange(n1), len1)
+    keys1 = keys[indices1]
+    order = numpy.lexsort((groups1, keys1))
+    keys1, groups1 = keys1[order], groups1[order]
+    keys2 = keys[indices2]
+    left = numpy.searchsorted(keys1, keys2, side="left")
+    counts = numpy.searchsorted(keys1, keys2, side="right") - left
+    pairs = numpy.unique(
+        numpy.repeat(numpy.repeat(numpy.arange(len(len2)), len2), counts) * n1
+        + groups1[_ranges(left, counts)])
+    x, y = (pairs % n1, pairs // n1) if n1 else (pairs, pairs)
+
+    #unions of aliases of paired groups
+    npairs = len(pairs)
+    members = numpy.concatenate(
+        (indices1[_ranges(indptr1[x], len1[x])],
+         indices2[_ranges(indptr2[y], len2[y])]))
+    owners = numpy.concatenate(
+        (numpy.repeat(numpy.arange(npairs), len1[x]),
+         numpy.repeat(numpy.arange(npairs), len2[y])))
+    union = numpy.unique(owners * len(keys) + members)
+    lengths = [ numpy.bincount(union // len(keys), minlength=npairs) ]
+    parts = [ union % len(keys) ]
+
+    #add groups without matches (from both sets)
+    for indptr, indices, lens, used in ((indptr1, indices1, len1, x),
+                                        (indptr2, indices2, len2, y)):
+        unused = numpy.ones(len(lens), dtype=bool)
+        unused[used] = False
+        unused = numpy.flatnonzero(unused)
+        lengths.append(lens[unused])
+        parts.append(indices[_ranges(indptr[unused], lens[unused])])
+
+    lengths = numpy.concatenate(lengths)
+    indptr = numpy.zeros(len(lengths) + 1, dtype=numpy.int64)
+    numpy.cumsum(lengths, out=indptr[1:])
+    return indptr, numpy.concatenate(parts)
+
+def _join_interned(lsets, lower=False):
+    """
+    Join multiple gene set mappings (see join_sets_l) and return them
+    as _AliasGroups.
+    """
+    aliases, keys, interned = _intern_sets(lsets, lower=lower)
+    current = interned[0]
+    for b in interned[1:]:
+        current = _join_ids(current, b, keys)
+    indptr, indices = current
+    return _AliasGroups(aliases, indptr, indices.astype(numpy.int32))
+
 def join_sets(set1, set2, lower=False):
     """ 
     Joins two sets of gene set mappings. If lower is True, lower case
@@ -398,54 +571,124 @@ def join_sets(set1, set2, lower=False):
 
     The operation both commutative and associative.
     """
+    return join_sets_l([set1, set2], lower=lower)
+ 
+def join_sets_l(lsets, lower=False):
+    """
+    Joins multiple gene set mappings as successive join_sets calls would.
+    Aliases are replaced with integer ids once for all mappings.
+    """
+    return list(_join_interned(lsets, lower=lower))
 
-    set1 = [ set(a) for a in set1 ]
-    set2 = [ set(a) for a in set2 ]
+class _AliasGroups(object):
+    """
+    A compact, immutable list of sets of aliases: unique aliases (a list
+    or a snapshot.StringPool) and a CSR array of alias indices of each
+    group.
+    """
 
-    currentmap = create_mapping(set1, lower=lower)
+    def __init__(self, aliases, indptr, indices):
+        self.aliases = aliases
+        self.indptr = indptr
+        self.indices = indices
 
-    new = [] #new groups
+    def __len__(self):
+        return len(self.indptr) - 1
 
-    #remember used to find unused
-    set1used = set() 
-    set2used = set()
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        aliases = self.aliases
+        return set([ aliases[a] for a in
+                     self.indices[self.indptr[i]:self.indptr[i+1]].tolist() ])
 
-    fn = lambda x: x
-    if lower:
-        fn = lambda x: x.lower()
+    def __iter__(self):
+        aliases = self.aliases
+        if not isinstance(aliases, list):
+            aliases = aliases.tolist()
+        indices = self.indices.tolist()
+        indptr = self.indptr.tolist()
+        for start, end in zip(indptr[:-1], indptr[1:]):
+            yield set([ aliases[a] for a in indices[start:end] ])
+
+class _AliasIndex(object):
+    """
+    Groups of aliases (_AliasGroups) with a sorted table of alias keys
+    (aliases, in lower case if ignoring case) mapped to group ids.
 
-    for i, group in enumerate(set2):
+    It can be used as a mapping of matchers (see create_mapping).
+    All data is held in arrays, which can be saved to a snapshot and
+    memory mapped when loaded, so processes share it read-only.
+    """
 
-        #find groups of aliases (from set1)  intersecting with a current
-        #group from set2
-        cross = reduce(set.union, 
-            [ currentmap[fn(alias)] for alias in group if fn(alias) in currentmap], set())
+    def __init__(self, groups, keys, key_indptr, key_groups):
+        self.groups = groups
+        self.keys = keys
+        self.key_indptr = key_indptr
+        self.key_groups = key_groups
 
-        for c in cross:
-            #print c, group & set1[c], group, set1[c]
-            set1used.add(c)
-            set2used.add(i)
-            new.append(group | set1[c]) #add a union
+    @classmethod
+    def build(cls, groups, lower=False):
+        aliases, _, [(indptr, indices)] = _intern_sets([groups])
+        akeys = [ a.lower() for a in aliases ] if lower else aliases
+        keys = sorted(set(akeys))
+        rank = dict((k, i) for i, k in enumerate(keys))
+        akeys = numpy.array([ rank[k] for k in akeys ], dtype=numpy.int64)
+        ngroups = len(indptr) - 1
+        pairs = numpy.unique(
+            akeys[indices] * ngroups +
+            numpy.repeat(numpy.arange(ngroups), numpy.diff(indptr)))
+        key_indptr = numpy.zeros(len(keys) + 1, dtype=numpy.int64)
+        numpy.cumsum(numpy.bincount(pairs // max(ngroups, 1),
+                                    minlength=len(keys)),
+                     out=key_indptr[1:])
+        groups = _AliasGroups(snapshot.StringPool.from_strings(aliases),
+                              indptr, indices.astype(numpy.int32))
+        return cls(groups, snapshot.StringPool.from_strings(keys),
+                   key_indptr, (pairs % max(ngroups, 1)).astype(numpy.int32))
+
+    def arrays(self):
+        """Return a dict of arrays for saving the index."""
+        arrays = {"indptr": self.groups.indptr,
+                  "indices": self.groups.indices,
+                  "key_indptr": self.key_indptr,
+                  "key_groups": self.key_groups}
+        arrays.update(self.groups.aliases.arrays("aliases"))
+        arrays.update(self.keys.arrays("keys"))
+        return arrays
 
-    #add groups without matches (from both sets)
-    set1add = set(range(len(set1))) - set1used
-    set2add = set(range(len(set2))) - set2used
+    @classmethod
+    def from_arrays(cls, arrays):
+        groups = _AliasGroups(
+            snapshot.StringPool.from_arrays(arrays, "aliases"),
+            arrays["indptr"], arrays["indices"])
+        return cls(groups, snapshot.StringPool.from_arrays(arrays, "keys"),
+                   arrays["key_indptr"], arrays["key_groups"])
+
+    def _find(self, key):
+        i = bisect.bisect_left(self.keys, key)
+        if i < len(self.keys) and self.keys[i] == key:
+            return i
+        return None
 
-    for a in set1add:
-        new.append(set1[a])
-    for a in set2add:
-        new.append(set2[a])
+    def __len__(self):
+        return len(self.keys)
 
-    return new
- 
-def join_sets_l(lsets, lower=False):
-    """
-    Joins multiple gene set mappings using join_sets function.
-    """
-    current = lsets[0]
-    for b in lsets[1:]:
-        current = join_sets(current, b, lower=lower)
-    return current
+    def __contains__(self, key):
+        return self._find(key) is not None
+
+    def _groups(self, i):
+        return set(self.key_groups[self.key_indptr[i]:
+                                   self.key_indptr[i+1]].tolist())
+
+    def __getitem__(self, key):
+        """ Return a set of ids of groups containing the key. """
+        i = self._find(key)
+        return set() if i is None else self._groups(i)
+
+    def get(self, key, default=None):
+        i = self._find(key)
+        return default if i is None else self._groups(i)
 
 class Matcher(object):
     """
@@ -472,6 +715,10 @@ class Matcher(object):
         mat = self.match(gene)
         return mat[0] if len(mat) == 1 else None
 
+    def match_many(self, genes):
+        """Return a list of matches (see :obj:`match`) for each input gene."""
+        return [ self.match(gene) for gene in genes ]
+
     def explain(self, gene):
         """ 
         Return gene matches with explanations as lists of tuples:
@@ -564,9 +811,11 @@ class MatcherAliases(Matcher):
         self.matcho = mo #backward compatibility - default match object
         return mo
 
-    #this two functions are solely for backward compatibility
+    #these functions are solely for backward compatibility
     def match(self, gene):
         return self.matcho.match(gene)
+    def match_many(self, genes):
+        return self.matcho.match_many(genes)
     def explain(self, gene):
         return self.matcho.explain(gene)
 
@@ -576,12 +825,41 @@ class Match(object):
         """Returns an unique (only one matching target) target or None"""
         mat = self.match(gene)
         return mat[0] if len(mat) == 1 else None
+
+    def match_many(self, genes):
+        """Returns a list of matches for each input gene"""
+        return [ self.match(gene) for gene in genes ]
  
 class MatchAliases(Match):
 
     def __init__(self, to_targets, parent):
         self.to_targets = to_targets
         self.parent = parent
+        self.ignore_case = parent.ignore_case
+        self.direct = self._direct_table()
+
+    def _direct_table(self):
+        """
+        Map each alias of sets of aliases containing targets (in lower
+        case if ignoring case) to a tuple of matching targets.
+        """
+        aliases = self.parent.aliases
+        table = defaultdict(list)
+        for igid in sorted(self.to_targets):
+            targets = self.to_targets[igid]
+            for alias in aliases[igid]:
+                if self.ignore_case:
+                    alias = alias.lower()
+                table[alias].extend(targets)
+        direct = {}
+        for alias, targets in table.items():
+            if len(targets) > 1:
+                #remove duplicates, preserving order
+                seen = set()
+                targets = [ t for t in targets
+                            if not (t in seen or seen.add(t)) ]
+            direct[alias] = tuple(targets)
+        return direct
 
     def match(self, gene):
         """
@@ -589,11 +867,21 @@ class MatchAliases(Match):
         it. Target genes from the same sets of aliases are returned
         as input's match.
         """
-        inputgeneids = self.parent.to_ids(gene)
-        #return target genes with same ids
-        return list(set( \
-            reduce(lambda x,y: x+y, 
-                [ self.to_targets[igid] for igid in inputgeneids ], [])))
+        if self.ignore_case:
+            gene = gene.lower()
+        return list(self.direct.get(gene, ()))
+
+    def umatch(self, gene):
+        if self.ignore_case:
+            gene = gene.lower()
+        mat = self.direct.get(gene, ())
+        return mat[0] if len(mat) == 1 else None
+
+    def match_many(self, genes):
+        get = self.direct.get
+        if self.ignore_case:
+            return [ list(get(gene.lower(), ())) for gene in genes ]
+        return [ list(get(gene, ())) for gene in genes ]
 
     def explain(self, gene):
         inputgeneids = self.parent.to_ids(gene)
@@ -616,7 +904,7 @@ class MatcherAliasesPickled(MatcherAliases):
 
     def get_aliases(self):
         if not self.saved_aliases: #loads aliases if not loaded
-            self.aliases = self.load_aliases()
+            self._load()
         #print "size of aliases ", len(self.saved_aliases)
         return self.saved_aliases
 
@@ -625,7 +913,10 @@ class MatcherAliasesPickled(MatcherAliases):
     def get_mdict(self):
         """ Creates mdict. Aliases are loaded if needed. """
         if not self.saved_mdict:
-            self.saved_mdict = create_mapping(self.aliases, self.ignore_case)
+            if not self.saved_aliases:
+                self._load()
+            if not self.saved_mdict:
+                self.saved_mdict = create_mapping(self.aliases, self.ignore_case)
         return self.saved_mdict
 
     def set_mdict(self, mdict):
@@ -648,15 +939,58 @@ class MatcherAliasesPickled(MatcherAliases):
         """ Returns gene aliases. """
         notImplemented()
 
+    def _load(self):
+        index = self.load_index()
+        if index is not None:
+            self.saved_aliases = index.groups
+            self.saved_mdict = index
+        else:
+            self.aliases = self.load_aliases()
+
+    def index_path(self):
+        """
+        Returns path of the alias index snapshot or None if aliases
+        can not be saved.
+        """
+        fn = self.filename()
+        if fn == None or isinstance(fn, tuple):
+            return None
+        return os.path.join(buffer_path(),
+            fn + ("_ic" if self.ignore_case else "") + ".aliases")
+
+    def load_index(self):
+        """
+        Returns an index of aliases (with keys for the matcher's
+        ignore_case) memory mapped from a snapshot, which is created
+        if it does not exist or its version differs from
+        create_aliases_version. If the snapshot can not be written,
+        the index is kept in memory. Returns None if aliases can not be
+        saved (the matcher has no file name for them).
+        """
+        path = self.index_path()
+        if path == None:
+            return None
+        ver = self.create_aliases_version() #if version == None ignore it
+        try:
+            arrays, _ = snapshot.load(path, version=ver)
+        except (IOError, OSError, ValueError, KeyError):
+            arrays = _AliasIndex.build(self.create_aliases(),
+                                       lower=self.ignore_case).arrays()
+            try:
+                snapshot.save(path, arrays, ver)
+                arrays, _ = snapshot.load(path, version=ver)
+            except (IOError, OSError, ValueError):
+                pass #use the index without saving it
+        return _AliasIndex.from_arrays(arrays)
+
     def load_aliases(self):
+        index = self.load_index()
+        if index is not None:
+            return index.groups
         fn = self.filename()
         ver = self.create_aliases_version() #if version == None ignore it
-        if fn != None:
-            if isinstance(fn, tuple): #if you pass tuple, look directly
-               filename = fn[0]
-            else:
-               filename = os.path.join(buffer_path(), fn)
-            return auto_pickle(filename, ver, self.create_aliases)
+        if isinstance(fn, tuple): #if you pass tuple, look directly
+            return auto_pickle(fn[0], ver, self.create_aliases)
         else:
             #if either file version of version is None, do not pickle
             return self.create_aliases()
@@ -859,11 +1193,12 @@ class MatcherAliasesPickledJoined(MatcherAliasesPickled):
             return None
 
     def create_aliases(self):
-        return join_sets_l([ mat.aliases for mat in self.matchers ], lower=self.ignore_case)
+        return _join_interned([ mat.aliases for mat in self.matchers ],
+                              lower=self.ignore_case)
 
     def create_aliases_version(self):
         try:
-            return "v4_" + "__".join([ mat.create_aliases_version() for mat in self.matchers ])
+            return "v5_" + "__".join([ mat.create_aliases_version() for mat in self.matchers ])
         except:
             return None
 
@@ -903,10 +1238,13 @@ class MatcherSequence(Matcher):
         self.matcho = om
         return om
 
-    #this two functions are solely for backward compatibility
+    #these functions are solely for backward compatibility
     def match(self, gene):
         return self.matcho.match(gene)
 
+    def match_many(self, genes):
+        return self.matcho.match_many(genes)
+
     def explain(self, gene):
         return self.matcho.explain(gene)
 
@@ -914,14 +1252,46 @@ class MatchSequence(Match):
 
     def __init__(self, ms):
         self.ms = ms
+        self.direct = None
+        self.ignore_case = None
+        #merge direct lookup tables of matches if they normalize genes
+        #in the same way: the first match containing a gene wins
+        ignore_case = set(getattr(match, "ignore_case", None) for match in ms)
+        if ms and all(isinstance(match, (MatchAliases, MatchSequence))
+                      and match.direct is not None for match in ms) \
+                and len(ignore_case) == 1:
+            self.ignore_case = ignore_case.pop()
+            self.direct = {}
+            for match in reversed(ms):
+                self.direct.update(match.direct)
 
     def match(self, gene):
+        if self.direct is not None:
+            if self.ignore_case:
+                gene = gene.lower()
+            return list(self.direct.get(gene, ()))
         for match in self.ms:
             m = match.match(gene)
             if m: 
                 return m
         return []
 
+    def umatch(self, gene):
+        if self.direct is None:
+            return Match.umatch(self, gene)
+        if self.ignore_case:
+            gene = gene.lower()
+        mat = self.direct.get(gene, ())
+        return mat[0] if len(mat) == 1 else None
+
+    def match_many(self, genes):
+        if self.direct is None:
+            return Match.match_many(self, genes)
+        get = self.direct.get
+        if self.ignore_case:
+            return [ list(get(gene.lower(), ())) for gene in genes ]
+        return [ list(get(gene, ())) for gene in genes ]
+
     def explain(self, gene):
         for match in self.ms:
             m = match.match(gene)
@@ -945,9 +1315,11 @@ class MatcherDirect(Matcher):
         self.matcho = self.am.set_targets(targets)
         return self.matcho
 
-    #this two functions are solely for backward compatibility
+    #these functions are solely for backward compatibility
     def match(self, gene):
         return self.matcho.match(gene)
+    def match_many(self, genes):
+        return self.matcho.match_many(genes)
     def explain(self, gene):
         return self.matcho.explain(gene)
 
@@ -2,17 +2,17 @@ from __future__ import absolute_import
 
 import sys, os
 import shutil
+import threading
+from collections import defaultdict
 
 try:
     from urllib2 import urlopen
 except ImportError:
     from urllib.request import urlopen
 
-from functools import reduce
-
-from collections import defaultdict
+import numpy
 
-from ..utils import serverfiles
+from ..utils import serverfiles, snapshot
 
 class _homolog(object):
     __slots__ = ["group_id", "taxonomy_id", "gene_id", "gene_symbol"]
@@ -39,7 +39,136 @@ class _Homologs(object):
         """
         homologs = dict(self.homologs(gene, taxid))
         return homologs.get(homolotaxid, None)
-    
+
+    def homologs_many(self, genes, taxid, homolotaxid):
+        """ Return a list of homologs (or None) of genes from organism with *taxid* in organism with *homolotaxid*
+        """
+        return [self.homolog(gene, taxid, homolotaxid) for gene in genes]
+
+
+class _HomologIndex(object):
+    """ HomoloGene records (unique by taxonomy id and gene symbol) in
+    arrays ordered by taxonomy id, with record ids of members of each
+    homolog group (in file order). It is saved as a snapshot next to the
+    data file.
+    """
+    def __init__(self, arrays):
+        self.taxids = snapshot.StringPool.from_arrays(arrays, "taxids").tolist()
+        self.taxid_indptr = arrays["taxid_indptr"]
+        self.symbols = snapshot.StringPool.from_arrays(arrays, "symbols")
+        self.gene_ids = snapshot.StringPool.from_arrays(arrays, "gene_ids")
+        self.groups = snapshot.StringPool.from_arrays(arrays, "groups")
+        self.record_group = arrays["record_group"]
+        self.record_taxid = numpy.repeat(numpy.arange(len(self.taxids)),
+                                         numpy.diff(self.taxid_indptr))
+        self.group_indptr = arrays["group_indptr"]
+        self.group_members = arrays["group_members"]
+        self._symbol_index = {}
+        self._group_targets = {}
+
+    @classmethod
+    def load(cls, path):
+        """ Load the index of a homologene.data file, (re)building it if
+        it does not exist or the file changed.
+        """
+        version = "%d_%d" % (int(os.path.getmtime(path)), os.path.getsize(path))
+        index_path = path + ".index"
+        try:
+            arrays, _ = snapshot.load(index_path, version=version)
+        except (IOError, OSError, ValueError, KeyError):
+            arrays = cls.compile(path)
+            try:
+                snapshot.save(index_path, arrays, version)
+            except (IOError, OSError):
+                pass #use the index without saving it
+        return cls(arrays)
+
+    @staticmethod
+    def compile(path):
+        """ Parse a homologene.data file into a dict of arrays.
+        """
+        lines = open(path, "rt").read().splitlines()[:-1]
+        #a later record with the same taxid and symbol replaces the earlier
+        positions = {}
+        records = []
+        for line in lines:
+            group_id, taxid, gene_id, symbol = line.split("\t")[:4]
+            key = (taxid, symbol)
+            if key in positions:
+                records[positions[key]] = (group_id, taxid, gene_id, symbol)
+            else:
+                positions[key] = len(records)
+                records.append((group_id, taxid, gene_id, symbol))
+        group_ids, taxids, gene_ids, symbols = \
+            zip(*records) if records else ((), (), (), ())
+
+        utaxids = sorted(set(taxids))
+        taxid_codes = numpy.searchsorted(utaxids, taxids) if records else \
+            numpy.zeros(0, dtype=int)
+        order = numpy.argsort(taxid_codes, kind="mergesort")
+        ugroups = sorted(set(group_ids))
+        group_codes = numpy.searchsorted(ugroups, group_ids) if records else \
+            numpy.zeros(0, dtype=int)
+
+        #record ids (ordered by taxid) of group members in file order
+        record_ids = numpy.empty(len(records), dtype=numpy.int64)
+        record_ids[order] = numpy.arange(len(records))
+        members = numpy.argsort(group_codes, kind="mergesort")
+
+        arrays = {
+            "taxid_indptr": numpy.concatenate(
+                ([0], numpy.cumsum(numpy.bincount(taxid_codes, minlength=len(utaxids))))),
+            "record_group": group_codes[order].astype(numpy.int32),
+            "group_indptr": numpy.concatenate(
+                ([0], numpy.cumsum(numpy.bincount(group_codes, minlength=len(ugroups))))),
+            "group_members": record_ids[members].astype(numpy.int32),
+        }
+        order = order.tolist()
+        for name, values in [("taxids", utaxids), ("groups", ugroups),
+                             ("symbols", [symbols[i] for i in order]),
+                             ("gene_ids", [gene_ids[i] for i in order])]:
+            arrays.update(snapshot.StringPool.from_strings(values).arrays(name))
+        return arrays
+
+    def taxid_records(self, taxid):
+        """ Return the range of records of the organism.
+        """
+        try:
+            i = self.taxids.index(taxid)
+        except ValueError:
+            return 0, 0
+        return int(self.taxid_indptr[i]), int(self.taxid_indptr[i + 1])
+
+    def symbol_index(self, taxid):
+        """ Return a dict of record ids of gene symbols of the organism.
+        """
+        if taxid not in self._symbol_index:
+            start, end = self.taxid_records(taxid)
+            symbols = [self.symbols[i] for i in range(start, end)]
+            self._symbol_index[taxid] = dict(zip(symbols, range(start, end)))
+        return self._symbol_index[taxid]
+
+    def members(self, record):
+        """ Return record ids of members of the record's group.
+        """
+        group = self.record_group[record]
+        return self.group_members[self.group_indptr[group]:self.group_indptr[group + 1]].tolist()
+
+    def group_targets(self, taxid):
+        """ Return an array with the (last) record id of the organism
+        in each group, or -1.
+        """
+        if taxid not in self._group_targets:
+            start, end = self.taxid_records(taxid)
+            targets = numpy.full(len(self.groups), -1, dtype=numpy.int64)
+            #the last record of a group (records are in file order)
+            groups = self.record_group[start:end][::-1]
+            ugroups, last = numpy.unique(groups, return_index=True)
+            targets[ugroups] = end - 1 - last
+            self._group_targets[taxid] = targets
+        return self._group_targets[taxid]
+
+
 class HomoloGene(_Homologs):
     DEFAULT_DATABASE_PATH = serverfiles.localpath("HomoloGene")
     VERSION = 1
@@ -74,26 +203,32 @@ class HomoloGene(_Homologs):
     
     def load(self):
         path = serverfiles.localpath_download(self.DOMAIN, self.FILENAME)
-        lines = open(path, "rt").read().splitlines()[:-1]
-        self._homologs = {} 
-        self._homologs = dict([((h.taxonomy_id, h.gene_symbol), h) for h in [_homolog(line) for line in lines]])
-        self._homologs_by_group = reduce(lambda dict, h: dict[h.group_id].append(h) or dict, self._homologs.values(), defaultdict(list))
-#        for line in lines:
-#            h = _homolog(line)
-#            self._homologs[h.taxonomy_id, h.gene_symbol] = h
-#            self._homologs_by_group[h.group_id].append(h)
+        self._index = _HomologIndex.load(path)
         
     def all_genes(self, taxid=None):
-        return [homolog.gene_symbol for (tid, id), homolog in self._homologs.iteritems() if tid == taxid]
+        start, end = self._index.taxid_records(taxid)
+        return [self._index.symbols[i] for i in range(start, end)]
     
     def homologs(self, gene, taxid):
-        group = self._homologs.get((taxid, gene), _homolog("")).group_id
-        homologs = self._homologs_by_group[group]
-        return [(h.taxonomy_id, h.gene_symbol) for h in homologs]
+        index = self._index
+        record = index.symbol_index(taxid).get(gene)
+        if record is None:
+            return []
+        return [(index.taxids[index.record_taxid[m]], index.symbols[m]) for m in index.members(record)]
         
     def homolog(self, gene, taxid, homolotaxid):
-        homologs = dict(self.homologs(gene, taxid))
-        return homologs.get(homolotaxid, None)
+        return self.homologs_many([gene], taxid, homolotaxid)[0]
+
+    def homologs_many(self, genes, taxid, homolotaxid):
+        """ Return a list of homologs (or None) of genes from organism with *taxid* in organism with *homolotaxid*
+        """
+        index = self._index
+        symbol_index = index.symbol_index(taxid)
+        records = numpy.array([symbol_index.get(gene, -1) for gene in genes], dtype=numpy.int64)
+        found = records >= 0
+        homologs = numpy.full(len(records), -1, dtype=numpy.int64)
+        homologs[found] = index.group_targets(homolotaxid)[index.record_group[records[found]]]
+        return [index.symbols[h] if h >= 0 else None for h in homologs.tolist()]
         
 def _parseOrthoXML(file):
     """ Return (cluster_id, taxid, gene_id) tuples from orthoXML file 
@@ -123,9 +258,46 @@ class InParanoid(object):
     """ InParanoid: Eukaryotic Ortholog Groups
     """
     VERSION = 1
-    def __init__(self):
-        import sqlite3
-        self.con = sqlite3.connect(serverfiles.localpath_download("HomoloGene", "InParanoid.sqlite"))
+    #indices for looking up groups of genes and group members by taxid
+    INDICES = [("homologs_taxid_geneid", "taxid, geneid"),
+               ("homologs_groupid_taxid", "groupid, taxid")]
+    #maximum number of genes in a single query
+    QUERY_GENES = 500
+
+    _local = threading.local()
+
+    def __init__(self, filename=None):
+        self.filename = filename
+        self._con = None
+
+    @classmethod
+    def get_instance(cls):
+        """ Return an instance shared by calls from the current thread
+        """
+        instance = getattr(cls._local, "instance", None)
+        if instance is None:
+            instance = cls._local.instance = cls()
+        return instance
+
+    @property
+    def con(self):
+        """ Connection to the database (opened on first use), with
+        indices for ortholog queries (created if the database is writable).
+        """
+        if self._con is None:
+            import sqlite3
+            filename = self.filename
+            if filename is None:
+                filename = serverfiles.localpath_download("HomoloGene", "InParanoid.sqlite")
+            con = sqlite3.connect(filename)
+            try:
+                for name, columns in self.INDICES:
+                    con.execute("create index if not exists %s on homologs (%s)" % (name, columns))
+                con.commit()
+            except sqlite3.Error:
+                pass #read only database
+            self._con = con
+        return self._con
         
     def all_genes(self, taxid):
         """ Return all genes in the database for the given taxid
@@ -146,16 +318,28 @@ class InParanoid(object):
         """ Return all orthologs of genename from organism with taxid. 
         If ortholog_taxid is given limit to orthologs from that organism only
         """
-        groups = self._groups(gene, taxid)
-        res = []
-        for group in groups:
-            if ortholog_taxid:
-                res.extend(self.con.execute("select distinct taxid, geneid from homologs where homologs.groupid=? and homologs.taxid=?", (group[0], ortholog_taxid)).fetchall())
-            else:
-                res.extend(self.con.execute("select distinct taxid, geneid from homologs where homologs.groupid=?", group).fetchall())
-        res = sorted(set(res))
+        return self.orthologs_many([gene], taxid, ortholog_taxid)[0]
+
+    def orthologs_many(self, genes, taxid, ortholog_taxid=None):
+        """ Return a list of orthologs (as returned by :obj:`orthologs`)
+        for each gene from organism with taxid.
+        """
+        genes = list(genes)
+        found = defaultdict(set)
+        query = "select distinct h1.geneid, h2.taxid, h2.geneid from homologs as h1 " \
+                "join homologs as h2 on h2.groupid = h1.groupid " \
+                "where h1.taxid=? and h1.geneid in (%s)"
+        if ortholog_taxid:
+            query += " and h2.taxid=?"
+        unique = list(set(genes))
+        for start in range(0, len(unique), self.QUERY_GENES):
+            chunk = unique[start:start + self.QUERY_GENES]
+            args = [taxid] + chunk + ([ortholog_taxid] if ortholog_taxid else [])
+            for gene, otaxid, ortholog in self.con.execute(query % ",".join("?" * len(chunk)), args):
+                found[gene].add((otaxid, ortholog))
+        res = [sorted(found.get(gene, ())) for gene in genes]
         if ortholog_taxid:
-            res = [r[1] for r in res]
+            res = [[r[1] for r in orthologs] for orthologs in res]
         return res
         
 def all_genes(taxid):
@@ -173,13 +357,23 @@ def homolog(genename, taxid, homolotaxid):
     """
     return HomoloGene.get_instance().homolog(genename, taxid, homolotaxid)
 
+def homologs_many(genenames, taxid, homolotaxid):
+    """ Return a list of homologs of genenames (for taxid) in organism homolotaxid (None where the homolog does not exist).
+    """
+    return HomoloGene.get_instance().homologs_many(genenames, taxid, homolotaxid)
+
 def all_genes_inParanoid(taxid):
     """ Return a set of all genes for organism with taxid in the InParanoid database.
     """
-    return InParanoid().all_genes(taxid)
+    return InParanoid.get_instance().all_genes(taxid)
 
 def orthologs(genename, taxid, ortholog_taxid=None):
     """ Return all InParanoid orthologs of genename from organism with taxid. 
     If ortholog_taxid is given limit to orthologs from that organism only.
     """
-    return InParanoid().orthologs(genename, taxid, ortholog_taxid)
+    return InParanoid.get_instance().orthologs(genename, taxid, ortholog_taxid)
+
+def orthologs_many(genenames, taxid, ortholog_taxid=None):
+    """ Return a list of InParanoid orthologs (see :obj:`orthologs`) for each of genenames from organism with taxid.
+    """
+    return InParanoid.get_instance().orthologs_many(genenames, taxid, ortholog_taxid)
@@ -11,8 +11,16 @@ import tarfile
 import gzip
 import re
 import sys
+import gc
+import io
+import itertools
+import array
+import hashlib
+import multiprocessing
 import six
 
+import numpy
+
 try:
     import cPickle as pickle
 except ImportError:
@@ -31,6 +39,11 @@ from gzip import GzipFile
 from collections import defaultdict
 from operator import attrgetter
 
+try:
+    from collections.abc import Mapping, MutableMapping, Sequence
+except ImportError:
+    from collections import Mapping, MutableMapping, Sequence
+
 from orangecontrib.bio.utils import progress_bar_milestones
 
 try:
@@ -47,6 +60,7 @@ except NameError:
 
 from orangecontrib.bio.utils import serverfiles
 from orangecontrib.bio.utils import stats
+from orangecontrib.bio.utils import snapshot
 
 from orangecontrib.bio import gene as obiGene, taxonomy as obiTaxonomy
 
@@ -54,6 +68,37 @@ default_database_path = os.path.join(serverfiles.localpath(), "GO")
 
 _CVS_REVISION_RE = re.compile(r"^(rev)?(\d+\.\d+)+$")
 
+
+def _file_version(filename):
+    """Return a string identifying the current contents of `filename`.
+    """
+    filename = os.path.abspath(filename)
+    stat = os.stat(filename)
+    return "%s:%i:%i" % (filename, stat.st_size, int(stat.st_mtime))
+
+
+def _serverfile_version(version, domain, filename):
+    """Return a version string for a snapshot of a server file (None if
+    the file's info is not available).
+    """
+    try:
+        info = serverfiles.info(domain, filename)
+    except (IOError, OSError):
+        return None
+    return "v%i.%s" % (version, info["datetime"])
+
+
+def _snapshot_path(filename):
+    return filename + ".snapshot"
+
+
+def _open_text(filename):
+    if six.PY3:
+        return io.open(filename, "r", encoding="utf-8")
+    else:
+        return open(filename, "rb")
+
+
 evidenceTypes = {
 # Experimental
     'EXP': 'Inferred from Experiment',
@@ -189,29 +234,32 @@ class OBOObject(object):
             self.parse_stanza(stanza)
 
     def parse_stanza(self, stanza):
-        intern_tags = set(self._INTERN_TAGS)
-        for line in stanza.splitlines():
-            if ":" not in line:
+        self._parse_lines(stanza.splitlines(), set(self._INTERN_TAGS))
+        self._finish()
+
+    def _parse_lines(self, lines, intern_tags):
+        add_line = self._add_line
+        for line in lines:
+            tag, sep, rest = line.partition(":")
+            if not sep:
                 continue
-            tag, rest = line.split(":", 1)
-            value, modifiers, comment = "", "", ""
-            if "!" in rest:
-                rest, comment = rest.split("!")
-            if "{" in rest:
-                value, modifiers = rest.split("{", 1)
-                modifiers = modifiers.strip("}")
-            else:
-                value = rest
+            rest, _, comment = rest.partition("!")
+            value, _, modifiers = rest.partition("{")
             tag = intern(tag)
             value = value.strip()
             comment = comment.strip()
             if tag in intern_tags:
                 value, comment = intern(value), intern(comment)
-            self._lines.append((tag, value, modifiers, comment))
-            if tag in multipleTagSet:
-                self.values.setdefault(tag, []).append(value)
-            else:
-                self.values[tag] = value
+            add_line(tag, value, modifiers.strip("}"), comment)
+
+    def _add_line(self, tag, value, modifiers, comment):
+        self._lines.append((tag, value, modifiers, comment))
+        if tag in multipleTagSet:
+            self.values.setdefault(tag, []).append(value)
+        else:
+            self.values[tag] = value
+
+    def _finish(self):
         self.related = set(self.related_objects())
         self.__dict__.update(self.values)
         if "def" in self.__dict__:
@@ -267,6 +315,368 @@ class Instance(OBOObject):
     pass
 
 
+class _SnapshotTerms(MutableMapping):
+    """
+    A term id to :class:`Term` mapping backed by a (memory mapped) ontology
+    snapshot (see :func:`Ontology._save_snapshot`). Terms are constructed
+    on first access.
+
+    """
+    def __init__(self, ontology, arrays):
+        self._ontology = ontology
+        self._kind = arrays["kind"]
+        self._ids = [intern(id) for id in
+                     snapshot.StringPool.from_arrays(arrays, "ids").tolist()]
+        self._lines_ptr = arrays["lines_ptr"]
+        self._columns = [(arrays["lines_" + name],
+                          snapshot.StringPool.from_arrays(arrays, name))
+                         for name in ["tag", "value", "modifiers", "comment"]]
+        # relation arrays sorted by the parent term
+        self._rel_ptr = arrays["rel_ptr"]
+        self._rel_child = arrays["rel_child"]
+        self._rel_parent = numpy.repeat(numpy.arange(len(self._ids)),
+                                        numpy.diff(self._rel_ptr))
+        self._rel_type = arrays["rel_type"]
+        self._rel_types = [intern(t) for t in snapshot.StringPool.from_arrays(
+            arrays, "rel_types").tolist()]
+        self._tags = [intern(t) for t in self._columns[0][1].tolist()]
+        self._pool_lists = None
+
+        self._index = dict((self._ids[i], i) for i in
+                           numpy.flatnonzero(numpy.asarray(self._kind) == 0))
+        self._terms = {}
+        #: Was the mapping modified after loading.
+        self.modified = False
+
+    def objects(self, kind):
+        """Return a list of all objects of `kind` (0 for terms, 1 for
+        typedefs and 2 for instances).
+        """
+        return [self._object(i) for i in
+                numpy.flatnonzero(numpy.asarray(self._kind) == kind)]
+
+    def _pools(self):
+        # decoded string pools of the line columns
+        if self._pool_lists is None:
+            self._pool_lists = [self._tags] + \
+                [pool.tolist() for _, pool in self._columns[1:]]
+        return self._pool_lists
+
+    def _object(self, index):
+        cls = (Term, Typedef, Instance)[self._kind[index]]
+        obj = cls(ontology=self._ontology)
+        start, end = self._lines_ptr[index], self._lines_ptr[index + 1]
+        tags, values, modifiers, comments = self._pools()
+        intern_tags = set(OBOObject._INTERN_TAGS)
+        for t, v, m, c in zip(*[codes[start:end].tolist()
+                                for codes, _ in self._columns]):
+            tag, value, comment = tags[t], values[v], comments[c]
+            if tag in intern_tags:
+                value, comment = intern(value), intern(comment)
+            obj._add_line(tag, value, modifiers[m], comment)
+        obj._finish()
+        start, end = self._rel_ptr[index], self._rel_ptr[index + 1]
+        for t, child in zip(self._rel_type[start:end].tolist(),
+                            self._rel_child[start:end].tolist()):
+            obj.related_to.add((self._rel_types[t], self._ids[child]))
+        return obj
+
+    def tag_values(self, tag):
+        """Return a list of (term id, value) pairs of all term lines with
+        `tag`.
+        """
+        if tag not in self._tags:
+            return []
+        (tags, _), (values, value_pool) = self._columns[:2]
+        lines = numpy.flatnonzero(numpy.asarray(tags) ==
+                                  self._tags.index(tag))
+        objects = numpy.searchsorted(self._lines_ptr, lines, side="right") - 1
+        return [(self._ids[o], intern(value_pool[values[l]]))
+                for o, l in zip(objects, lines) if self._kind[o] == 0]
+
+    def parents(self):
+        """Return a dict mapping term ids to lists of parent term ids."""
+        parents = dict((id, []) for id in self._index)
+        for child, parent in zip(self._rel_child.tolist(),
+                                 self._rel_parent.tolist()):
+            parents[self._ids[child]].append(self._ids[parent])
+        return parents
+
+    def __getitem__(self, id):
+        term = self._terms.get(id)
+        if term is None:
+            term = self._terms[id] = self._object(self._index[id])
+        return term
+
+    def __setitem__(self, id, term):
+        self._index.setdefault(id, None)
+        self._terms[id] = term
+        self.modified = True
+
+    def __delitem__(self, id):
+        del self._index[id]
+        self._terms.pop(id, None)
+        self.modified = True
+
+    def __contains__(self, id):
+        return id in self._index
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __len__(self):
+        return len(self._index)
+
+
+def _strongly_connected(successors):
+    """
+    Return strongly connected components (lists of node indices) of a
+    graph given by `successors` lists, each after the components of all
+    its successors (Tarjan's algorithm).
+    """
+    n = len(successors)
+    index, low = [-1] * n, [0] * n
+    onstack = [False] * n
+    stack, components, counter = [], [], 0
+    for root in range(n):
+        if index[root] >= 0:
+            continue
+        work = [(root, 0)]
+        while work:
+            v, i = work.pop()
+            if i == 0:
+                index[v] = low[v] = counter
+                counter += 1
+                stack.append(v)
+                onstack[v] = True
+            else:
+                # returned from the (i - 1)-th successor
+                low[v] = min(low[v], low[successors[v][i - 1]])
+            recurse = False
+            while i < len(successors[v]):
+                w = successors[v][i]
+                i += 1
+                if index[w] < 0:
+                    work.extend([(v, i), (w, 0)])
+                    recurse = True
+                    break
+                elif onstack[w]:
+                    low[v] = min(low[v], index[w])
+            if not recurse and low[v] == index[v]:
+                component = []
+                while True:
+                    w = stack.pop()
+                    onstack[w] = False
+                    component.append(w)
+                    if w == v:
+                        break
+                components.append(sorted(component))
+    return components
+
+
+class _TermClosure(object):
+    """
+    Transitive closure helper for the term graph of an :class:`Ontology`.
+
+    The term graph can contain cycles (e.g. through ``has_part`` and
+    ``part_of`` relationships), so terms are grouped into strongly
+    connected components, which form a graph without cycles. Term ids
+    are stored in topological order of their components (parents before
+    children). Links between components are grouped by the level (length
+    of the longest path from a top level component) of their endpoints,
+    so the closure of any number of terms is computed with a single
+    sweep over the levels. Ancestor sets of single terms are memoized.
+
+    """
+    def __init__(self, parents):
+        ids = sorted(parents)
+        position = dict((id, i) for i, id in enumerate(ids))
+        successors = [sorted(set(position[p] for p in parents[id]))
+                      for id in ids]
+        components = _strongly_connected(successors)
+        order = [i for c in components for i in c]
+        n, ncomponents = len(order), len(components)
+
+        #: Term ids in topological order (of their components).
+        self.terms = [ids[i] for i in order]
+        self.index = dict((id, i) for i, id in enumerate(self.terms))
+        new = numpy.zeros(n, dtype=int)
+        new[order] = numpy.arange(n)
+        self._parents = [sorted(new[successors[i]].tolist())
+                         for i in order]
+        self._children = [[] for _ in range(n)]
+        for i, ps in enumerate(self._parents):
+            for p in ps:
+                self._children[p].append(i)
+
+        #: Component of each term (index into the components)
+        self.component = numpy.repeat(numpy.arange(ncomponents),
+                                      [len(c) for c in components])
+        self._members = numpy.cumsum([0] + [len(c) for c in components])
+        component = self.component.tolist()
+        self._cparents = [
+            sorted(set(component[p] for t in range(self._members[c],
+                                                   self._members[c + 1])
+                       for p in self._parents[t]) - set([c]))
+            for c in range(ncomponents)]
+
+        self.parent_ptr = numpy.cumsum([0] + [len(p) for p in self._parents])
+        self.parent_ind = numpy.array(
+            [p for ps in self._parents for p in ps], dtype=int)
+        self._edges = (self.parent_ind,
+                       numpy.repeat(numpy.arange(n),
+                                    numpy.diff(self.parent_ptr)))
+
+        level = numpy.zeros(ncomponents, dtype=int)
+        for c, ps in enumerate(self._cparents):
+            if ps:
+                level[c] = max(level[p] for p in ps) + 1
+        self.level = level
+
+        # (parent, child) component link arrays grouped by level: bottom
+        # up by the child's level for ancestor sweeps and top down by the
+        # parent's level for descendant sweeps.
+        lengths = [len(ps) for ps in self._cparents]
+        edge_child = numpy.repeat(numpy.arange(ncomponents), lengths)
+        edge_parent = numpy.array([p for ps in self._cparents for p in ps],
+                                  dtype=int)
+        nlevels = level.max() + 1 if ncomponents else 0
+        up_level, down_level = level[edge_child], level[edge_parent]
+        self._up = [(edge_parent[up_level == l], edge_child[up_level == l])
+                    for l in range(nlevels - 1, 0, -1)]
+        self._down = [(edge_parent[down_level == l],
+                       edge_child[down_level == l])
+                      for l in range(nlevels - 1)]
+        self._ancestors = {}
+        self._slims_subset, self._slims = None, {}
+        self._depth = None
+
+    def mask(self, indices):
+        mask = numpy.zeros(len(self.terms), dtype=bool)
+        mask[numpy.asarray(indices, dtype=int)] = True
+        return mask
+
+    def ids(self, mask):
+        """Return a list of term ids selected by a boolean `mask`."""
+        return [self.terms[i] for i in numpy.flatnonzero(mask)]
+
+    def ancestors_mask(self, indices):
+        """Return a boolean mask of terms `indices` and all their ancestors.
+        """
+        mask = numpy.zeros(len(self._cparents), dtype=bool)
+        mask[self.component[numpy.asarray(indices, dtype=int)]] = True
+        for parent, child in self._up:
+            mask[parent[mask[child]]] = True
+        return mask[self.component]
+
+    def descendants_mask(self, indices):
+        """Return a boolean mask of terms `indices` and all their descendants.
+        """
+        mask = numpy.zeros(len(self._cparents), dtype=bool)
+        mask[self.component[numpy.asarray(indices, dtype=int)]] = True
+        for parent, child in self._down:
+            mask[child[mask[parent]]] = True
+        return mask[self.component]
+
+    def descendants(self, index):
+        """Return a set of term ids of `index` and all its descendants.
+        """
+        children = self._children
+        visited, stack = set([index]), [index]
+        while stack:
+            for child in children[stack.pop()]:
+                if child not in visited:
+                    visited.add(child)
+                    stack.append(child)
+        return set(self.terms[i] for i in visited)
+
+    def _memoized(self, memo, c, combine):
+        # Fill `memo` for component `c` and its (unmemoized) ancestors in
+        # topological order, using `combine(c, parent_values)`.
+        parents = self._cparents
+        stack = [c]
+        while stack:
+            i = stack[-1]
+            if i in memo:
+                stack.pop()
+                continue
+            pending = [p for p in parents[i] if p not in memo]
+            if pending:
+                stack.extend(pending)
+            else:
+                stack.pop()
+                memo[i] = combine(i, [memo[p] for p in parents[i]])
+        return memo[c]
+
+    def _member_ids(self, c):
+        return [self.terms[t]
+                for t in range(self._members[c], self._members[c + 1])]
+
+    def ancestors(self, index):
+        """Return a (memoized) frozenset of term ids of `index` and all its
+        ancestors.
+        """
+        return self._memoized(
+            self._ancestors, self.component[index],
+            lambda c, parents: frozenset(self._member_ids(c)).union(*parents))
+
+    def slims(self, index, slims_subset):
+        """Return a (memoized) frozenset of the most specific terms in
+        `slims_subset` that are ancestors of (or equal to) `index`.
+        """
+        # The memo is reset when a subset with different terms is used.
+        if not isinstance(slims_subset, (set, frozenset)):
+            slims_subset = frozenset(slims_subset)
+        if self._slims_subset != slims_subset:
+            self._slims_subset = frozenset(slims_subset)
+            self._slims = {}
+        component = self.component
+
+        def combine(c, parents):
+            # slims of all terms of the component: slim terms reached
+            # without passing another slim term (breadth first within
+            # the component, memoized outside it)
+            parents = dict(zip(self._cparents[c], parents))
+            slims = {}
+            for t in range(self._members[c], self._members[c + 1]):
+                found, visited, queue = set(), set([t]), [t]
+                while queue:
+                    i = queue.pop()
+                    if self.terms[i] in self._slims_subset:
+                        found.add(self.terms[i])
+                        continue
+                    for p in self._parents[i]:
+                        if component[p] != c:
+                            found.update(parents[component[p]][p])
+                        elif p not in visited:
+                            visited.add(p)
+                            queue.append(p)
+                slims[t] = frozenset(found)
+            return slims
+
+        return self._memoized(self._slims, component[index], combine)[index]
+
+    def depth(self):
+        """Return an array of minimum term depths (top level terms have
+        depth 1, terms not reachable from any top level term have depth
+        ``len(terms) + 1``).
+        """
+        if self._depth is None:
+            depth = numpy.full(len(self.terms), len(self.terms) + 1,
+                               dtype=int)
+            frontier = self.parent_ptr[1:] == self.parent_ptr[:-1]
+            parent, child = self._edges
+            d = 1
+            while frontier.any():
+                depth[frontier] = d
+                frontier = numpy.zeros(len(self.terms), dtype=bool)
+                frontier[child[depth[parent] == d]] = True
+                frontier &= depth > d
+                d += 1
+            self._depth = depth
+        return self._depth
+
+
 class Ontology(object):
     """
     :class:`Ontology` is the class representing a gene ontology.
@@ -297,6 +707,9 @@ class Ontology(object):
         self.alias_mapper = {}
         self.reverse_alias_mapper = defaultdict(set)
         self.header = ""
+        #: A string identifying the parsed source file (None if unknown).
+        self.source_version = None
+        self._closure = None
 
         if filename is not None:
             self.parse_file(filename, progress_callback)
@@ -318,7 +731,7 @@ class Ontology(object):
             filename = serverfiles.localpath_download(
                 "GO", "gene_ontology_edit.obo.tar.gz"
             )
-            self.parse_file(filename, progress_callback)
+            self._load_server_file(filename, progress_callback)
 
     @classmethod
     def load(cls, progress_callback=None):
@@ -326,13 +739,15 @@ class Ontology(object):
         default_database_path. It looks for a filename starting with
         'gene_ontology'. If not found it will download it.
 
+        A pre-parsed snapshot of the file is used if it is up to date.
+
         """
         filename = os.path.join(default_database_path,
                                 "gene_ontology_edit.obo.tar.gz")
         if not os.path.isfile(filename) and not os.path.isdir(filename):
             serverfiles.download("GO", "gene_ontology_edit.obo.tar.gz")
 
-        return cls(filename, progress_callback=progress_callback)
+        return cls(progress_callback=progress_callback)
 
     Load = load
 
@@ -341,37 +756,188 @@ class Ontology(object):
         object. The optional progressCallback will be called with a single
         argument to report on the progress.
         """
+        size = None
         if isinstance(file, basestring):
             if os.path.isfile(file) and tarfile.is_tarfile(file):
-                f = tarfile.open(file).extractfile("gene_ontology_edit.obo")
+                tar = tarfile.open(file)
+                member = tar.getmember("gene_ontology_edit.obo")
+                f, size = tar.extractfile(member), member.size
+                if six.PY3:
+                    f = io.TextIOWrapper(f, encoding="utf-8")
             elif os.path.isfile(file):
-                f = open(file)
+                f, size = _open_text(file), os.path.getsize(file)
             elif os.path.isdir(file):
-                f = open(os.path.join(file, "gene_ontology_edit.obo"))
+                filename = os.path.join(file, "gene_ontology_edit.obo")
+                f, size = _open_text(filename), os.path.getsize(filename)
             else:
                 raise ValueError("Cannot open %r for parsing" % file)
+            self.source_version = _file_version(file)
         else:
             f = file
+            self.source_version = None
 
-        data = f.readlines()
-        data = "".join([line for line in data if not line.startswith("!")])
-        self.header = data[: data.index("[Term]")]
-        c = re.compile("\[.+?\].*?\n\n", re.DOTALL)
-        data = c.findall(data)
-
-        milestones = progress_bar_milestones(len(data), 90)
-        for i, block in enumerate(builtinOBOObjects + data):
-            if block.startswith("[Term]"):
-                term = Term(block, self)
-                self.terms[term.id] = term
-            elif block.startswith("[Typedef]"):
-                typedef = Typedef(block, self)
-                self.typedefs[typedef.id] = typedef
-            elif block.startswith("[Instance]"):
-                instance = Instance(block, self)
-                self.instances[instance.id] = instance
-            if progress_callback and i in milestones:
-                progress_callback(90.0 * i / len(data))
+        gc_enabled = gc.isenabled()
+        # Parsing creates many long lived objects; pause the cyclic garbage
+        # collector which would otherwise repeatedly traverse them.
+        gc.disable()
+        try:
+            self._parse_lines(f, size, progress_callback)
+        finally:
+            if gc_enabled:
+                gc.enable()
+            if f is not file:
+                f.close()
+
+    def _load_server_file(self, filename, progress_callback=None):
+        """
+        Load the ontology from the server files copy `filename`, using the
+        pre-parsed snapshot next to it if its version matches. Otherwise
+        parse the file and (re)create the snapshot.
+        """
+        version = _serverfile_version(
+            self.version, "GO", "gene_ontology_edit.obo.tar.gz")
+        path = _snapshot_path(filename)
+        if version is not None:
+            try:
+                self._load_snapshot(path, version)
+            except (IOError, OSError, ValueError, KeyError):
+                pass
+            else:
+                self.source_version = _file_version(filename)
+                return
+
+        self.parse_file(filename, progress_callback)
+        if version is not None:
+            try:
+                self._save_snapshot(path, version)
+            except (IOError, OSError) as ex:
+                warnings.warn("Could not save the ontology snapshot: %s" % ex)
+
+    def _save_snapshot(self, path, version):
+        """
+        Save the parsed ontology into a snapshot directory `path`.
+
+        All OBO objects' lines are stored as integer codes into string
+        pools (one column per line field), with the term relations in
+        separate arrays (sorted by the parent term).
+        """
+        objects = [(0, obj) for obj in self.terms.values()] + \
+                  [(1, obj) for obj in self.typedefs.values()] + \
+                  [(2, obj) for obj in self.instances.values()]
+        index = dict((obj.id, i) for i, (kind, obj) in enumerate(objects)
+                     if kind == 0)
+        lines = [line for _, obj in objects for line in obj._lines]
+        arrays = {
+            "kind": numpy.array([kind for kind, _ in objects],
+                                dtype=numpy.int8),
+            "lines_ptr": numpy.cumsum([0] + [len(obj._lines)
+                                             for _, obj in objects]),
+        }
+        arrays.update(snapshot.StringPool.from_strings(
+            [obj.id for _, obj in objects]).arrays("ids"))
+        for i, name in enumerate(["tag", "value", "modifiers", "comment"]):
+            codes, pool = snapshot.encode_column([line[i] for line in lines])
+            arrays["lines_" + name] = codes
+            arrays.update(pool.arrays(name))
+
+        relations = sorted((index[parent], type_id, index[child])
+                           for child, term in six.iteritems(self.terms)
+                           for type_id, parent in term.related)
+        rel_parent = numpy.array([r[0] for r in relations], dtype=int)
+        arrays["rel_ptr"] = numpy.concatenate(
+            [[0], numpy.cumsum(numpy.bincount(rel_parent,
+                                              minlength=len(objects)))])
+        arrays["rel_child"] = numpy.array([r[2] for r in relations],
+                                          dtype=numpy.int32)
+        codes, pool = snapshot.encode_column([r[1] for r in relations])
+        arrays["rel_type"] = codes
+        arrays.update(pool.arrays("rel_types"))
+
+        snapshot.save(path, arrays, version, {"header": self.header})
+
+    def _load_snapshot(self, path, version=None):
+        """
+        Load the ontology from a snapshot directory `path` (see
+        :func:`_save_snapshot`). The terms are constructed on first access.
+        """
+        arrays, meta = snapshot.load(path, version)
+        terms = _SnapshotTerms(self, arrays)
+        self.terms = terms
+        self.typedefs = dict((t.id, t) for t in terms.objects(1))
+        self.instances = dict((i.id, i) for i in terms.objects(2))
+        self.header = meta["header"]
+        self.alias_mapper = {}
+        self.reverse_alias_mapper = defaultdict(set)
+        for id, alt_id in terms.tag_values("alt_id"):
+            self.alias_mapper[alt_id] = id
+            self.reverse_alias_mapper[id].add(alt_id)
+        self._closure = None
+
+    _STANZA_TYPES = {"[Term]": Term, "[Typedef]": Typedef,
+                     "[Instance]": Instance}
+
+    def _parse_lines(self, lines, size=None, progress_callback=None):
+        """
+        Parse the ontology from an iterable of (str or utf-8 encoded) `lines`
+        in a single pass, holding only the current stanza in memory. If
+        `size` (total length of `lines`) is given it is used to report the
+        progress.
+        """
+        if not isinstance(self.terms, dict):
+            self.terms = dict(self.terms)
+
+        for stanza in builtinOBOObjects:
+            if stanza.startswith("[Typedef]"):
+                self._add_object(Typedef(stanza, self))
+
+        lines = iter(lines)
+        first = next(lines, "")
+        if isinstance(first, basestring):
+            lines = itertools.chain([first], lines)
+        else:
+            # a binary stream
+            lines = (line.decode("utf-8")
+                     for line in itertools.chain([first], lines))
+
+        header = []
+        for line in lines:
+            if line.startswith("[Term]"):
+                break
+            elif not line.startswith("!"):
+                header.append(line if line.endswith("\n") else line + "\n")
+        else:
+            raise ValueError("No [Term] stanzas found")
+        self.header = "".join(header)
+
+        # Stanzas preceding the first [Term] are also parsed (as they
+        # always were), followed by the rest of the file.
+        intern_tags = set(OBOObject._INTERN_TAGS)
+        read, reported = 0, 0
+        obj, stanza = None, []
+        for line in itertools.chain(header, [line], lines):
+            read += len(line)
+            if line.startswith("!"):
+                continue
+            elif obj is None:
+                tag = line.strip()
+                if tag.startswith("[") and tag.endswith("]"):
+                    obj = self._STANZA_TYPES.get(tag, OBOObject)(
+                        ontology=self)
+            elif not line.isspace():
+                stanza.append(line)
+            else:
+                obj._parse_lines(stanza, intern_tags)
+                obj._finish()
+                self._add_object(obj)
+                obj, stanza = None, []
+                if progress_callback and size and \
+                        90 * read // size > reported:
+                    reported = 90 * read // size
+                    progress_callback(float(reported))
+        if obj is not None:
+            obj._parse_lines(stanza, intern_tags)
+            obj._finish()
+            self._add_object(obj)
 
         self.alias_mapper = {}
         self.reverse_alias_mapper = defaultdict(set)
@@ -379,14 +945,21 @@ class Ontology(object):
         for i, (id, term) in enumerate(six.iteritems(self.terms)):
             for typeId, parent in term.related:
                 self.terms[parent].related_to.add((typeId, id))
-            try:
-                self.alias_mapper.update([(alt_id, id)
-                                          for alt_id in term.alt_id])
-                self.reverse_alias_mapper[id].union_update(term.alt_id)
-            except AttributeError:
-                pass
+            alt_ids = term.values.get("alt_id")
+            if alt_ids:
+                self.alias_mapper.update([(alt_id, id) for alt_id in alt_ids])
+                self.reverse_alias_mapper[id].update(alt_ids)
             if progress_callback and i in milestones:
                 progress_callback(90.0 + 10.0 * i / len(self.terms))
+        self._closure = None
+
+    def _add_object(self, obj):
+        if isinstance(obj, Term):
+            self.terms[obj.id] = obj
+        elif isinstance(obj, Typedef):
+            self.typedefs[obj.id] = obj
+        elif isinstance(obj, Instance):
+            self.instances[obj.id] = obj
 
     def defined_slims_subsets(self):
         """
@@ -408,6 +981,10 @@ class Ontology(object):
         .. seealso:: :func:`defined_slims_subsets`
 
         """
+        if isinstance(self.terms, _SnapshotTerms) and \
+                not self.terms.modified:
+            return [id for id, value in self.terms.tag_values("subset")
+                    if value == subset]
         return [id for id, term in self.terms.items()
                 if subset in getattr(term, "subset", set())]
 
@@ -426,6 +1003,22 @@ class Ontology(object):
         else:
             self.slims_subset = set(subset)
 
+    def _term_parents(self):
+        if isinstance(self.terms, _SnapshotTerms) and \
+                not self.terms.modified:
+            return self.terms.parents()
+        return dict((id, [p for _, p in term.related])
+                    for id, term in six.iteritems(self.terms))
+
+    def _get_closure(self):
+        if getattr(self, "_closure", None) is None:
+            self._closure = _TermClosure(self._term_parents())
+        return self._closure
+
+    def _term_indices(self, terms):
+        closure = self._get_closure()
+        return [closure.index[self.alias_mapper.get(t, t)] for t in terms]
+
     def slims_for_term(self, term):
         """
         Return a list of slim term IDs for `term`.
@@ -435,18 +1028,8 @@ class Ontology(object):
         :param str term: Term ID.
 
         """
-        queue = set([term])
-        visited = set()
-        slims = set()
-        while queue:
-            term = queue.pop()
-            visited.add(term)
-            if term in self.slims_subset:
-                slims.add(term)
-            else:
-                queue.update(set(tid for _, tid in self[term].related) -
-                             visited)
-        return slims
+        [index] = self._term_indices([term])
+        return set(self._get_closure().slims(index, self.slims_subset))
 
     def extract_super_graph(self, terms):
         """
@@ -455,14 +1038,14 @@ class Ontology(object):
         :param list terms: A list of term IDs.
 
         """
-        terms = [terms] if isinstance(terms, basestring) else terms
-        visited = set()
-        queue = set(terms)
-        while queue:
-            term = queue.pop()
-            visited.add(term)
-            queue.update(set(tid for _, tid in self[term].related) -
-                         visited)
+        terms = [terms] if isinstance(terms, basestring) else list(terms)
+        closure = self._get_closure()
+        indices = self._term_indices(terms)
+        if len(indices) == 1:
+            visited = set(closure.ancestors(indices[0]))
+        else:
+            visited = set(closure.ids(closure.ancestors_mask(indices)))
+        visited.update(terms)
         return visited
 
     def extract_sub_graph(self, terms):
@@ -472,28 +1055,25 @@ class Ontology(object):
         :param list terms: A list of term IDs.
 
         """
-        terms = [terms] if type(terms) == str else terms
-        visited = set()
-        queue = set(terms)
-        while queue:
-            term = queue.pop()
-            visited.add(term)
-            queue.update(set(tid for _, tid in self[term].related_to) -
-                         visited)
+        terms = [terms] if isinstance(terms, basestring) else list(terms)
+        closure = self._get_closure()
+        indices = self._term_indices(terms)
+        if len(indices) == 1:
+            visited = closure.descendants(indices[0])
+        else:
+            visited = set(closure.ids(closure.descendants_mask(indices)))
+        visited.update(terms)
         return visited
 
-    def term_depth(self, term, cache_={}):
+    def term_depth(self, term):
         """
         Return the minimum depth of a `term`.
 
         (length of the shortest path to this term from the top level term).
 
         """
-        if term not in cache_:
-            cache_[term] = min([self.term_depth(parent) + 1
-                                for _, parent in self[term].related] or
-                               [1])
-        return cache_[term]
+        [index] = self._term_indices([term])
+        return int(self._get_closure().depth()[index])
 
     def __getitem__(self, termid):
         """
@@ -620,6 +1200,501 @@ class AnnotationRecord(_AnnotationRecordBase):
         return list(map(intern, self.DB_Object_Synonym.split("|")))
 
 
+class _AnnotationStore(object):
+    """
+    Columnar storage of annotation records.
+
+    Every annotation field is stored as an array of integer codes indexing
+    into a pool (list) of the field's unique values. Records are only
+    constructed when requested.
+
+    """
+    def __init__(self, columns=None, pools=None):
+        nfields = len(annotationFields)
+        if columns is None:
+            columns = [numpy.zeros(0, dtype=numpy.intc)] * nfields
+            pools = [[] for _ in range(nfields)]
+        self._columns = list(columns)
+        self._pools = list(pools)
+        self._code_maps = [None] * nfields
+        # codes of appended rows not yet merged into the columns
+        self._pending = array.array("i")
+        self._groups = {}
+
+    def __len__(self):
+        return len(self._columns[0]) + \
+            len(self._pending) // len(annotationFields)
+
+    def _code_map(self, i):
+        if self._code_maps[i] is None:
+            self._code_maps[i] = dict((v, c) for c, v in
+                                      enumerate(self._pools[i]))
+        return self._code_maps[i]
+
+    def _add_codes(self, i, values):
+        """Return the codes of `values` in field `i`, extending the pool
+        with new values."""
+        codes, pool = self._code_map(i), self._pools[i]
+        result = []
+        for value in values:
+            code = codes.get(value)
+            if code is None:
+                code = codes[value] = len(pool)
+                pool.append(value)
+            result.append(code)
+        return result
+
+    def append(self, values):
+        """Append a record (a sequence of field values)."""
+        if None in self._code_maps:
+            for i in range(len(annotationFields)):
+                self._code_map(i)
+        pending = self._pending
+        for value, codes, pool in zip(values, self._code_maps, self._pools):
+            code = codes.get(value)
+            if code is None:
+                code = codes[value] = len(pool)
+                pool.append(value)
+            pending.append(code)
+        if self._groups:
+            self._groups = {}
+
+    def extend(self, other):
+        """Append all records from another store."""
+        self._flush()
+        if not len(self):
+            self._columns = list(other.columns())
+            self._pools = [list(pool) for pool in other._pools]
+            self._code_maps = [None] * len(annotationFields)
+        else:
+            self._columns = [
+                numpy.concatenate([
+                    column,
+                    numpy.array(self._add_codes(i, other._pools[i]),
+                                dtype=numpy.intc)[other_column]])
+                for i, (column, other_column) in
+                enumerate(zip(self._columns, other.columns()))]
+        self._groups = {}
+
+    def _flush(self):
+        if self._pending:
+            rows = numpy.frombuffer(self._pending, dtype=numpy.intc)
+            rows = rows.reshape(-1, len(annotationFields))
+            self._columns = [numpy.concatenate([column, rows[:, i]])
+                             for i, column in enumerate(self._columns)]
+            self._pending = array.array("i")
+
+    def columns(self):
+        """Return a list of code arrays for all fields."""
+        self._flush()
+        return self._columns
+
+    def column(self, field):
+        return self.columns()[annotationFields.index(field)]
+
+    def pool(self, field):
+        return self._pools[annotationFields.index(field)]
+
+    def records(self, rows):
+        """Return a list of :class:`AnnotationRecord` for `rows`."""
+        rows = numpy.asarray(rows, dtype=int)
+        values = [[pool[c] for c in column[rows].tolist()]
+                  for column, pool in zip(self.columns(), self._pools)]
+        return list(map(AnnotationRecord._make, zip(*values)))
+
+    def rows(self, field, value):
+        """Return an array of rows where `field` equals `value`."""
+        i = annotationFields.index(field)
+        code = self._code_map(i).get(value)
+        if code is None:
+            return numpy.zeros(0, dtype=int)
+        if i not in self._groups:
+            column = self.columns()[i]
+            order = numpy.argsort(column, kind="mergesort")
+            counts = numpy.bincount(column, minlength=len(self._pools[i]))
+            self._groups[i] = order, numpy.concatenate([[0],
+                                                        numpy.cumsum(counts)])
+        order, ptr = self._groups[i]
+        return order[ptr[code]:ptr[code + 1]]
+
+    def find(self, record):
+        """Return an array of rows equal to `record`."""
+        mask = numpy.ones(len(self), dtype=bool)
+        for i, (column, value) in enumerate(zip(self.columns(), record)):
+            code = self._code_map(i).get(value)
+            if code is None:
+                return numpy.zeros(0, dtype=int)
+            mask &= column == code
+        return numpy.flatnonzero(mask)
+
+    def unique(self, fields):
+        """Return a list of distinct tuples of `fields` values, ordered by
+        their last occurrence.
+        """
+        indices = [annotationFields.index(f) for f in fields]
+        columns = self.columns()
+        if not len(columns[0]):
+            return []
+        codes = numpy.column_stack([columns[i] for i in indices])
+        _, last = numpy.unique(codes[::-1], axis=0, return_index=True)
+        rows = numpy.sort(len(codes) - 1 - last)
+        values = [[self._pools[i][c] for c in columns[i][rows].tolist()]
+                  for i in indices]
+        return list(zip(*values))
+
+
+class _AnnotationList(Sequence):
+    """
+    A read only list-like view of all records in an `_AnnotationStore`.
+    """
+    def __init__(self, store):
+        self._store = store
+
+    def __len__(self):
+        return len(self._store)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self._store.records(numpy.arange(len(self))[index])
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("annotation index out of range")
+        return self._store.records([index])[0]
+
+    def __getslice__(self, start, stop):
+        return self[max(start, 0):max(stop, 0)]
+
+    def __iter__(self):
+        chunk = 10000
+        for start in range(0, len(self), chunk):
+            for record in self._store.records(
+                    numpy.arange(start, min(start + chunk, len(self)))):
+                yield record
+
+    def __contains__(self, record):
+        return len(self._store.find(record)) > 0
+
+    def __eq__(self, other):
+        if isinstance(other, (list, _AnnotationList)):
+            return len(self) == len(other) and list(self) == list(other)
+        return NotImplemented
+
+    def __ne__(self, other):
+        eq = self.__eq__(other)
+        return eq if eq is NotImplemented else not eq
+
+    __hash__ = None
+
+
+class _AnnotationGroups(Mapping):
+    """
+    A read only mapping view of records in an `_AnnotationStore` grouped
+    by the value of `field`. As with a `defaultdict(list)`, looking up
+    a missing value returns an empty list.
+    """
+    def __init__(self, store, field):
+        self._store = store
+        self._field = field
+
+    def __getitem__(self, value):
+        return self._store.records(self._store.rows(self._field, value))
+
+    def __contains__(self, value):
+        return len(self._store.rows(self._field, value)) > 0
+
+    def __iter__(self):
+        return iter(self._store.pool(self._field))
+
+    def __len__(self):
+        return len(self._store.pool(self._field))
+
+
+class AnnotationIndex(object):
+    """
+    A precompiled index of genes annotated to GO terms (propagated to
+    all super terms).
+
+    Genes are assigned integer ids (their position in :attr:`genes`).
+    For every pair of (term, (evidence code, aspect)) the index stores
+    a sorted array of ids of genes annotated to the term or any of its
+    sub terms (in CSR format: `indices[indptr[i]:indptr[i + 1]]` for
+    row `i`).
+
+    :param str version: A string identifying the annotations and the
+        ontology the index was built from.
+
+    """
+    #: Index format version
+    FORMAT_VERSION = 1
+
+    def __init__(self, genes, terms, keys, row_term, row_key, indptr,
+                 indices, version=None):
+        self.genes = numpy.asarray(genes)
+        self.terms = numpy.asarray(terms)
+        self.keys = [tuple(k) for k in keys]
+        self.row_term = numpy.asarray(row_term)
+        self.row_key = numpy.asarray(row_key)
+        self.indptr = numpy.asarray(indptr)
+        self.indices = numpy.asarray(indices)
+        self.version = version
+        self._gene_index = dict((g, i) for i, g in enumerate(self.genes))
+        self._term_genes_cache = {}
+        self._gene_entries_cache = {}
+
+    @classmethod
+    def build(cls, annotations, ontology, version=None):
+        """
+        Build the index for :class:`Annotations` instance `annotations`
+        using `ontology`.
+        """
+        annotated = annotations._store.unique(
+            ["GO_ID", "Evidence_Code", "Aspect", "DB_Object_Symbol"])
+        genes = sorted(set(gene for _, _, _, gene in annotated))
+        gene_index = dict((g, i) for i, g in enumerate(genes))
+        keys = sorted(set((evidence, aspect)
+                          for _, evidence, aspect, _ in annotated))
+        key_index = dict((k, i) for i, k in enumerate(keys))
+
+        terms = []
+        term_index = {}
+
+        def index_of(term):
+            if term not in term_index:
+                term_index[term] = len(terms)
+                terms.append(term)
+            return term_index[term]
+
+        # direct (term, key, gene) annotation triples
+        direct = set()
+        for term, evidence, aspect, gene in annotated:
+            if term not in ontology:
+                continue
+            term = ontology.alias_mapper.get(term, term)
+            direct.add((index_of(term), key_index[evidence, aspect],
+                        gene_index[gene]))
+
+        # super terms of all directly annotated terms (including themselves)
+        direct_terms = list(terms)
+        supers = [[index_of(t) for t in ontology.extract_super_graph([term])]
+                  for term in direct_terms]
+
+        super_ptr = numpy.cumsum([0] + [len(s) for s in supers])
+        super_ind = numpy.array([t for s in supers for t in s], dtype=int)
+
+        direct = numpy.array(sorted(direct), dtype=numpy.int64).reshape(-1, 3)
+        d_term, d_key, d_gene = direct.T
+        counts = super_ptr[d_term + 1] - super_ptr[d_term]
+        rep = numpy.repeat(numpy.arange(len(direct)), counts)
+        offsets = numpy.arange(len(rep)) - \
+            numpy.repeat(numpy.cumsum(counts) - counts, counts)
+        p_term = super_ind[super_ptr[d_term[rep]] + offsets]
+
+        nkeys, ngenes = max(len(keys), 1), max(len(genes), 1)
+        codes = numpy.unique((p_term * nkeys + d_key[rep]) * ngenes +
+                             d_gene[rep])
+        rows, indices = codes // ngenes, codes % ngenes
+        row_ids, indptr = numpy.unique(rows, return_index=True)
+        indptr = numpy.r_[indptr, len(rows)]
+
+        return cls(numpy.array(genes, dtype=str),
+                   numpy.array(terms, dtype=str),
+                   numpy.array(keys, dtype=str).reshape(-1, 2),
+                   row_ids // nkeys, row_ids % nkeys,
+                   indptr, indices.astype(numpy.int32), version=version)
+
+    def save(self, filename):
+        """
+        Save the index to `filename` (in numpy `.npz` format).
+        """
+        tmpname = filename + ".tmp.npz"
+        numpy.savez(tmpname, genes=self.genes, terms=self.terms,
+                    keys=numpy.array(self.keys, dtype=str).reshape(-1, 2),
+                    row_term=self.row_term, row_key=self.row_key,
+                    indptr=self.indptr, indices=self.indices,
+                    version=numpy.array([str(self.version),
+                                         str(self.FORMAT_VERSION)]))
+        os.rename(tmpname, filename)
+
+    @classmethod
+    def load(cls, filename, version=None):
+        """
+        Load the index from `filename`. If `version` is given and does not
+        match the stored version raise a :class:`ValueError`.
+        """
+        with numpy.load(filename, allow_pickle=False) as data:
+            stored_version, fmt = data["version"]
+            if fmt != str(cls.FORMAT_VERSION) or \
+                    (version is not None and stored_version != version):
+                raise ValueError("Index version mismatch")
+            return cls(data["genes"], data["terms"], data["keys"],
+                       data["row_term"], data["row_key"], data["indptr"],
+                       data["indices"], version=stored_version)
+
+    def gene_mask(self, genes):
+        """
+        Return a boolean mask over :attr:`genes` selecting `genes`.
+        """
+        mask = numpy.zeros(len(self.genes), dtype=bool)
+        ids = [self._gene_index[g] for g in genes if g in self._gene_index]
+        mask[ids] = True
+        return mask
+
+    def term_genes(self, evidence_codes=None, aspects=None):
+        """
+        Return a `(terms, entry_term, entry_gene)` tuple of arrays. For
+        each term `terms[i]` the ids of all genes annotated (with any
+        of `evidence_codes` and `aspects`) are `entry_gene[entry_term == i]`.
+        """
+        cache_key = (frozenset(evidence_codes) if evidence_codes is not None
+                     else None,
+                     frozenset(aspects) if aspects is not None else None)
+        if cache_key in self._term_genes_cache:
+            return self._term_genes_cache[cache_key]
+
+        keysel = numpy.array(
+            [(evidence_codes is None or e in evidence_codes) and
+             (aspects is None or a in aspects) for e, a in self.keys] + [False],
+            dtype=bool)
+        rowsel = numpy.flatnonzero(keysel[self.row_key])
+        counts = self.indptr[rowsel + 1] - self.indptr[rowsel]
+        rep = numpy.repeat(numpy.arange(len(rowsel)), counts)
+        offsets = numpy.arange(len(rep)) - \
+            numpy.repeat(numpy.cumsum(counts) - counts, counts)
+        ngenes = max(len(self.genes), 1)
+        # union over the selected keys of each term
+        codes = numpy.unique(
+            self.row_term[rowsel][rep].astype(numpy.int64) * ngenes +
+            self.indices[self.indptr[rowsel][rep] + offsets])
+        term_ids, entry_term = numpy.unique(codes // ngenes,
+                                            return_inverse=True)
+        result = (self.terms[term_ids], entry_term, codes % ngenes)
+        self._term_genes_cache[cache_key] = result
+        return result
+
+    def gene_entries(self, evidence_codes=None, aspects=None):
+        """
+        Return an `(order, indptr)` tuple of arrays grouping the entries
+        of :func:`term_genes` by gene: the entries of gene `i` are
+        `order[indptr[i]:indptr[i + 1]]`.
+        """
+        cache_key = (frozenset(evidence_codes) if evidence_codes is not None
+                     else None,
+                     frozenset(aspects) if aspects is not None else None)
+        if cache_key not in self._gene_entries_cache:
+            _, _, entry_gene = self.term_genes(evidence_codes, aspects)
+            counts = numpy.bincount(entry_gene, minlength=len(self.genes))
+            self._gene_entries_cache[cache_key] = (
+                numpy.argsort(entry_gene, kind="mergesort"),
+                numpy.concatenate([[0], numpy.cumsum(counts)]))
+        return self._gene_entries_cache[cache_key]
+
+
+def _index_path(version):
+    #a file for each version of the annotations and ontology pair
+    path = os.path.join(environ.buffer_dir, "go_annotation_index")
+    try:
+        os.makedirs(path)
+    except OSError:
+        pass
+    name = hashlib.sha1(version.encode("utf-8"))
+    return os.path.join(path, name.hexdigest() + ".npz")
+
+
+class _EnrichmentCounts(object):
+    """
+    Reference dependent term counts shared by enrichment queries
+    against the same reference (see :func:`Annotations.get_enriched_terms`).
+    """
+    def __init__(self, index, reference, evidence_codes, aspects,
+                 slims_subset=None):
+        self.genes = index.genes
+        self._gene_index = index._gene_index
+        self.term_ids, self.entry_term, self.entry_gene = \
+            index.term_genes(evidence_codes, aspects)
+        self.ref_mask = index.gene_mask(reference)
+        self.reference_size = len(reference)
+        nterms = len(self.term_ids)
+        # reference counts of all annotated terms
+        self.ref_count = numpy.bincount(
+            self.entry_term, weights=self.ref_mask[self.entry_gene],
+            minlength=nterms).astype(int)
+        if slims_subset is not None:
+            self.selectable = numpy.array(
+                [t in slims_subset for t in self.term_ids], dtype=bool)
+        else:
+            self.selectable = numpy.ones(nterms, dtype=bool)
+        # a query only needs to look at the entries of its own genes
+        self._gene_entries, self._gene_ptr = \
+            index.gene_entries(evidence_codes, aspects)
+
+    def enriched_terms(self, genes, prob, use_fdr=True,
+                       progress_callback=None):
+        """
+        Return the enriched terms for a dict `genes` mapping canonical
+        gene names to the query names (as returned by
+        :func:`Annotations.get_gene_names_translator`).
+        """
+        gene_ids = sorted(set(self._gene_index[g] for g in genes
+                              if g in self._gene_index))
+        # all entries of the query genes, in (term, gene) order
+        entries = numpy.sort(numpy.concatenate(
+            [self._gene_entries[self._gene_ptr[g]:self._gene_ptr[g + 1]]
+             for g in gene_ids] or [numpy.zeros(0, dtype=int)]))
+        entry_term = self.entry_term[entries]
+        # terms in the super graph of the query's annotations
+        selected = numpy.unique(entry_term)
+        selected = selected[self.selectable[selected]]
+
+        mapped = self.ref_mask[self.entry_gene[entries]]
+        mapped_terms, first, mapped_count = numpy.unique(
+            entry_term[mapped], return_index=True, return_counts=True)
+        mapped_entries = numpy.split(entries[mapped], first[1:])
+        mapped_genes = dict(zip(mapped_terms.tolist(), mapped_entries))
+
+        counts = numpy.zeros(len(self.term_ids), dtype=int)
+        counts[mapped_terms] = mapped_count
+        mapped_count = counts[selected]
+        ref_count = self.ref_count[selected]
+
+        if hasattr(prob, "p_values"):
+            p_values = prob.p_values(mapped_count, self.reference_size,
+                                     ref_count, len(genes))
+        else:
+            p_values = [prob.p_value(k, self.reference_size, m, len(genes))
+                        for k, m in zip(mapped_count, ref_count)]
+        if use_fdr:
+            p_values = stats.fdr(p_values)
+
+        res = {}
+        milestones = progress_bar_milestones(len(selected), 100)
+        empty = numpy.zeros(0, dtype=int)
+        for i, (t, p, m) in enumerate(zip(selected.tolist(), p_values,
+                                          ref_count.tolist())):
+            res[str(self.term_ids[t])] = (
+                [genes[self.genes[g]] for g in
+                 self.entry_gene[mapped_genes.get(t, empty)].tolist()],
+                float(p), m)
+            if progress_callback and i in milestones:
+                progress_callback(100.0 * i / len(selected))
+        return res
+
+
+# _EnrichmentCounts shared by the worker processes of
+# Annotations.get_enriched_terms_batch
+_worker_counts = None
+
+
+def _init_enrichment_worker(counts):
+    global _worker_counts
+    _worker_counts = counts
+
+
+def _enrichment_worker(args):
+    genes, prob, use_fdr = args
+    return _worker_counts.enriched_terms(genes, prob, use_fdr)
+
+
 class Annotations(object):
     """
     :class:`Annotations` object holds the annotations.
@@ -646,22 +1721,20 @@ class Annotations(object):
                  progress_callback=None, rev=None):
         self.ontology = ontology
 
-        #: A dictionary mapping a gene name (DB_Object_Symbol) to a
-        #: set of all annotations of that gene.
-        self.gene_annotations = defaultdict(list)
-
-        #: A dictionary mapping a GO term id to a set of annotations that
-        #: are directly annotated to that term
-        self.term_anotations = defaultdict(list)
+        # columnar storage of all annotation records
+        self._store = _AnnotationStore()
 
         self.all_annotations = defaultdict(list)
 
         self._gene_names = None
         self._gene_names_dict = None
         self._alias_mapper = None
+        self._index = None
+
+        #: A string identifying the parsed source file (None if unknown or
+        #: if the annotations were modified after parsing).
+        self.source_version = None
 
-        #: A list of all :class:`AnnotationRecords` instances.
-        self.annotations = []
         self.header = ""
         self.genematcher = genematcher
         self.taxid = None
@@ -715,6 +1788,26 @@ class Annotations(object):
         if self.genematcher:
             self.genematcher.set_targets(self.gene_names)
 
+    @property
+    def annotations(self):
+        """A (read only) list of all :class:`AnnotationRecord` instances.
+        """
+        return _AnnotationList(self._store)
+
+    @property
+    def gene_annotations(self):
+        """A (read only) dictionary mapping a gene name (DB_Object_Symbol)
+        to a list of all annotations of that gene.
+        """
+        return _AnnotationGroups(self._store, "DB_Object_Symbol")
+
+    @property
+    def term_anotations(self):
+        """A (read only) dictionary mapping a GO term id to a list of
+        annotations that are directly annotated to that term.
+        """
+        return _AnnotationGroups(self._store, "GO_ID")
+
     @classmethod
     def organism_name_search(cls, org):
         ids = to_taxid(org)
@@ -751,6 +1844,7 @@ class Annotations(object):
         """Set the ontology to use in the annotations mapping.
         """
         self.all_annotations = defaultdict(list)
+        self._index = None
         self._ontology = ontology
 
     def get_ontology(self):
@@ -782,8 +1876,29 @@ class Annotations(object):
                 raise obiTaxonomy.UnknownSpeciesIdentifier(org + str(code))
             serverfiles.download("GO", filename)
 
-        return cls(path, ontology=ontology, genematcher=genematcher,
-                   progress_callback=progress_callback)
+        # Use the pre-parsed snapshot of the file if it is up to date,
+        # otherwise parse the file and (re)create the snapshot.
+        version = _serverfile_version(cls.version, "GO", filename)
+        snapshot_path = _snapshot_path(path)
+        annotations = cls(ontology=ontology)
+        annotations.genematcher = genematcher
+        try:
+            if version is None:
+                raise ValueError
+            annotations._load_snapshot(snapshot_path, version)
+            annotations.source_version = _file_version(path)
+        except (IOError, OSError, ValueError, KeyError):
+            annotations.parse_file(path, progress_callback)
+            if version is not None:
+                try:
+                    annotations._save_snapshot(snapshot_path, version)
+                except (IOError, OSError) as ex:
+                    warnings.warn("Could not save the annotations "
+                                  "snapshot: %s" % ex)
+
+        if annotations.genematcher:
+            annotations.genematcher.set_targets(annotations.gene_names)
+        return annotations
 
     Load = load
 
@@ -811,20 +1926,62 @@ class Annotations(object):
                 raise ValueError("Cannot open %r for parsing." % file)
         else:
             f = file
-        lines = [line for line in f.read().splitlines() if line.strip()]
-
+        first = not len(self._store)
+        data = f.read()
+        if not isinstance(data, basestring):
+            data = data.decode("utf-8")
+        lines = [line for line in data.splitlines() if line.strip()]
+
+        nfields = len(annotationFields)
+        gene, term, qualifier = [annotationFields.index(field) for field in
+                                 ["DB_Object_Symbol", "GO_ID", "Qualifier"]]
         milestones = progress_bar_milestones(len(lines), 100)
         for i, line in enumerate(lines):
             if line.startswith("!"):
                 self.header = self.header + line + "\n"
                 continue
 
-            a = AnnotationRecord.from_string(line)
-            self.add_annotation(a)
+            fields = line.split("\t")
+            if len(fields) != nfields:
+                raise TypeError("Expected %i fields, got %i" %
+                                (nfields, len(fields)))
+            if fields[gene] and fields[term] and fields[qualifier] != "NOT":
+                self._store.append(fields)
 
             if progress_callback and i in milestones:
                 progress_callback(100.0 * i / len(lines))
 
+        self._invalidate()
+        if first and isinstance(file, basestring):
+            self.source_version = _file_version(file)
+
+    def _save_snapshot(self, path, version):
+        """
+        Save the annotations into a snapshot directory `path`, with one
+        integer coded column (and a pool of unique strings) for each
+        annotation field.
+        """
+        arrays = {}
+        for field in annotationFields:
+            arrays[field] = self._store.column(field)
+            arrays.update(snapshot.StringPool.from_strings(
+                self._store.pool(field)).arrays(field))
+        snapshot.save(path, arrays, version, {"header": self.header})
+
+    def _load_snapshot(self, path, version=None):
+        """
+        Load (add) the annotations from a snapshot directory `path` (see
+        :func:`_save_snapshot`). The (memory mapped) columns are used as
+        they are if there were no annotations before.
+        """
+        arrays, meta = snapshot.load(path, version)
+        pools = [snapshot.StringPool.from_arrays(arrays, field).tolist()
+                 for field in annotationFields]
+        self._store.extend(_AnnotationStore(
+            [arrays[field] for field in annotationFields], pools))
+        self.header = self.header + meta["header"]
+        self._invalidate()
+
     def add_annotation(self, a):
         """Add a single :class:`AnotationRecord` instance to this object.
         """
@@ -833,10 +1990,14 @@ class Annotations(object):
         if not a.geneName or not a.GOId or a.Qualifier == "NOT":
             return
 
-        self.gene_annotations[a.geneName].append(a)
-        self.annotations.append(a)
-        self.term_anotations[a.GOId].append(a)
+        self._store.append(a)
+        self._invalidate()
+
+    def _invalidate(self):
+        # Clear all cached data derived from the annotations.
         self.all_annotations = defaultdict(list)
+        self._index = None
+        self.source_version = None
 
         self._gene_names_dict = None
         self._gene_names = None
@@ -853,17 +2014,19 @@ class Annotations(object):
     @property
     def gene_names(self):
         if self._gene_names is None:
-            self._gene_names = set([ann.geneName for ann in self.annotations])
+            self._gene_names = set(self._store.pool("DB_Object_Symbol"))
         return self._gene_names
 
     @property
     def alias_mapper(self):
         if self._alias_mapper is None:
             self._alias_mapper = {}
-            for ann in self.annotations:
-                self._alias_mapper.update([(alias, ann.geneName)
-                                           for alias in ann.alias +
-                                            [ann.geneName, ann.DB_Object_ID]])
+            for name, synonyms, object_id in self._store.unique(
+                    ["DB_Object_Symbol", "DB_Object_Synonym",
+                     "DB_Object_ID"]):
+                self._alias_mapper.update(
+                    [(intern(alias), name) for alias in synonyms.split("|")] +
+                    [(name, name), (object_id, name)])
         return self._alias_mapper
 
     def get_gene_names_translator(self, genes):
@@ -880,26 +2043,16 @@ class Annotations(object):
 
         return dict([(alias(gene), gene) for gene in genes if alias(gene)])
 
-    def _collect_annotations(self, id, visited):
-        """ Recursive function collects and caches all annotations for id
+    def _collect_annotations(self, id, visited=None):
+        """ Collect and cache lists of annotations for id and all its sub terms
         """
-        if id not in self.all_annotations and id not in visited:
-            if id in self.ontology.reverse_alias_mapper:
-                annotations = [self.term_anotations.get(alt_id, [])
-                               for alt_id in
-                               self.ontology.reverse_alias_mapper[id]] + \
-                              [self.term_anotations[id]]
-            else:
-                ## annotations for this term alone
-                annotations = [self.term_anotations[id]]
-            visited.add(id)
-            for typeId, child in self.ontology[id].related_to:
-                aa = self._collect_annotations(child, visited)
-                if type(aa) == set:
-                    ## if it was already reduced in get_all_annotations
-                    annotations.append(aa)
-                else:
-                    annotations.extend(aa)
+        if id not in self.all_annotations:
+            alt_ids = self.ontology.reverse_alias_mapper
+            annotations = []
+            for term in self.ontology.extract_sub_graph([id]):
+                annotations.extend(self.term_anotations.get(alt_id, [])
+                                   for alt_id in alt_ids.get(term, ()))
+                annotations.append(self.term_anotations.get(term, []))
             self.all_annotations[id] = annotations
         return self.all_annotations[id]
 
@@ -917,7 +2070,7 @@ class Annotations(object):
         if id not in self.all_annotations or \
                 type(self.all_annotations[id]) == list:
             annot_set = set()
-            for annots in self._collect_annotations(id, set()):
+            for annots in self._collect_annotations(id):
                 annot_set.update(annots)
             self.all_annotations[id] = annot_set
         return self.all_annotations[id]
@@ -938,6 +2091,39 @@ class Annotations(object):
         return list(set([ann.geneName for ann in annotations
                          if ann.Evidence_Code in evidence_codes]))
 
+    def get_index(self):
+        """
+        Return an :class:`AnnotationIndex` for these annotations and
+        the current ontology.
+
+        If both the annotations and the ontology were parsed from files
+        the index is cached on disk and rebuilt only when either of the
+        files changes.
+        """
+        self._ensure_ontology()
+        if self._index is not None:
+            return self._index
+
+        version = None
+        if self.source_version and self.ontology.source_version:
+            version = "%s|%s" % (self.source_version,
+                                 self.ontology.source_version)
+        if version is not None:
+            filename = _index_path(version)
+            try:
+                self._index = AnnotationIndex.load(filename, version)
+            except Exception:
+                self._index = AnnotationIndex.build(
+                    self, self.ontology, version=version)
+                try:
+                    self._index.save(filename)
+                except (IOError, OSError):
+                    warnings.warn("Could not save the annotation index.",
+                                  UserWarning)
+        else:
+            self._index = AnnotationIndex.build(self, self.ontology)
+        return self._index
+
     def get_enriched_terms(self, genes, reference=None, evidence_codes=None,
                            slims_only=False, aspect=None,
                            prob=stats.Binomial(), use_fdr=True,
@@ -958,10 +2144,66 @@ class Annotations(object):
 
         """
         revGenesDict = self.get_gene_names_translator(genes)
-        genes = set(revGenesDict.keys())
+        counts = self._enrichment_counts(revGenesDict, reference,
+                                         evidence_codes, slims_only, aspect)
+        return counts.enriched_terms(revGenesDict, prob, use_fdr,
+                                     progress_callback)
+
+    def get_enriched_terms_batch(self, gene_lists, reference=None,
+                                 evidence_codes=None, slims_only=False,
+                                 aspect=None, prob=stats.Binomial(),
+                                 use_fdr=True, n_jobs=1,
+                                 progress_callback=None):
+        """ Return a list of enriched terms (as returned by
+        :func:`get_enriched_terms`) for each list of genes in
+        `gene_lists`. The reference counts are computed only once
+        and shared by all queries.
+
+        :param n_jobs:
+            Number of worker processes to use (`None` for the number
+            of CPUs). The queries are run in this process by default.
+
+        Other parameters are the same as for :func:`get_enriched_terms`.
+
+        """
+        queries = [self.get_gene_names_translator(genes)
+                   for genes in gene_lists]
+        union = {}
+        for query in queries:
+            union.update(query)
+        counts = self._enrichment_counts(union, reference, evidence_codes,
+                                         slims_only, aspect)
+
+        results = []
+        milestones = progress_bar_milestones(len(queries), 100)
+        if n_jobs == 1 or len(queries) < 2:
+            jobs = (counts.enriched_terms(query, prob, use_fdr)
+                    for query in queries)
+            pool = None
+        else:
+            pool = multiprocessing.Pool(n_jobs, _init_enrichment_worker,
+                                        (counts,))
+            jobs = pool.imap(_enrichment_worker,
+                             [(query, prob, use_fdr) for query in queries],
+                             chunksize=max(len(queries) // 64, 1))
+        try:
+            for i, res in enumerate(jobs):
+                results.append(res)
+                if progress_callback and i in milestones:
+                    progress_callback(100.0 * i / len(queries))
+        finally:
+            if pool is not None:
+                pool.terminate()
+        return results
+
+    def _enrichment_counts(self, genes, reference, evidence_codes,
+                           slims_only, aspect):
+        """ Return the :class:`_EnrichmentCounts` for `reference`
+        (warning about query `genes` annotated to terms missing from
+        the ontology).
+        """
         if reference:
-            refGenesDict = self.get_gene_names_translator(reference)
-            reference = set(refGenesDict.keys())
+            reference = set(self.get_gene_names_translator(reference))
         else:
             reference = self.gene_names
 
@@ -973,21 +2215,10 @@ class Annotations(object):
             aspects_set = aspect
 
         evidence_codes = set(evidence_codes or evidenceDict.keys())
-        annotations = [ann
-                       for gene in genes for ann in self.gene_annotations[gene]
-                       if ann.Evidence_Code in evidence_codes and
-                       ann.Aspect in aspects_set]
-
-        refAnnotations = set(
-            [ann
-             for gene in reference for ann in self.gene_annotations[gene]
-             if ann.Evidence_Code in evidence_codes and
-             ann.Aspect in aspects_set]
-        )
-
-        annotationsDict = defaultdict(set)
-        for ann in annotations:
-            annotationsDict[ann.GO_ID].add(ann)
+        terms = set(ann.GO_ID
+                    for gene in genes for ann in self.gene_annotations[gene]
+                    if ann.Evidence_Code in evidence_codes and
+                    ann.Aspect in aspects_set)
 
         self._ensure_ontology()
         if slims_only and not self.ontology.slims_subset:
@@ -995,7 +2226,6 @@ class Annotations(object):
                           "Using 'goslim_generic' subset", UserWarning)
             self.ontology.set_slims_subset("goslim_generic")
 
-        terms = annotationsDict.keys()
         filteredTerms = [term for term in terms if term in self.ontology]
 
         if len(terms) != len(filteredTerms):
@@ -1004,34 +2234,9 @@ class Annotations(object):
                           "ontology." % ",".join(map(repr, termDiff)),
                           UserWarning)
 
-        terms = self.ontology.extract_super_graph(filteredTerms)
-        res = {}
-
-        milestones = progress_bar_milestones(len(terms), 100)
-        for i, term in enumerate(terms):
-            if slims_only and term not in self.ontology.slims_subset:
-                continue
-            allAnnotations = self.get_all_annotations(term).intersection(refAnnotations)
-##            allAnnotations.intersection_update(refAnnotations)
-            allAnnotatedGenes = set([ann.geneName for ann in allAnnotations])
-            mappedGenes = genes.intersection(allAnnotatedGenes)
-
-            if len(reference) > len(allAnnotatedGenes):
-                mappedReferenceGenes = reference.intersection(allAnnotatedGenes)
-            else:
-                mappedReferenceGenes = allAnnotatedGenes.intersection(reference)
-            res[term] = ([revGenesDict[g] for g in mappedGenes],
-                         prob.p_value(len(mappedGenes), len(reference),
-                                      len(mappedReferenceGenes), len(genes)),
-                         len(mappedReferenceGenes))
-            if progress_callback and i in milestones:
-                progress_callback(100.0 * i / len(terms))
-        if use_fdr:
-            res = sorted(res.items(), key=lambda x: x[1][1])
-            res = dict([(id, (genes, p, ref))
-                        for (id, (genes, _, ref)), p in
-                        zip(res, stats.FDR([p for _, (_, p, _) in res]))])
-        return res
+        return _EnrichmentCounts(
+            self.get_index(), reference, evidence_codes, aspects_set,
+            self.ontology.slims_subset if slims_only else None)
 
     def get_annotated_terms(self, genes, direct_annotation_only=False,
                             evidence_codes=None, progress_callback=None):
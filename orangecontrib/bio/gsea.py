@@ -11,6 +11,11 @@ import Orange
 
 from . import geneset as obiGeneSets
 from .utils.expression import *
+from .utils.enrichment import (
+    nth, orderedPointersCorr, enrichmentScoreRanked, _SetMembership,
+    enrichmentScoresRanked, shuffleLabels, shuffleList, runOptCallbacks,
+    _significance, gseaSignificance, GenesetMembership
+)
 from . import gene as obiGene
 
 """
@@ -38,107 +43,18 @@ def rankingFromOrangeMeas(meas):
     results in a list. Ranking function is build out of 
     orange.MeasureAttribute.
     """
-    return lambda d: [ meas(i,d) for i in range(len(d.domain.attributes)) ]
+    return _MeasureRanking(meas)
 
-def orderedPointersCorr(lcor):
+class _MeasureRanking(object):
     """
-    Return a list of integers: indexes in original
-    lcor. Elements in the list are ordered by
-    their lcor[i] value. Higher correlations first.
+    Ranking function of rankingFromOrangeMeas (a class, not a lambda,
+    so that it can be pickled for the permutation processes).
     """
-    ordered = [ (i,a) for i,a in enumerate(lcor) ] #original pos + correlation
-    ordered.sort(key=lambda x: -x[1]) #sort by correlation, descending
-    ordered = nth(ordered, 0) #contains positions in the original list
-    return ordered
+    def __init__(self, meas):
+        self.meas = meas
 
-def enrichmentScoreRanked(subset, lcor, ordered, p=1.0, rev2=None):
-    """
-    Input data and subset. 
-    
-    subset: list of attribute indices of the input data belonging
-        to the same set.
-    lcor: correlations with class for each attribute in a list. 
-
-    Returns enrichment score on given data.
-
-    This implementation efficiently handles "sparse" genesets (that
-    cover only a small subset of all genes in the dataset).
-    """
-
-    #print lcor
-
-    subset = set(subset)
-
-    if rev2 == None:
-        def rev(l):
-            return numpy.argsort(l)
-        rev2 = rev(ordered)
-
-    #add if gene is not in the subset
-    notInA = -(1. / (len(lcor)-len(subset)))
-    #base for addition if gene is in the subset
-
-    cors = [ abs(lcor[i])**p for i in subset ] #belowe in numpy
-    sumcors = sum(cors)
-
-    #this should not happen
-    if sumcors == 0.0:
-        return (0.0, None)
-    
-    inAb = 1./sumcors
-
-    ess = [0.0]
-    
-    map = {}
-    for i in subset:
-        orderedpos = rev2[i]
-        map[orderedpos] = inAb*abs(lcor[i]**p)
-        
-    last = 0
-
-    maxSum = minSum = csum = 0.0
-
-    for a,b in sorted(map.items()):
-        diff = a-last
-        csum += notInA*diff
-        last = a+1
-        
-        if csum < minSum:
-            minSum = csum
-        
-        csum += b
-
-        if csum > maxSum:
-            maxSum = csum
-
-    #finish it
-    diff = (len(ordered))-last
-    csum += notInA*diff
-
-    if csum < minSum:
-        minSum = csum
-
-    #print "MY", (maxSum if abs(maxSum) > abs(minSum) else minSum)
-
-    """
-    #BY DEFINITION
-    print("subset", subset)
-
-    for i in ordered:
-        ess.append(ess[-1] + \
-            (inAb*abs(lcor[i]**p) if i in subset else notInA)
-        )
-        if i in subset:
-            print(ess[-2], ess[-1])
-            print(i, (inAb*abs(lcor[i]**p)))
-
-    maxEs = max(ess)
-    minEs = min(ess)
-    
-    print("REAL", (maxEs if abs(maxEs) > abs(minEs) else minEs, ess[1:]))
-
-    """
-    return (maxSum if abs(maxSum) > abs(minSum) else minSum, [])
+    def __call__(self, d):
+        return [ self.meas(i,d) for i in range(len(d.domain.attributes)) ]
 
 #from mOrngData
 def shuffleAttribute(data, attribute, locations):
@@ -170,15 +86,6 @@ def shuffleClass(datai, rands=0):
     else:
         return [ shuffleOne(data) for data in datai ]
 
-def shuffleList(l, rand=random.Random(0)):
-    """
-    Returns a copy of a shuffled input list.
-    """
-    import copy
-    l2 = copy.copy(l)
-    rand.shuffle(l2)
-    return l2
-
 def shuffleAttributes(data, rand=random.Random(0)):
     """
     Returns a dataset with a new attribute order.
@@ -217,26 +124,41 @@ def enrichmentScore(data, subset, rankingf):
     return es,l
 
 def gseaE(data, subsets, rankingf=None, \
-        n=100, permutation="class", callback=None):
+        n=100, permutation="class", callback=None, n_jobs=1,
+        streaming=False):
     """
     Run GSEA algorithm on an example table.
 
     data: orange example table. 
     subsets: list of distinct subsets of data.
     rankingf: function that returns correlation to class of each 
-        variable.
+        variable. By default genes are ranked by signal to noise ratio
+        (utils.expression.signal_to_noise); genes with an undefined
+        ratio (a class with less than two values) score 0, where
+        MA_signalToNoise gave NaN, which has no defined rank.
     n: number of random permutations to sample null distribution.
     permutation: "class" for permutating class, else permutate attribute 
         order.
-
-    """
-
-    if not rankingf:
-        rankingf=rankingFromOrangeMeas(MA_signalToNoise())
-
-    enrichmentScores = []
- 
-    lcor = rankingf(data)
+    n_jobs: number of processes computing the permutations (None for
+        the number of CPUs). Results do not depend on it.
+    streaming: do not keep all null enrichment scores, but only their
+        statistics needed for significance (see
+        utils.enrichment._StreamingNulls). Memory use then does not
+        depend on n, but the permutations are computed twice.
+
+    """
+
+    if not rankingf and permutation == "class" and iset(data):
+        #rank all genes for each class permutation at once
+        X, labels = data.toNumpyMA("A/C")
+        data = (X, labels.filled(-1).astype(int))
+        rankingf = signal_to_noise
+        permutation = "matrix"
+        lcor = rankingf(*data).tolist()
+    else:
+        if not rankingf:
+            rankingf=rankingFromOrangeMeas(MA_signalToNoise())
+        lcor = rankingf(data)
     #print lcor
 
     ordered = orderedPointersCorr(lcor)
@@ -246,46 +168,25 @@ def gseaE(data, subsets, rankingf=None, \
 
     rev2 = rev(ordered)
 
-    for subset in subsets:
-        es = enrichmentScoreRanked(subset, lcor, ordered, rev2=rev2)[0]
-        enrichmentScores.append(es)
+    members = _SetMembership(subsets)
+    enrichmentScores = enrichmentScoresRanked(members, lcor, ordered,
+                                              rev2=rev2).tolist()
 
     runOptCallbacks(callback)
 
     #print "PERMUTATION", permutation
 
-    enrichmentNulls = [ [] for a in range(len(subsets)) ]
-
-    for i in range(n):
-
-        if permutation == "class":
-            d2 = shuffleClass(data, 2000+i) #fixed permutation
-            r2 = rankingf(d2)
-        else:
-            r2 = shuffleList(lcor, random.Random(2000+i))
-
-        ordered2 = orderedPointersCorr(r2)
-        rev22 = rev(ordered2)
-        for si,subset in enumerate(subsets):
-            esn = enrichmentScoreRanked(subset, r2, ordered2, rev2=rev22)[0]
-            enrichmentNulls[si].append(esn)
-
-        runOptCallbacks(callback)
-
-    return gseaSignificance(enrichmentScores, enrichmentNulls)
+    if permutation == "class":
+        permutation = shuffleClass
 
+    return _significance(enrichmentScores,
+        (data, rankingf, lcor, members, permutation), n, n_jobs, callback,
+        streaming)
 
-def runOptCallbacks(callback):
-    if callback is not None:
-        try:
-            [ a() for a in callback ]
-        except:
-            callback()            
 
-def gseaR(rankings, subsets, n, callback=None):
+def gseaR(rankings, subsets, n, callback=None, n_jobs=1, streaming=False):
     """
     """
-    enrichmentScores = []
     ordered = orderedPointersCorr(rankings)
     
     def rev(l):
@@ -293,182 +194,16 @@ def gseaR(rankings, subsets, n, callback=None):
 
     rev2 = rev(ordered)
 
-    for subset in subsets:
+    members = _SetMembership(subsets)
+    enrichmentScores = enrichmentScoresRanked(members, rankings, ordered,
+                                              rev2=rev2).tolist()
 
-        es = enrichmentScoreRanked(subset, rankings, ordered, rev2=rev2)[0]
-        enrichmentScores.append(es)
-    
     runOptCallbacks(callback)
 
-    enrichmentNulls = [ [] for a in range(len(subsets)) ]
-
-    for i in range(n):
-        
-        r2 = shuffleList(rankings, random.Random(2000+i))
-        ordered2 = orderedPointersCorr(r2)
-        rev22 = rev(ordered2)
-
-        for si,subset in enumerate(subsets):
-
-            esn = enrichmentScoreRanked(subset, r2, ordered2, rev2=rev22)[0]
-            enrichmentNulls[si].append(esn)
-
-        runOptCallbacks(callback)
-
-    return gseaSignificance(enrichmentScores, enrichmentNulls)
-
-
-def gseaSignificance(enrichmentScores, enrichmentNulls):
-
-    #print enrichmentScores
-
-    import time
-
-    tb1 = time.time()
-
-    enrichmentPVals = []
-    nEnrichmentScores = []
-    nEnrichmentNulls = []
+    return _significance(enrichmentScores,
+        (None, None, rankings, members, "attributes"), n, n_jobs, callback,
+        streaming)
 
-    for i in range(len(enrichmentScores)):
-        es = enrichmentScores[i]
-        enrNull = enrichmentNulls[i]
-        #print es, enrNull
-
-        enrichmentPVals.append(gseapval(es, enrNull))
-
-        #normalize the ES(S,pi) and the observed ES(S), separetely rescaling
-        #the positive and negative scores by divident by the mean of the 
-        #ES(S,pi)
-
-        #print es, enrNull
-
-        def normalize(s):
-            try:
-                if s == 0:
-                    return 0.0
-                if s >= 0:
-                    meanPos = mean([a for a in enrNull if a >= 0])
-                    #print s, meanPos
-                    return s/meanPos
-                else:
-                    meanNeg = mean([a for a in enrNull if a < 0])
-                    #print s, meanNeg
-                    return -s/meanNeg
-            except:
-                return 0.0 #return if according mean value is uncalculable
-
-
-        nes = normalize(es)
-        nEnrichmentScores.append(nes)
-        
-        nenrNull = [ normalize(s) for s in enrNull ]
-        nEnrichmentNulls.append(nenrNull)
- 
-
-    #print "First part", time.time() - tb1
-
-    #FDR computation
-    #create a histogram of all NES(S,pi) over all S and pi
-    vals = reduce(lambda x,y: x+y, nEnrichmentNulls, [])
-
-
-    def shorten(l, p=10000):
-        """
-        Take each len(l)/p element, if len(l)/p >= 2.
-        """
-        e = len(l)/p
-        if e <= 1:
-            return l
-        else:
-            return [ l[i] for i in xrange(0, len(l), e) ]
-
-    #vals = shorten(vals) -> this can speed up second part. is it relevant TODO?
-
-    """
-    Use this null distribution to compute an FDR q value, for a given NES(S) =
-    NES* >= 0. The FDR is the ratio of the percantage of all (S,pi) with
-    NES(S,pi) >= 0, whose NES(S,pi) >= NES*, divided by the percentage of
-    observed S wih NES(S) >= 0, whose NES(S) >= NES*, and similarly if NES(S)
-    = NES* <= 0.
-    """
-
-    nvals = numpy.array(sorted(vals))
-    nnes = numpy.array(sorted(nEnrichmentScores))
-
-    #print "LEN VALS", len(vals), len(nEnrichmentScores)
-
-    fdrs = []
-
-    import operator
-
-    for i in range(len(enrichmentScores)):
-
-        nes = nEnrichmentScores[i]
-
-        """
-        #Strighfoward but slow implementation follows in comments.
-        #Useful as code description.
-        
-        if nes >= 0:
-            op0 = operator.ge
-            opn = operator.ge
-        else:
-            op0 = operator.lt
-            opn = operator.le
-
-        allPos = [a for a in vals if op0(a,0)]
-        allHigherAndPos = [a for a in allPos if opn(a,nes) ]
-
-        nesPos = [a for a in nEnrichmentScores if op0(a,0) ]
-        nesHigherAndPos = [a for a in nesPos if opn(a,nes) ]
-
-        top = len(allHigherAndPos)/float(len(allPos)) #p value
-        down = len(nesHigherAndPos)/float(len(nesPos))
-        
-        l1 = [ len(allPos), len(allHigherAndPos), len(nesPos), len(nesHigherAndPos)]
-
-        allPos = allHigherAndPos = nesPos =  nesHigherAndPos = 1
-
-        """
-
-        #this could be speed up twice with the same accuracy! 
-        if nes >= 0:
-            allPos = int(len(vals) - numpy.searchsorted(nvals, 0, side="left"))
-            allHigherAndPos = int(len(vals) - numpy.searchsorted(nvals, nes, side="left"))
-            nesPos = len(nnes) - int(numpy.searchsorted(nnes, 0, side="left"))
-            nesHigherAndPos = len(nnes) - int(numpy.searchsorted(nnes, nes, side="left"))
-        else:
-            allPos = int(numpy.searchsorted(nvals, 0, side="left"))
-            allHigherAndPos = int(numpy.searchsorted(nvals, nes, side="right"))
-            nesPos = int(numpy.searchsorted(nnes, 0, side="left"))
-            nesHigherAndPos = int(numpy.searchsorted(nnes, nes, side="right"))
-           
-        """
-        #Comparing results
-        l2 = [ allPos, allHigherAndPos, nesPos, nesHigherAndPos ]
-        diffs = [ l1[i]-l2[i] for i in range(len(l1)) ]
-        sumd = sum( [ abs(a) for a in diffs ] )
-        if sumd > 0:
-            print(nes > 0)
-            print("orig", l1)
-            print("modi", l2)
-        """
-
-        try:
-            top = allHigherAndPos/float(allPos) #p value
-            down = nesHigherAndPos/float(nesPos)
-
-            fdrs.append(top/down)
-        except:
-            fdrs.append(1000000000.0)
-    
-    #print "Whole part", time.time() - tb1
-
-    return zip(enrichmentScores, nEnrichmentScores, enrichmentPVals, fdrs)
-
-
-def nth(l,n): return [ a[n] for a in l ]
 
 def itOrFirst(data):
     """ Returns input if input is of type ExampleTable, else returns first
@@ -863,6 +598,7 @@ class GSEA(object):
 
         self.gsweights = {}
         self.namesToIndices = None
+        self._membership = None
         self.gm = matcher
 
         data = transform_data(data, phenVar, geneVar)
@@ -897,9 +633,37 @@ class GSEA(object):
         """
         for g in obiGeneSets.GeneSets(genesets):
             genes = g.genes
-            datamatch = filter(lambda x: x[1] != None, 
-                [ (gene, self.gm.umatch(gene)) for gene in genes])
+            datamatch = [ (gene, match) for gene, match in
+                [ (gene, self.gm.umatch(gene)) for gene in genes]
+                if match != None ]
             self.genesets[g] = datamatch
+        self._membership = None
+
+    def attributeNames(self):
+        return [ a.name for a in itOrFirst(self.data).domain.attributes ]
+
+    def membership(self):
+        """
+        Return the compiled membership of added gene sets (a
+        GenesetMembership). It is built once and cached.
+        """
+        if self._membership is None:
+            gsets = list(self.genesets)
+            self._membership = GenesetMembership(self.attributeNames(),
+                gsets, [ self.genesets[g] for g in gsets ])
+        return self._membership
+
+    def setMembership(self, membership):
+        """
+        Use a compiled membership (of gene sets matched with the same
+        matcher) instead of adding and matching the gene sets. Raise
+        ValueError if it was built for data with different attributes.
+        """
+        if tuple(self.attributeNames()) != membership.attributes:
+            raise ValueError("Gene set membership for different attributes")
+        self.genesets = dict( (g, membership.matches(i))
+                              for i, g in enumerate(membership.genesets) )
+        self._membership = membership
 
     def selectGenesets(self, minSize=3, maxSize=1000, minPart=0.1):
         """ Returns a list of gene sets that have sizes in limits """
@@ -930,28 +694,25 @@ class GSEA(object):
         """
         return dict( (gs, self.genesIndices(nth(self.genesets[gs],1))) for gs in gsets)
 
-    def compute(self, minSize=3, maxSize=1000, minPart=0.1, n=100, callback=None, rankingf=None, permutation="class"):
-
-        subsetsok = self.selectGenesets(minSize=minSize, maxSize=maxSize, minPart=minPart)
-
-        gsetsnum = self.to_gsetsnum(subsetsok.keys())
-        gsetsnumit = gsetsnum.items() #to fix order
+    def compute(self, minSize=3, maxSize=1000, minPart=0.1, n=100, callback=None, rankingf=None, permutation="class", n_jobs=1, streaming=False):
 
-        #gsetsnumit = gsetsnumit[:1]
-        #print gsetsnumit
+        membership = self.membership()
+        selected = membership.select(minSize=minSize, maxSize=maxSize, minPart=minPart).tolist()
+        subsets = [ membership.columns(i).tolist() for i in selected ]
 
-        if len(gsetsnum) == 0:
+        if len(selected) == 0:
             return {} # quick return if no genesets
 
         if len(itOrFirst(self.data)) > 1:
-            gseal = gseaE(self.data, nth(gsetsnumit,1), n=n, callback=callback, permutation=permutation, rankingf=rankingf)
+            gseal = gseaE(self.data, subsets, n=n, callback=callback, permutation=permutation, rankingf=rankingf, n_jobs=n_jobs, streaming=streaming)
         else:
             rankings = [ self.data[0][at].native() for at in self.data.domain.attributes ]
-            gseal = gseaR(rankings, nth(gsetsnumit,1), n, callback=None)
+            gseal = gseaR(rankings, subsets, n, callback=None, n_jobs=n_jobs, streaming=streaming)
 
         res = {}
 
-        for gs, gseale in zip(nth(gsetsnumit,0),gseal):
+        for i, gseale in zip(selected, gseal):
+            gs = membership.genesets[i]
             rdict = {}
             rdict['es'] = gseale[0]
             rdict['nes'] = gseale[1]
@@ -965,7 +726,7 @@ class GSEA(object):
         return res
 
 def direct(data, gene_sets, matcher, min_size=3, max_size=1000, min_part=0.1,
-    gene_desc=None, n=100, callback=None):
+    gene_desc=None, n=100, callback=None, n_jobs=1, streaming=False):
     """ Gene Set Enrichment analysis for pre-computed correlations
     between genes and phenotypes. 
     
@@ -980,11 +741,13 @@ def direct(data, gene_sets, matcher, min_size=3, max_size=1000, min_part=0.1,
 
     assert len(data.domain.attributes) == 1 or len(data) == 1
     return runGSEA(data, geneSets=gene_sets, matcher=matcher, minSize=min_size, 
-        maxSize=max_size, minPart=min_part, n=n, geneVar=gene_desc, callback=callback)
+        maxSize=max_size, minPart=min_part, n=n, geneVar=gene_desc, callback=callback,
+        n_jobs=n_jobs, streaming=streaming)
 
 def run(data, gene_sets, matcher, min_size=3, max_size=1000, min_part=0.1,
     at_least=3, phenotypes=None, gene_desc=None, phen_desc=None, n=100, 
-    permutation="phenotype", callback=None, rankingf=None):
+    permutation="phenotype", callback=None, rankingf=None, n_jobs=1,
+    streaming=False):
     """ Run Gene Set Enrichment Analysis.
 
     :param Orange.data.Table data: Gene expression data.  
@@ -995,6 +758,12 @@ def run(data, gene_sets, matcher, min_size=3, max_size=1000, min_part=0.1,
         a chosen phenotypes are analysed. Default: values phenotypes
         of ``phen_desc``.
     :param n: Number of permutations for significance computation. Default: 100.
+    :param int n_jobs: Number of processes computing the permutations
+        (None for the number of CPUs). Results do not depend on it.
+        Default: 1.
+    :param bool streaming: Keep only statistics of null enrichment scores
+        (memory use independent of `n`). The results are the same, but
+        the permutations are computed twice. Default: False.
     :param str permutation: Permutation type, "phenotype" (default) for 
         phenotypes, "gene" for genes.
     :param int min_size:
@@ -1033,19 +802,19 @@ def run(data, gene_sets, matcher, min_size=3, max_size=1000, min_part=0.1,
     return runGSEA(data, geneSets=gene_sets, matcher=matcher, minSize=min_size, 
         maxSize=max_size, minPart=min_part, n=n, permutation=permutation, 
         geneVar=gene_desc, callback=callback, phenVar=phen_desc, 
-        classValues=phenotypes)
+        classValues=phenotypes, n_jobs=n_jobs, streaming=streaming)
 
 def runGSEA(data, organism=None, classValues=None, geneSets=None, n=100, 
         permutation="class", minSize=3, maxSize=1000, minPart=0.1, atLeast=3, 
         matcher=None, geneVar=None, phenVar=None, caseSensitive=False, 
-        rankingf=None, callback=None):
+        rankingf=None, callback=None, n_jobs=1, streaming=False):
     gso = GSEA(data, organism=organism, matcher=matcher, 
         classValues=classValues, atLeast=atLeast, caseSensitive=caseSensitive,
         geneVar=geneVar, phenVar=phenVar)
     gso.addGenesets(geneSets)
     res1 = gso.compute(n=n, permutation=permutation, minSize=minSize,
         maxSize=maxSize, minPart=minPart, rankingf=rankingf,
-        callback=callback)
+        callback=callback, n_jobs=n_jobs, streaming=streaming)
     return res1
 
 def etForAttribute(datal,a):
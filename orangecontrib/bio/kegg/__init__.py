@@ -75,6 +75,8 @@ from orangecontrib.bio.kegg import pathway
 
 from functools import reduce
 
+import numpy
+
 KEGGGenome = databases.Genome
 KEGGGenes = databases.Genes
 KEGGEnzyme = databases.Enzyme
@@ -90,6 +92,70 @@ KEGGPathway = pathway.Pathway
 DEFAULT_CACHE_DIR = conf.params["cache.path"]
 
 
+class _GenePathwayIndex(object):
+    """
+    A gene to pathway index of a KEGG link table of (gene_id, pathway_id)
+    pairs. The pathways of gene ``gene_ids[i]`` are
+    ``pathway_ids[indices[indptr[i]:indptr[i + 1]]]``.
+    """
+    def __init__(self, gene_ids, pathway_ids, indptr, indices):
+        self.gene_ids = gene_ids
+        self.pathway_ids = pathway_ids
+        self.indptr = indptr
+        self.indices = indices
+        self.gene_index = dict((gene, i) for i, gene in enumerate(gene_ids))
+
+    @classmethod
+    def from_links(cls, links):
+        links = sorted(set(map(tuple, links)))
+        pathway_ids = sorted(set(pid for _, pid in links))
+        pathway_index = dict((pid, i) for i, pid in enumerate(pathway_ids))
+        gene_index = {}
+        genes = [gene_index.setdefault(gene, len(gene_index))
+                 for gene, _ in links]
+        # links are sorted by gene ids, so each gene's pathways are
+        # a contiguous range
+        indices = numpy.array([pathway_index[pid] for _, pid in links],
+                              dtype=int)
+        indptr = numpy.zeros(len(gene_index) + 1, dtype=int)
+        numpy.cumsum(numpy.bincount(genes, minlength=len(gene_index)),
+                     out=indptr[1:])
+        return cls(sorted(gene_index, key=gene_index.get), pathway_ids,
+                   indptr, indices)
+
+    def links(self):
+        """Return the indexed (gene_id, pathway_id) pairs."""
+        return [(gene, self.pathway_ids[p])
+                for i, gene in enumerate(self.gene_ids)
+                for p in self.indices[self.indptr[i]:self.indptr[i + 1]]]
+
+    def pathways(self, gene):
+        """Return a list of pathway ids of `gene`."""
+        i = self.gene_index.get(gene)
+        if i is None:
+            return []
+        return [self.pathway_ids[p]
+                for p in self.indices[self.indptr[i]:self.indptr[i + 1]]]
+
+    def gene_links(self, genes):
+        """
+        Return the links of a sequence of `genes` as a pair of arrays
+        (positions in `genes`, pathway indices), ordered by position.
+        """
+        rows = [(pos, self.gene_index[gene]) for pos, gene in enumerate(genes)
+                if gene in self.gene_index]
+        if not rows:
+            return numpy.zeros(0, dtype=int), numpy.zeros(0, dtype=int)
+        positions, rows = numpy.array(rows, dtype=int).T
+        starts, ends = self.indptr[rows], self.indptr[rows + 1]
+        lengths = ends - starts
+        # concatenated ranges starts[i]:ends[i]
+        offsets = numpy.repeat(starts - numpy.cumsum(lengths) + lengths,
+                               lengths)
+        return (numpy.repeat(positions, lengths),
+                self.indices[offsets + numpy.arange(lengths.sum())])
+
+
 class Organism(object):
     """
     A convenience class for retrieving information regarding an
@@ -104,12 +170,41 @@ class Organism(object):
         :func:`organism_name_search`
             Search KEGG for an organism code
 
+        :func:`from_snapshot`
+            An organism running offline from an exported snapshot
+
     """
+    #: The offline snapshot (:class:`.offline.OrganismSnapshot`) of the
+    #: organism's data, if any
+    _snapshot = None
+
     def __init__(self, org, genematcher=None):
         self.org_code = self.organism_name_search(org)
         self.genematcher = genematcher
         self.api = api.CachedKeggApi()
 
+    @classmethod
+    def from_snapshot(cls, path, genematcher=None):
+        """
+        Return an organism with its data (genes, aliases, pathways and
+        their KGML files) served offline from a snapshot directory
+        `path` (as exported by :func:`.offline.export_organism`).
+
+        .. note::
+
+            The snapshot does not include DBGET entries (e.g. of
+            :attr:`genes`) or data of other databases.
+
+        """
+        from orangecontrib.bio.kegg import offline
+        snapshot = offline.OrganismSnapshot(path)
+        organism = cls.__new__(cls)
+        organism.org_code = snapshot.org_code
+        organism.genematcher = genematcher
+        organism.api = snapshot
+        organism._snapshot = snapshot
+        return organism
+
     @property
     def org(self):
         """
@@ -125,7 +220,7 @@ class Organism(object):
         # TODO: This should not be a property but a method.
         # I think it was only put here as back compatibility with old obiKEGG.
         if not hasattr(self, "_genes"):
-            genes = KEGGGenes(self.org_code)
+            genes = KEGGGenes(self.org_code, api=self.api)
             self._genes = genes
         return self._genes
 
@@ -162,10 +257,11 @@ class Organism(object):
 
     def pathways(self, with_ids=None):
         """
-        Return a list of all pathways for this organism.
+        Return a list of all pathways for this organism (or only of
+        pathways that include all genes in `with_ids`).
         """
         if with_ids is not None:
-            return self.api.get_pathways_by_genes(with_ids)
+            return self.get_pathways_by_genes(with_ids)
         else:
             return [p.entry_id for p in self.api.list_pathways(self.org_code)]
 
@@ -194,61 +290,81 @@ class Organism(object):
         as items.
 
         """
+        genes = list(genes)
         if reference is None:
             reference = self.genes.keys()
         reference = set(reference)
 
-        allPathways = defaultdict(lambda: [[], 1.0, []])
-        milestones = progress_bar_milestones(len(genes), 100)
-        pathways_db = KEGGPathways()
-
-        pathways_for_gene = []
-        for i, gene in enumerate(genes):
-            pathways_for_gene.append(self.pathways([gene]))
-            if callback and i in milestones:
-                callback(i * 50.0 / len(genes))
-
-        # pre-cache for speed
-        pathways_db.pre_cache([pid for pfg in pathways_for_gene
-                               for pid in pfg])
-        for i, (gene, pathways) in enumerate(zip(genes, pathways_for_gene)):
-            for pathway in pathways:
-                if pathways_db.get_entry(pathway).gene:
-                    allPathways[pathway][0].append(gene)
-            if callback and i in milestones:
-                callback(50.0 + i * 50.0 / len(genes))
-
-        pItems = allPathways.items()
-
-        for i, (p_id, entry) in enumerate(pItems):
-            pathway = pathways_db.get_entry(p_id)
-            entry[2].extend(reference.intersection(pathway.gene or []))
-            entry[1] = prob.p_value(len(entry[0]), len(reference),
-                                    len(entry[2]), len(genes))
-        return dict([(pid, (genes, p, len(ref)))
-                     for pid, (genes, p, ref) in allPathways.items()])
+        index = self._pathway_index()
+        if callback:
+            callback(50.0)
+
+        positions, query = index.gene_links(genes)
+        _, ref_pathways = index.gene_links(reference)
+        npathways = len(index.pathway_ids)
+        counts = numpy.bincount(query, minlength=npathways)
+        ref_counts = numpy.bincount(ref_pathways, minlength=npathways)
+        selected = numpy.flatnonzero(counts)
+
+        if hasattr(prob, "p_values"):
+            p_values = prob.p_values(counts[selected], len(reference),
+                                     ref_counts[selected], len(genes))
+        else:
+            p_values = [prob.p_value(k, len(reference), m, len(genes))
+                        for k, m in zip(counts[selected].tolist(),
+                                        ref_counts[selected].tolist())]
+
+        # the query genes of each selected pathway, in input order
+        positions = positions[numpy.argsort(query, kind="mergesort")]
+        groups = numpy.split(positions, numpy.cumsum(counts[selected])[:-1])
+        if callback:
+            callback(100.0)
+        return dict(
+            (index.pathway_ids[p], ([genes[i] for i in group.tolist()],
+                                    float(p_value), m))
+            for p, group, p_value, m in zip(selected.tolist(), groups,
+                                            p_values,
+                                            ref_counts[selected].tolist()))
+
+    def _pathway_index(self):
+        """
+        Return a :class:`_GenePathwayIndex` of the organism's gene to
+        pathway links (retrieved with a single, cached, KEGG link call).
+        """
+        if getattr(self, "_pathways_index", None) is None:
+            if self._snapshot is not None:
+                self._pathways_index = self._snapshot.pathway_index()
+            else:
+                self._pathways_index = _GenePathwayIndex.from_links(
+                    self.api.get_genes_pathway_organism(self.org_code))
+        return self._pathways_index
+
+    def pathway(self, pathway_id):
+        """
+        Return a :class:`~.pathway.Pathway` for `pathway_id` (from the
+        organism's snapshot if it has one).
+        """
+        if self._snapshot is not None:
+            return self._snapshot.pathway(pathway_id)
+        return KEGGPathway(pathway_id)
 
     def get_genes_by_enzyme(self, enzyme):
         enzyme = KEGGEnzyme().get_entry(enzyme)
         return enzyme.genes.get(self.org_code, []) if enzyme.genes else []
 
     def get_genes_by_pathway(self, pathway_id):
-        return KEGGPathway(pathway_id).genes()
+        return self.pathway(pathway_id).genes()
 
     def get_enzymes_by_pathway(self, pathway_id):
-        return KEGGPathway(pathway_id).enzymes()
+        return self.pathway(pathway_id).enzymes()
 
     def get_compounds_by_pathway(self, pathway_id):
-        return KEGGPathway(pathway_id).compounds()
+        return self.pathway(pathway_id).compounds()
 
     def get_pathways_by_genes(self, gene_ids):
         """ Pathways that include all genes in gene_ids. """
-        l = self.api.get_genes_pathway_organism(self.org_code)
-        gene_ids = set(gene_ids)
-        gtp = defaultdict(set)
-        for a,b in l:
-            gtp[a].add(b)
-        pathways = [ gtp[g] for g in gene_ids ]
+        index = self._pathway_index()
+        pathways = [set(index.pathways(g)) for g in set(gene_ids)]
         pathways = reduce(set.intersection, pathways)
         return sorted(pathways)
 
@@ -339,6 +339,8 @@ KEGG api with caching
 """
 
 import os
+import time
+from multiprocessing.pool import ThreadPool
 
 from . import caching
 from .caching import cached_method, cache_entry, touch_dir
@@ -351,6 +353,41 @@ except ImportError:
     from Orange.utils import lru_cache
 
 
+#: HTTP status codes of failed requests worth retrying (KEGG responds
+#: with 403 Forbidden when rate limiting)
+RETRY_STATUS = (403, 429, 500, 502, 503, 504)
+
+
+def _is_transient(error):
+    """
+    Is `error` (raised by a KEGG request) a transient failure.
+    """
+    response = getattr(error, "response", None)
+    status = getattr(response, "status_code", None)
+    if status is not None:
+        return status in RETRY_STATUS
+    # connection errors and timeouts (requests' exceptions are IOErrors)
+    return isinstance(error, (IOError, OSError))
+
+
+def _retry(func, *args):
+    """
+    Call `func(*args)` retrying transient failures with an exponential
+    back-off (as configured by ``service.retries`` and
+    ``service.backoff``).
+    """
+    from . import conf
+    retries = int(conf.params["service.retries"])
+    backoff = float(conf.params["service.backoff"])
+    for attempt in range(retries + 1):
+        try:
+            return func(*args)
+        except Exception as error:
+            if attempt == retries or not _is_transient(error):
+                raise
+        time.sleep(backoff * 2 ** attempt)
+
+
 class CachedKeggApi(KeggApi):
     def __init__(self, store=None):
         KeggApi.__init__(self)
@@ -365,6 +402,41 @@ class CachedKeggApi(KeggApi):
         return caching.Sqlite3Store(os.path.join(path,
                                                  "kegg_api_cache_2.sqlite3"))
 
+    #: Current releases of databases (looked up once per session)
+    _releases = {}
+
+    def database_from_args(self, name, args):
+        """
+        Return the KEGG database (a name, an abbreviation or an organism
+        code) of the cached call of method `name` with `args`.
+        """
+        if name == "list_organisms":
+            return "genome"
+        elif name == "list_pathways":
+            return "pathway"
+        elif not args:
+            return None
+        first = args[0]
+        if not isinstance(first, six.string_types):
+            # a sequence of ids
+            first = first[0] if len(first) else None
+        if not first:
+            return None
+        return first.split(":", 1)[0]
+
+    def release(self, db):
+        """
+        Return the current release of database `db` or None if it can not
+        be retrieved. It is retrieved once per session.
+        """
+        releases = CachedKeggApi._releases
+        if db not in releases:
+            try:
+                releases[db] = KeggApi.info(self, db).release
+            except Exception:
+                releases[db] = None
+        return releases[db]
+
     def last_modified(self, args, kwargs=None):
         return getattr(self, "default_release", "")
 
@@ -398,61 +470,125 @@ class CachedKeggApi(KeggApi):
         else:
             return KeggApi.get(self, ids)
 
+    #: Maximum number of ids in a single DBGET request
+    BATCH_SIZE = 10
+
+    #: Number of requests (per concurrent request) stored in a single
+    #: cache transaction
+    WINDOW = 10
+
     def _batch_get(self, ids):
-        if len(ids) > 10:
+        if len(ids) > self.BATCH_SIZE:
             raise ValueError("Can batch at most 10 ids at a time.")
 
         get = self.get
-        uncached = []
-        unmatched = set()
+        keys = [get.key_from_args((id,)) for id in ids]
 
         with closing(get.cache_store()) as store:
-            # Which ids are already cached
-            # TODO: Invalidate entries by release string.
-            for id in ids:
-                key = get.key_from_args((id,))
-                if not get.key_has_valid_cache(key, store):
-                    uncached.append(id)
-
-        if uncached:
-            # in case there are duplicate ids
-            uncached = sorted(set(uncached))
-
-            rval = KeggApi.get(self, uncached)
-
-            if rval is not None:
-                entries = rval.split("///\n")
-            else:
-                entries = []
-
-            if entries and not entries[-1].strip():
-                # Delete the last single newline entry if present
-                del entries[-1]
-
-            if len(entries) != len(uncached):
-                new_uncached, entries = match_by_ids(uncached, entries)
-                unmatched = set(uncached) - set(new_uncached)
-                uncached = new_uncached
-                warnings.warn("Unable to match entries for keys: %s." %
-                              ", ".join(map(repr, unmatched)))
-
-            with closing(get.cache_store()) as store:
-                for id, entry in zip(uncached, entries):
-                    key = get.key_from_args((id,))
-                    if entry is not None:
-                        entry = entry + "///\n"
-                    store[key] = cache_entry(entry, mtime=datetime.now())
-
-        # Finally join all the results, but drop all None objects
-
-        with closing(get.cache_store()):
-            keys = [get.key_from_args((id,)) for id in ids]
-            entries = [store[key].value for key in keys]
-
-        entries = filter(lambda e: e is not None, entries)
-
-        rval = "".join(entries)
-        return rval
+            self._cache_entries(ids, store)
+            cached = store.get_many(keys)
+
+        # Finally join all the results (ids without an entry are not
+        # cached), but drop all None objects
+        entries = [cached[key].value for key in keys if key in cached]
+        return "".join(entry for entry in entries if entry is not None)
+
+    def cache_entries(self, ids, batch_size=10, progress_callback=None):
+        """
+        Retrieve the DBGET entries for `ids` without a valid cache entry
+        and store them in the cache.
+
+        Up to ``service.concurrency`` requests (of `batch_size` ids) are
+        kept in flight. Failed requests are retried (``service.retries``
+        times, with an exponential back-off starting at
+        ``service.backoff`` seconds) if the failure is transient (e.g.
+        KEGG's rate limiting). The entries are stored in a single
+        transaction for each window of completed requests.
+
+        """
+        if batch_size > self.BATCH_SIZE or batch_size < 1:
+            raise ValueError("Invalid batch_size")
+
+        with closing(self.get.cache_store()) as store:
+            self._cache_entries(ids, store, batch_size, progress_callback)
+
+    def _cache_entries(self, ids, store, batch_size=10,
+                       progress_callback=None):
+        from . import conf
+        get = self.get
+        ids = list(ids)
+        keys = [get.key_from_args((id,)) for id in ids]
+        valid = get.keys_with_valid_cache(keys, store, [(id,) for id in ids])
+
+        # in case there are duplicate ids
+        uncached, seen = [], set(valid)
+        for id, key in zip(ids, keys):
+            if key not in seen:
+                seen.add(key)
+                uncached.append(id)
+
+        batches = [uncached[start: start + batch_size]
+                   for start in range(0, len(uncached), batch_size)]
+        if not batches:
+            return
+
+        def store_entries(results):
+            now = datetime.now()
+            store.set_many(
+                (get.key_from_args((id,)), get.new_entry((id,), entry, now))
+                for batch in results for id, entry in batch)
+            del results[:]
+
+        concurrency = min(max(int(conf.params["service.concurrency"]), 1),
+                          len(batches))
+        if concurrency == 1:
+            results = six.moves.map(self._fetch_entries, batches)
+        else:
+            pool = ThreadPool(concurrency)
+            results = pool.imap_unordered(self._fetch_entries, batches)
+
+        window = []
+        try:
+            for i, batch in enumerate(results):
+                window.append(batch)
+                if len(window) >= concurrency * self.WINDOW:
+                    store_entries(window)
+                if progress_callback:
+                    progress_callback(100.0 * (i + 1) / len(batches))
+        finally:
+            # store the completed requests even if some failed
+            if window:
+                store_entries(window)
+            if concurrency > 1:
+                pool.terminate()
+                pool.join()
+
+    def _fetch_entries(self, ids):
+        """
+        Retrieve the entries for (at most 10) `ids` from KEGG and return
+        a list of (id, entry) pairs for ids with an entry (those without
+        one are not cached, they are requested again).
+        """
+        rval = _retry(KeggApi.get, self, ids)
+
+        if rval is not None:
+            entries = rval.split("///\n")
+        else:
+            entries = []
+
+        if entries and not entries[-1].strip():
+            # Delete the last single newline entry if present
+            del entries[-1]
+
+        if len(entries) != len(ids):
+            matched, entries = match_by_ids(ids, entries)
+            matched_set = set(matched)
+            unmatched = [id for id in ids if id not in matched_set]
+            warnings.warn("Unable to match entries for keys: %s." %
+                          ", ".join(map(repr, unmatched)))
+            ids = matched
+
+        return [(id, entry + "///\n") for id, entry in zip(ids, entries)]
 
     @cached_method
     def conv(self, target_db, source):
@@ -4,6 +4,7 @@ Caching framework for cached kegg api calls.
 """
 import os
 import sqlite3
+import threading
 try:
     import cPickle as pickle
 except ImportError:
@@ -34,23 +35,94 @@ class Store(object):
     def __exit__(self, *args):
         pass
 
+    def get_many(self, keys):
+        """
+        Return a dict of (cached) values for `keys` present in the store.
+        """
+        values = {}
+        for key in keys:
+            try:
+                values[key] = self[key]
+            except KeyError:
+                pass
+        return values
 
-class Sqlite3Store(Store, DictMixin):
+    def set_many(self, items):
+        """
+        Store (key, value) pairs from `items`.
+        """
+        for key, value in items:
+            self[key] = value
 
-    def __init__(self, filename):
-        self.filename = filename
-        self.con = sqlite3.connect(filename)
-        self.con.execute("""
+
+#: Open sqlite connections (shared by stores in a thread of a process)
+_connections = threading.local()
+
+
+def _connection(filename):
+    """
+    Return a shared connection to the cache database `filename`
+    (opened in WAL mode) for the current thread.
+    """
+    filename = os.path.abspath(filename)
+    pid = os.getpid()
+    if getattr(_connections, "pid", None) != pid:
+        # connections of a parent process can not be used after a fork
+        _connections.pid = pid
+        _connections.cons = {}
+    con = _connections.cons.get(filename)
+    if con is None:
+        con = sqlite3.connect(filename, timeout=30)
+        con.execute("PRAGMA journal_mode=WAL")
+        con.execute("PRAGMA synchronous=NORMAL")
+        con.execute("""
             CREATE TABLE IF NOT EXISTS cache
                 (key TEXT UNIQUE,
                  value TEXT
                 )
         """)
-        self.con.execute("""
+        con.execute("""
             CREATE INDEX IF NOT EXISTS cache_index
             ON cache (key)
         """)
-        self.con.commit()
+        con.commit()
+        _connections.cons[filename] = con
+    return con
+
+
+class Sqlite3Store(Store, DictMixin):
+    """
+    A store of pickled values in a sqlite database. Stores of the same
+    file share a connection (per thread). Changes are committed
+    immediately, or at the end of a ``with store:`` block or a
+    :func:`set_many` call.
+    """
+    #: Maximum number of keys in a single query
+    QUERY_KEYS = 500
+
+    def __init__(self, filename):
+        Store.__init__(self)
+        self.filename = filename
+        self.con = _connection(filename)
+        self._depth = 0
+
+    def __enter__(self):
+        self._depth += 1
+        return self
+
+    def __exit__(self, *args):
+        self._depth -= 1
+        self._commit()
+
+    def _commit(self):
+        if self._depth == 0:
+            self.con.commit()
+
+    @staticmethod
+    def _loads(pickle_str):
+        if not six.PY3:
+            pickle_str = str(pickle_str)
+        return pickle.loads(pickle_str)
 
     def __getitem__(self, key):
         cur = self.con.execute("""
@@ -62,11 +134,8 @@ class Sqlite3Store(Store, DictMixin):
         if not r:
             raise KeyError(key)
         else:
-            pickle_str = r[0][0]
-            if not six.PY3:
-                pickle_str = str(pickle_str)
             try:
-                return pickle.loads(pickle_str)
+                return self._loads(r[0][0])
             except Exception:
                 raise KeyError(key)
 
@@ -76,14 +145,46 @@ class Sqlite3Store(Store, DictMixin):
             INSERT OR REPLACE INTO cache
             VALUES (?, ?)
         """, (key, value))
-        self.con.commit()
+        self._commit()
 
     def __delitem__(self, key):
         self.con.execute("""
             DELETE FROM cache
             WHERE key=?
         """, (key,))
-        self.con.commit()
+        self._commit()
+
+    def __contains__(self, key):
+        cur = self.con.execute("""
+            SELECT 1
+            FROM cache
+            WHERE key=?
+        """, (key,))
+        return cur.fetchone() is not None
+
+    def get_many(self, keys):
+        keys = list(set(keys))
+        values = {}
+        for start in range(0, len(keys), self.QUERY_KEYS):
+            batch = keys[start:start + self.QUERY_KEYS]
+            cur = self.con.execute("""
+                SELECT key, value
+                FROM cache
+                WHERE key IN (%s)
+            """ % ",".join("?" * len(batch)), batch)
+            for key, pickle_str in cur:
+                try:
+                    values[key] = self._loads(pickle_str)
+                except Exception:
+                    pass
+        return values
+
+    def set_many(self, items):
+        self.con.executemany("""
+            INSERT OR REPLACE INTO cache
+            VALUES (?, ?)
+        """, ((key, pickle.dumps(value)) for key, value in items))
+        self._commit()
 
     def keys(self):
         cur = self.con.execute("""
@@ -93,14 +194,18 @@ class Sqlite3Store(Store, DictMixin):
         return [str(r[0]) for r in cur.fetchall()]
 
     def close(self):
-        pass
+        self.con.commit()
 
     def __len__(self):
-        return None
+        cur = self.con.execute("""
+            SELECT COUNT(*)
+            FROM cache
+        """)
+        return cur.fetchone()[0]
 
     def __iter__(self):
-        return None
-
+        # a list, so keys can be deleted while iterating
+        return iter(self.keys())
 
 
 class DictStore(Store, DictMixin):
@@ -119,13 +224,28 @@ class DictStore(Store, DictMixin):
 
 
 class cache_entry(object):
-    def __init__(self, value, mtime=None, expires=None):
+    def __init__(self, value, mtime=None, expires=None, release=None):
         self.value = value
         self.mtime = mtime
         self.expires = expires
+        self.release = release
 
 _SESSION_START = datetime.now()
 
+#: Lifetimes of cache entries for named invalidation policies
+_TTL = {"daily": timedelta(1), "weekly": timedelta(7)}
+
+
+def invalidate_policy(db=None):
+    """
+    Return the cache invalidation policy (see "cache.invalidate" in
+    :mod:`conf`) for entries of database `db`.
+    """
+    default = conf.params["cache.invalidate"]
+    if db is None:
+        return default
+    return conf.params.get("cache.invalidate." + db.lower(), default)
+
 
 class cached_wrapper(object):
     """
@@ -167,36 +287,92 @@ class cached_wrapper(object):
                 if key.startswith(prefix):
                     del store[key]
 
-    def memoize(self, args, kwargs, value, timestamp=None):
-        key = self.key_from_args(args, kwargs)
+    def database_from_args(self, args):
+        """
+        Return the database of entries cached for `args` (or None if
+        unknown).
+        """
+        if args is not None and \
+                hasattr(self.instance, "database_from_args"):
+            return self.instance.database_from_args(
+                self.function.__name__, args)
+
+    def release_from_args(self, args):
+        """
+        Return the current release of the database of entries cached
+        for `args` (or None if unknown).
+        """
+        db = self.database_from_args(args)
+        if db is not None and hasattr(self.instance, "release"):
+            return self.instance.release(db)
+
+    def new_entry(self, args, value, timestamp=None):
+        """
+        Return a cache entry for `value` returned for `args`.
+        """
         if timestamp is None:
             timestamp = datetime.now()
+        return cache_entry(value, mtime=timestamp,
+                           release=self.release_from_args(args))
+
+    def memoize(self, args, kwargs, value, timestamp=None):
+        key = self.key_from_args(args, kwargs)
 
         with closing(self.cache_store()) as store:
-            store[key] = cache_entry(value, mtime=timestamp)
+            store[key] = self.new_entry(args, value, timestamp)
 
     def __call__(self, *args):
         key = self.key_from_args(args)
         with closing(self.cache_store()) as store:
-            if self.key_has_valid_cache(key, store):
+            if self.key_has_valid_cache(key, store, args):
                 rval = store[key].value
             else:
                 rval = self.function(self.instance, *args)
-                store[key] = cache_entry(rval, datetime.now(), None)
+                store[key] = self.new_entry(args, rval)
 
         return rval
 
-    def key_has_valid_cache(self, key, store):
+    def key_has_valid_cache(self, key, store, args=None):
         if key not in store:
             return False
         else:
             entry = store[key]
-            return self.is_entry_valid(entry, None)
+            return self.is_entry_valid(entry, args)
+
+    def keys_with_valid_cache(self, keys, store, args=None):
+        """
+        Return a set of `keys` with a valid cache entry in the `store`.
+        `args` is an optional list of the arguments of each key.
+        """
+        keys = list(keys)
+        if args is None:
+            args = [None] * len(keys)
+        cached = store.get_many(keys)
+        return set(key for key, key_args in zip(keys, args)
+                   if key in cached and
+                   self.is_entry_valid(cached[key], key_args))
 
     def is_entry_valid(self, entry, args):
-        # For now always return True, the caching architecture needs to be
-        # completely reworked
-        return True
+        """
+        Is the cache `entry` (for `args`) valid according to the
+        invalidation policy of its database.
+        """
+        policy = invalidate_policy(self.database_from_args(args))
+        if policy == "never":
+            return True
+        elif policy == "always":
+            return False
+        elif policy == "release":
+            # the current release is looked up once per session
+            release = self.release_from_args(args)
+            if release is None:
+                # unknown (e.g. offline)
+                return True
+            if getattr(entry, "release", None) is not None:
+                return entry.release == release
+            # cached without a known release (e.g. before releases were
+            # recorded) expire as with the weekly policy
+            policy = "weekly"
 
         # Need to check datetime first (it subclasses date)
         if isinstance(entry.mtime, datetime):
@@ -207,28 +383,17 @@ class cached_wrapper(object):
         else:
             return False
 
-        last_modified = self.last_modified_from_args(args)
-
-        if isinstance(last_modified, date):
-            last_modified = datetime(last_modified.year, last_modified.month,
-                                     last_modified.day, 1, 1, 1)
-        elif isinstance(last_modified, str):
-            # Could have different format
-            mtime = mtime.strftime("%Y %m %d %H %M %S")
-
-        elif last_modified is None:
-            if conf.params["cache.invalidate"] == "always":
-                return False
-            elif conf.params["cache.invalidate"] == "session":
-                last_modified = _SESSION_START
-            elif conf.params["cache.invalidate"] == "daily":
-                last_modified = datetime.now().replace(hour=0, minute=0,
-                                                       second=0, microsecond=0)
-            elif conf.params["cache.invalidate"] == "weekly":
-                last_modified = datetime.now() - timedelta(7)
-            else:  # ???
-                pass
-        return last_modified <= mtime
+        if policy == "session":
+            return mtime >= _SESSION_START
+        elif policy in _TTL:
+            ttl = _TTL[policy]
+        else:
+            try:
+                ttl = timedelta(float(policy))
+            except ValueError:
+                raise ValueError("Invalid cache invalidation policy %r"
+                                 % policy)
+        return datetime.now() - mtime <= ttl
 
 
 class cached_method(object):
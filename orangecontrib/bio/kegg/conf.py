@@ -22,11 +22,22 @@ default = """
 # path = %(home)s/.obiKEGG/
 path = %(kegg_dir)s/
 store = sqlite3
-invalidate = weekly
+# when cached entries expire: always, session, daily, weekly, never,
+# release (when the database's KEGG release changes; entries cached
+# without a release expire weekly) or after a number of days; set for
+# a single database with invalidate.<db> (e.g. invalidate.pathway =
+# weekly, invalidate.hsa = 30)
+invalidate = release
 
 [service]
 transport = urllib2
 # transport = requests
+# number of concurrent requests when retrieving many entries
+concurrency = 4
+# retries of a failed (rate limited or timed out) request, with the
+# delay (in seconds) before the first retry doubled for each next one
+retries = 5
+backoff = 1.0
 
 """
 
@@ -49,9 +60,17 @@ _ALL_PARAMS = [
     "cache.path",
     "cache.store",
     "cache.invalidate",
-    "service.transport"
+    "service.transport",
+    "service.concurrency",
+    "service.retries",
+    "service.backoff"
 ]
 
 for p in _ALL_PARAMS:
     section, option = p.split(".")
     params[p] = parser.get(section, option)
+
+# invalidation of entries of single databases
+for option in parser.options("cache"):
+    if option.startswith("invalidate."):
+        params["cache." + option] = parser.get("cache", option)
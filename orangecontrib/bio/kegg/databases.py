@@ -72,7 +72,9 @@ class DBDataBase(object):
             raise TypeError("Cannot make an instance of abstract base "
                             "class %r." % type(self).__name__)
 
-        self.api = api.CachedKeggApi()
+        self.api = kwargs.get("api")
+        if self.api is None:
+            self.api = api.CachedKeggApi()
         self._info = None
         #TODO invalidate cache by KEGG release
         #self.api.set_default_release(self.info.release)
@@ -214,34 +216,11 @@ class DBDataBase(object):
         if not isinstance(self.api, api.CachedKeggApi):
             raise TypeError("Not an instance of api.CachedKeggApi")
 
-        if batch_size > 10 or batch_size < 1:
-            raise ValueError("Invalid batch_size")
-
         if keys is None:
             keys = self.keys()
 
-        keys = map(self._add_db, keys)
-
-        get = self.api.get
-
-        # drop all keys with a valid cache entry to minimize the number
-        # of 'get' requests.
-        with closing(get.cache_store()) as store:
-            def is_uncached(key):
-                cache_key = get.key_from_args((key,))
-                return not get.key_has_valid_cache(cache_key, store)
-            keys = [key for key in keys if is_uncached(key)]
-
-        start = 0
-
-        while start < len(keys):
-            batch = keys[start: start + batch_size]
-            self.api.get(batch)
-
-            if progress_callback:
-                progress_callback(100.0 * start / len(keys))
-
-            start += batch_size
+        self.api.cache_entries(map(self._add_db, keys), batch_size=batch_size,
+                               progress_callback=progress_callback)
 
     def batch_get(self, keys):
         """
@@ -250,25 +229,21 @@ class DBDataBase(object):
         are not yet cached.
 
         """
-        entries = []
-        batch_size = 10
         keys = list(map(self._add_db, keys))
 
         # Precache the entries first
         self.pre_cache(keys)
 
-        start = 0
-        while start < len(keys):
-            batch = keys[start: start + batch_size]
-            batch_entries = self.api.get(batch)
-            if batch_entries is not None:
-                batch_entries = batch_entries.split("///\n")
-                # Remove possible empty last line
-                batch_entries = [e for e in batch_entries if e.strip()]
-                entries.extend(map(self.ENTRY_TYPE, batch_entries))
-            start += batch_size
+        get = self.api.get
+        cache_keys = [get.key_from_args((key,)) for key in keys]
+        with closing(get.cache_store()) as store:
+            cached = store.get_many(cache_keys)
 
-        return entries
+        entries = [cached[key].value for key in cache_keys if key in cached]
+        # Remove the entry terminators (and missing entries)
+        entries = [entry.rsplit("///\n", 1)[0] for entry in entries
+                   if entry is not None]
+        return [self.ENTRY_TYPE(entry) for entry in entries if entry.strip()]
 
     def _add_db(self, key):
         """
@@ -438,16 +413,17 @@ class Genes(DBDataBase):
     Interface to the KEGG Genes database.
 
     :param str org_code: KEGG organism code (e.g. 'hsa').
+    :param api: The KEGG api (a :class:`~.api.CachedKeggApi` by default).
 
     """
     DB = None  # Needs to be set in __init__
     ENTRY_TYPE = GeneEntry
 
-    def __init__(self, org_code):
+    def __init__(self, org_code, api=None):
         # TODO: Map to org code from kegg id (T + 5 digits)
         self.DB = org_code
         self.org_code = org_code
-        DBDataBase.__init__(self)
+        DBDataBase.__init__(self, api=api)
         self._keys = self.api.get_genes_by_organism(org_code)
 
     def gene_aliases(self):
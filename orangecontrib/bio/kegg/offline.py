@@ -0,0 +1,182 @@
+"""
+==========================
+Offline organism snapshots
+==========================
+
+A self-contained snapshot of the KEGG data of one organism (its genes,
+their NCBI aliases, the gene to pathway links and the pathways' KGML
+files) that can be used without access to the KEGG REST API (e.g. on
+many machines of a cluster).
+
+>>> from orangecontrib.bio import kegg
+>>> from orangecontrib.bio.kegg.offline import export_organism
+>>> export_organism("hsa", "hsa.kegg")  # doctest: +SKIP
+>>> organism = kegg.Organism.from_snapshot("hsa.kegg")  # doctest: +SKIP
+
+A snapshot is a directory with the tables saved as a (memory mapped)
+:mod:`~orangecontrib.bio.utils.snapshot` in ``tables`` and the pathways'
+KGML files in ``kgml``.
+
+"""
+from __future__ import absolute_import
+
+import os
+import shutil
+import tempfile
+from datetime import datetime
+
+from orangecontrib.bio.utils import snapshot
+from orangecontrib.bio.kegg import Organism, _GenePathwayIndex
+from orangecontrib.bio.kegg import pathway
+from orangecontrib.bio.kegg.types import Definition
+
+#: Version of the snapshot layout
+FORMAT = "kegg-organism-1"
+
+#: Databases of the gene aliases (conversion) tables
+CONV_SOURCES = ["ncbi-geneid", "ncbi-proteinid"]
+
+
+def _pairs_arrays(name, pairs):
+    pairs = list(pairs)
+    arrays = snapshot.StringPool.from_strings(
+        [a for a, _ in pairs]).arrays(name + "_first")
+    arrays.update(snapshot.StringPool.from_strings(
+        [b for _, b in pairs]).arrays(name + "_second"))
+    return arrays
+
+
+def _pairs(arrays, name):
+    return list(zip(
+        snapshot.StringPool.from_arrays(arrays, name + "_first").tolist(),
+        snapshot.StringPool.from_arrays(arrays, name + "_second").tolist()))
+
+
+def export_organism(organism, path, progress_callback=None):
+    """
+    Export a snapshot of the KEGG data of `organism` (an
+    :class:`~orangecontrib.bio.kegg.Organism` or a KEGG organism code
+    or name) to the directory `path` (replacing an existing snapshot).
+    """
+    if not isinstance(organism, Organism):
+        organism = Organism(organism)
+    org, kegg_api = organism.org_code, organism.api
+
+    arrays = _pairs_arrays("genes", kegg_api.list(org))
+    for source in CONV_SOURCES:
+        arrays.update(_pairs_arrays(source, kegg_api.conv(org, source)))
+    pathways = kegg_api.list_pathways(org)
+    arrays.update(_pairs_arrays("pathways", pathways))
+
+    index = _GenePathwayIndex.from_links(
+        kegg_api.get_genes_pathway_organism(org))
+    arrays.update(snapshot.StringPool.from_strings(
+        index.gene_ids).arrays("index_genes"))
+    arrays.update(snapshot.StringPool.from_strings(
+        index.pathway_ids).arrays("index_pathways"))
+    arrays.update({"index_indptr": index.indptr,
+                   "index_indices": index.indices})
+
+    release = None
+    if hasattr(kegg_api, "release"):
+        release = kegg_api.release(org)
+    meta = {"org": org, "release": release,
+            "created": datetime.now().isoformat()}
+
+    path = os.path.abspath(path)
+    tmpdir = tempfile.mkdtemp(prefix=os.path.basename(path) + ".",
+                              dir=os.path.dirname(path))
+    try:
+        snapshot.save(os.path.join(tmpdir, "tables"), arrays, FORMAT, meta)
+        kgml_path = os.path.join(tmpdir, "kgml")
+        os.mkdir(kgml_path)
+        for i, definition in enumerate(pathways):
+            # the pathway's KGML (downloaded unless in the local cache)
+            kegg_pathway = pathway.Pathway(definition.entry_id)
+            with kegg_pathway._get_kgml() as src:
+                filename = os.path.join(
+                    kgml_path, kegg_pathway.pathway_id + ".xml")
+                with open(filename, "wb") as dst:
+                    shutil.copyfileobj(src, dst)
+            if progress_callback:
+                progress_callback(100.0 * (i + 1) / len(pathways))
+
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        os.rename(tmpdir, path)
+    except BaseException:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+        raise
+
+
+class OrganismSnapshot(object):
+    """
+    An offline snapshot of an organism's KEGG data (as exported by
+    :func:`export_organism`) at `path`.
+
+    It implements the part of the :class:`~.api.CachedKeggApi` interface
+    used by :class:`~orangecontrib.bio.kegg.Organism` (for the snapshot's
+    organism only).
+
+    """
+    def __init__(self, path):
+        self.path = path
+        self._arrays, meta = snapshot.load(os.path.join(path, "tables"),
+                                           version=FORMAT)
+        #: KEGG organism code
+        self.org_code = meta["org"]
+        #: KEGG release of the organism's genes at export (or None)
+        self.release = meta["release"]
+        #: Time of the export (ISO 8601 formatted)
+        self.created = meta["created"]
+        self.kgml_path = os.path.join(path, "kgml")
+
+    def _check(self, org):
+        if org != self.org_code:
+            raise ValueError("Snapshot of %r has no data for %r"
+                             % (self.org_code, org))
+
+    def list(self, org):
+        self._check(org)
+        return [Definition(*pair) for pair in _pairs(self._arrays, "genes")]
+
+    def get_genes_by_organism(self, org):
+        self._check(org)
+        return snapshot.StringPool.from_arrays(
+            self._arrays, "genes_first").tolist()
+
+    def conv(self, target_db, source):
+        self._check(target_db)
+        if source not in CONV_SOURCES:
+            raise ValueError("Snapshot has no conversion from %r" % source)
+        return _pairs(self._arrays, source)
+
+    def list_pathways(self, org):
+        self._check(org)
+        return [Definition(*pair)
+                for pair in _pairs(self._arrays, "pathways")]
+
+    def get_genes_pathway_organism(self, org):
+        self._check(org)
+        return self.pathway_index().links()
+
+    def pathway_index(self):
+        """
+        Return a gene to pathway index (a :class:`_GenePathwayIndex`).
+        """
+        arrays = self._arrays
+        return _GenePathwayIndex(
+            snapshot.StringPool.from_arrays(arrays, "index_genes").tolist(),
+            snapshot.StringPool.from_arrays(arrays,
+                                            "index_pathways").tolist(),
+            arrays["index_indptr"], arrays["index_indices"])
+
+    def pathway(self, pathway_id):
+        """
+        Return a :class:`~.pathway.Pathway` for `pathway_id` reading its
+        KGML file from the snapshot.
+        """
+        kegg_pathway = pathway.Pathway(pathway_id, local_cache=self.kgml_path)
+        if not os.path.exists(kegg_pathway._local_kgml_filename()):
+            raise KeyError(pathway_id)
+        return kegg_pathway
@@ -1,11 +1,201 @@
+import os
+import time
+import shutil
+import tempfile
+import threading
 import unittest
+import warnings
 import doctest
+from contextlib import closing
+
+from six.moves import BaseHTTPServer, socketserver
+from slumber.exceptions import HttpClientError, HttpNotFoundError
 
 from orangecontrib.bio import kegg
+from orangecontrib.bio.kegg import api, caching, conf, service
+from orangecontrib.bio.kegg.databases import Genes
+
+
+class Server(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    """
+    A stand-in for the KEGG REST API. Entry requests are delayed, and
+    the first request for every third batch of ids is rate limited (403).
+    """
+    daemon_threads = True
+    latency = 0.02
+
+    def __init__(self, genes):
+        BaseHTTPServer.HTTPServer.__init__(
+            self, ("127.0.0.1", 0), Handler)
+        self.genes = genes
+        self.lock = threading.Lock()
+        self.requests = []
+        self.forbidden = 0
+        self.in_flight = self.max_in_flight = 0
+
+    def url(self):
+        return "http://127.0.0.1:%i/" % self.server_address[1]
+
+
+class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        parts = self.path.strip("/").split("/")
+        if parts[0] == "list":
+            self.respond(200, "".join("%s\tgene %s\n" % (g, g)
+                                      for g in server.genes))
+        elif parts[0] == "get":
+            with server.lock:
+                limited = (parts[1] not in server.requests and
+                           len(set(server.requests)) % 3 == 0)
+                server.requests.append(parts[1])
+                server.in_flight += 1
+                server.max_in_flight = max(server.in_flight,
+                                           server.max_in_flight)
+            time.sleep(server.latency)
+            ids = [g for g in parts[1].split("+") if g in server.genes]
+            with server.lock:
+                server.in_flight -= 1
+            if limited or "bench:forbidden" in parts[1]:
+                server.forbidden += 1
+                self.respond(403, "Forbidden")
+            elif not ids:
+                self.respond(404, "")
+            else:
+                self.respond(200, "".join(
+                    "ENTRY       %s            CDS       T00000\n"
+                    "NAME        %s\n///\n" % (g.split(":")[1], g)
+                    for g in ids))
+        else:
+            self.respond(404, "")
+
+    def respond(self, status, body):
+        body = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "text/plain")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
 
 
 class TestApi(unittest.TestCase):
-    pass
+    def setUp(self):
+        self.genes = ["bench:g%i" % i for i in range(95)]
+        self.server = Server(self.genes)
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+        self.path = tempfile.mkdtemp()
+        self.params = dict(conf.params)
+        conf.params.update({"cache.path": self.path,
+                            "service.concurrency": "4",
+                            "service.retries": "2",
+                            "service.backoff": "0.01"})
+        self.rest_api = service.REST_API
+        service.REST_API = self.server.url()
+        self.slumber = getattr(service.slumber_service, "_cached", None)
+        if self.slumber is not None:
+            del service.slumber_service._cached
+        self.releases = dict(api.CachedKeggApi._releases)
+        api.CachedKeggApi._releases.clear()
+        self.api = api.CachedKeggApi()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        conf.params.clear()
+        conf.params.update(self.params)
+        service.REST_API = self.rest_api
+        if self.slumber is not None:
+            service.slumber_service._cached = self.slumber
+        elif hasattr(service.slumber_service, "_cached"):
+            del service.slumber_service._cached
+        api.CachedKeggApi._releases.clear()
+        api.CachedKeggApi._releases.update(self.releases)
+        con = getattr(caching._connections, "cons", {}).pop(
+            os.path.abspath(os.path.join(self.path,
+                                         "kegg_api_cache_2.sqlite3")), None)
+        if con is not None:
+            con.close()
+        shutil.rmtree(self.path)
+
+    def cached(self, ids):
+        get = self.api.get
+        with closing(get.cache_store()) as store:
+            cached = store.get_many(get.key_from_args((id,)) for id in ids)
+        return dict((key[len("get(") + 1:-len("',)")], entry.value)
+                    for key, entry in cached.items())
+
+    def test_cache_entries(self):
+        progress = []
+        with warnings.catch_warnings(record=True):
+            warnings.simplefilter("always")
+            self.api.cache_entries(self.genes + ["bench:missing"],
+                                   progress_callback=progress.append)
+
+        server = self.server
+        # 10 requests of 10 ids, 4 of them rate limited and retried
+        self.assertEqual(len(set(server.requests)), 10)
+        self.assertEqual(server.forbidden, 4)
+        self.assertEqual(len(server.requests), 14)
+        self.assertGreater(server.max_in_flight, 1)
+        self.assertLessEqual(server.max_in_flight, 4)
+        self.assertEqual(progress[-1], 100.0)
+
+        # ids without an entry are not cached
+        cached = self.cached(self.genes + ["bench:missing"])
+        self.assertEqual(len(cached), 95)
+        self.assertNotIn("bench:missing", cached)
+        self.assertTrue(cached["bench:g7"].startswith("ENTRY       g7 "))
+        self.assertTrue(cached["bench:g7"].endswith("///\n"))
+
+        # cached entries are not requested again
+        self.api.cache_entries(self.genes)
+        self.assertEqual(len(server.requests), 14)
+        self.assertEqual(self.api.get(["bench:g1", "bench:g2"]),
+                         cached["bench:g1"] + cached["bench:g2"])
+        self.assertEqual(len(server.requests), 14)
+
+        # ids without an entry are requested again (and not found)
+        self.assertRaises(HttpNotFoundError, self.api.get,
+                          ["bench:g1", "bench:missing"])
+        self.assertEqual(server.requests[-1], "bench:missing")
+
+    def test_serial(self):
+        conf.params["service.concurrency"] = "1"
+        self.api.cache_entries(self.genes, batch_size=5)
+        self.assertEqual(self.server.max_in_flight, 1)
+        self.assertEqual(len(set(self.server.requests)), 19)
+        self.assertEqual(len(self.cached(self.genes)), 95)
+
+    def test_failures(self):
+        conf.params["service.concurrency"] = "2"
+        conf.params["service.retries"] = "1"
+        self.assertRaises(HttpClientError, self.api.cache_entries,
+                          self.genes[:30] + ["bench:forbidden"])
+        # one initial attempt and a retry
+        self.assertEqual(self.server.requests.count("bench:forbidden"), 2)
+        # completed requests were stored
+        self.assertEqual(len(self.cached(self.genes[:30])), 30)
+
+        # not found (404) is not retried
+        self.assertRaises(HttpNotFoundError, self.api.cache_entries,
+                          ["bench:unknown"])
+        self.assertEqual(self.server.requests.count("bench:unknown"), 1)
+
+    def test_batch_get(self):
+        genes = Genes("bench")
+        genes.api = self.api
+        with warnings.catch_warnings(record=True):
+            warnings.simplefilter("always")
+            entries = genes.batch_get(
+                ["g3", "bench:g1", "g3", "bench:missing"])
+        self.assertEqual([e.entry_key for e in entries], ["g3", "g1", "g3"])
+        self.assertEqual(len(set(self.server.requests)), 1)
 
 
 def load_tests(loader, tests, ignore):
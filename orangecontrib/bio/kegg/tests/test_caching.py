@@ -0,0 +1,203 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import unittest
+from contextlib import closing
+from datetime import datetime, timedelta
+
+from orangecontrib.bio.kegg import caching, conf
+
+
+def close_connection(filename):
+    con = getattr(caching._connections, "cons", {}).pop(
+        os.path.abspath(filename), None)
+    if con is not None:
+        con.close()
+
+
+class TestSqlite3Store(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.filename = os.path.join(self.path, "cache.sqlite3")
+
+    def tearDown(self):
+        close_connection(self.filename)
+        shutil.rmtree(self.path)
+
+    def test_mapping(self):
+        store = caching.Sqlite3Store(self.filename)
+        self.assertEqual(len(store), 0)
+        store["a"] = [1, 2]
+        store["b"] = {"c": None}
+        self.assertEqual(store["a"], [1, 2])
+        self.assertIn("b", store)
+        self.assertNotIn("c", store)
+        self.assertRaises(KeyError, lambda: store["c"])
+        self.assertEqual(len(store), 2)
+        self.assertEqual(sorted(store), ["a", "b"])
+        for key in store:
+            del store[key]
+        self.assertEqual(len(store), 0)
+
+    def test_many(self):
+        store = caching.Sqlite3Store(self.filename)
+        store.QUERY_KEYS = 3
+        store.set_many(("key%i" % i, i) for i in range(10))
+        self.assertEqual(len(store), 10)
+        self.assertEqual(store.get_many(["key1", "key7", "key1", "x"]),
+                         {"key1": 1, "key7": 7})
+        self.assertEqual(store.get_many("key%i" % i for i in range(10)),
+                         dict(("key%i" % i, i) for i in range(10)))
+        self.assertEqual(store.get_many([]), {})
+
+    def count(self):
+        con = sqlite3.connect(self.filename)
+        try:
+            return con.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        finally:
+            con.close()
+
+    def test_shared_connection(self):
+        with caching.Sqlite3Store(self.filename) as store:
+            store["a"] = 1
+            other = caching.Sqlite3Store(self.filename)
+            self.assertIs(store.con, other.con)
+            # committed at the end of the block
+            self.assertEqual(self.count(), 0)
+        self.assertEqual(self.count(), 1)
+
+        mode = store.con.execute("PRAGMA journal_mode").fetchone()[0]
+        self.assertEqual(mode.lower(), "wal")
+
+        # a different thread uses its own connection
+        result = {}
+
+        def read():
+            thread_store = caching.Sqlite3Store(self.filename)
+            result["a"] = thread_store["a"]
+            result["con"] = thread_store.con
+            thread_store.con.close()
+
+        thread = threading.Thread(target=read)
+        thread.start()
+        thread.join()
+        self.assertEqual(result["a"], 1)
+        self.assertIsNot(result["con"], store.con)
+
+
+class Api(object):
+    def __init__(self, filename):
+        self.filename = filename
+        self.releases = {"db": "1.0"}
+        self.release_calls = 0
+        self.calls = 0
+
+    def cache_store(self):
+        return caching.Sqlite3Store(self.filename)
+
+    def database_from_args(self, name, args):
+        return args[0]
+
+    def release(self, db):
+        self.release_calls += 1
+        return self.releases.get(db)
+
+    @caching.cached_method
+    def get(self, db, key):
+        self.calls += 1
+        return "%s %s %i" % (db, key, self.calls)
+
+
+class TestCachedMethod(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.filename = os.path.join(self.path, "cache.sqlite3")
+        self.params = dict(conf.params)
+        self.api = Api(self.filename)
+
+    def tearDown(self):
+        conf.params.clear()
+        conf.params.update(self.params)
+        close_connection(self.filename)
+        shutil.rmtree(self.path)
+
+    def test_release(self):
+        conf.params["cache.invalidate"] = "release"
+        api = self.api
+        self.assertEqual(api.get("db", "a"), "db a 1")
+        self.assertEqual(api.get("db", "a"), "db a 1")
+        with closing(api.cache_store()) as store:
+            entry = store[api.get.key_from_args(("db", "a"))]
+        self.assertEqual(entry.release, "1.0")
+
+        api.releases["db"] = "2.0"
+        self.assertEqual(api.get("db", "a"), "db a 2")
+        self.assertEqual(api.get("db", "a"), "db a 2")
+
+        # unknown releases (e.g. offline) do not invalidate entries
+        del api.releases["db"]
+        self.assertEqual(api.get("db", "a"), "db a 2")
+
+    def test_release_unknown(self):
+        # entries cached without a release (e.g. by earlier versions)
+        # expire weekly
+        conf.params["cache.invalidate"] = "release"
+        get = self.api.get
+        args = ("db", "a")
+        old = caching.cache_entry("value", datetime.now() - timedelta(8))
+        new = caching.cache_entry("value", datetime.now() - timedelta(3))
+        del new.release
+        self.assertFalse(get.is_entry_valid(old, args))
+        self.assertTrue(get.is_entry_valid(new, args))
+        new.release = "0.1"
+        self.assertFalse(get.is_entry_valid(new, args))
+
+    def test_policies(self):
+        api = self.api
+        get = api.get
+        old = caching.cache_entry("value", datetime.now() - timedelta(3),
+                                  release="1.0")
+        new = caching.cache_entry("value", datetime.now(), release="0.1")
+        args = ("other", "a")
+
+        conf.params["cache.invalidate"] = "weekly"
+        self.assertTrue(get.is_entry_valid(old, args))
+        conf.params["cache.invalidate"] = "daily"
+        self.assertFalse(get.is_entry_valid(old, args))
+        self.assertTrue(get.is_entry_valid(new, args))
+        conf.params["cache.invalidate"] = "2.5"
+        self.assertFalse(get.is_entry_valid(old, args))
+        conf.params["cache.invalidate"] = "session"
+        self.assertFalse(get.is_entry_valid(old, args))
+        self.assertTrue(get.is_entry_valid(new, args))
+        conf.params["cache.invalidate"] = "always"
+        self.assertFalse(get.is_entry_valid(new, args))
+        conf.params["cache.invalidate"] = "never"
+        self.assertTrue(get.is_entry_valid(old, args))
+
+        # per database policies
+        conf.params["cache.invalidate.db"] = "release"
+        self.assertTrue(get.is_entry_valid(old, ("db", "a")))
+        self.assertFalse(get.is_entry_valid(new, ("db", "a")))
+        self.assertTrue(get.is_entry_valid(new, ("other", "a")))
+
+        conf.params["cache.invalidate"] = "sometimes"
+        self.assertRaises(ValueError, get.is_entry_valid, old, args)
+
+    def test_keys_with_valid_cache(self):
+        conf.params["cache.invalidate"] = "release"
+        api = self.api
+        get = api.get
+        api.get("db", "a")
+        api.get("db", "b")
+        api.releases["db"] = "2.0"
+        api.get("db", "b")
+        keys = [get.key_from_args(args)
+                for args in [("db", "a"), ("db", "b"), ("db", "c")]]
+        with closing(api.cache_store()) as store:
+            self.assertEqual(
+                get.keys_with_valid_cache(
+                    keys, store, [("db", "a"), ("db", "b"), ("db", "c")]),
+                set([keys[1]]))
@@ -0,0 +1,131 @@
+import os
+import json
+import shutil
+import tempfile
+import unittest
+
+from orangecontrib.bio import kegg
+from orangecontrib.bio.kegg import conf, offline
+from orangecontrib.bio.kegg.types import Definition
+
+
+KGML = """<?xml version="1.0"?>
+<pathway name="path:{id}" org="org" number="{number}" title="{title}">
+    <entry id="1" name="{genes}" type="gene">
+        <graphics name="gene" x="1" y="1"/>
+    </entry>
+    <entry id="2" name="cpd:C00022" type="compound">
+        <graphics name="C00022" x="2" y="2"/>
+    </entry>
+</pathway>
+"""
+
+PATHWAYS = {"path:org00010": ["org:1", "org:2"],
+            "path:org00020": ["org:1", "org:3"]}
+
+
+class Api(object):
+    def list(self, org):
+        return [Definition("org:%i" % i, "G%i; gene %i" % (i, i))
+                for i in range(1, 5)]
+
+    def conv(self, target_db, source):
+        return [("%s:%i" % (source, i + 100), "org:%i" % i)
+                for i in range(1, 4)]
+
+    def list_pathways(self, org):
+        return [Definition(pid, "Pathway %s" % pid[-5:])
+                for pid in sorted(PATHWAYS)]
+
+    def get_genes_pathway_organism(self, org):
+        return [(gene, pid) for pid, genes in sorted(PATHWAYS.items())
+                for gene in genes]
+
+    def get_genes_by_organism(self, org):
+        return [d.entry_id for d in self.list(org)]
+
+    def release(self, db):
+        return "Release 1.0"
+
+
+class TestOfflineOrganism(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.params = dict(conf.params)
+        # KGML files in the local cache (not downloaded)
+        cache_path = os.path.join(self.path, "cache")
+        os.mkdir(cache_path)
+        conf.params["cache.path"] = cache_path
+        for pid, genes in PATHWAYS.items():
+            name = pid.split(":")[1]
+            with open(os.path.join(cache_path, name + ".xml"), "w") as f:
+                f.write(KGML.format(id=name, number=name[-5:],
+                                    title="Pathway " + name,
+                                    genes=" ".join(genes)))
+
+        self.organism = kegg.Organism.__new__(kegg.Organism)
+        self.organism.org_code = "org"
+        self.organism.api = Api()
+        self.snapshot_path = os.path.join(self.path, "org.kegg")
+        progress = []
+        offline.export_organism(self.organism, self.snapshot_path,
+                                progress_callback=progress.append)
+        self.assertEqual(progress, [50.0, 100.0])
+
+    def tearDown(self):
+        conf.params.clear()
+        conf.params.update(self.params)
+        shutil.rmtree(self.path)
+
+    def test_organism(self):
+        online = self.organism
+        organism = kegg.Organism.from_snapshot(self.snapshot_path)
+        self.assertEqual(organism.org_code, "org")
+        self.assertEqual(organism.api.release, "Release 1.0")
+        self.assertEqual(
+            sorted(map(sorted, organism.gene_aliases())),
+            sorted(map(sorted, online.gene_aliases())))
+        self.assertEqual(organism.pathways(), online.pathways())
+        self.assertEqual(list(organism.genes.keys()),
+                         ["org:1", "org:2", "org:3", "org:4"])
+        self.assertEqual(organism.get_pathways_by_genes(["org:1"]),
+                         ["path:org00010", "path:org00020"])
+        self.assertEqual(organism.pathways(with_ids=["org:1", "org:3"]),
+                         ["path:org00020"])
+        self.assertEqual(organism.pathways(with_ids=["org:1", "org:3"]),
+                         online.pathways(with_ids=["org:1", "org:3"]))
+        reference = ["org:1", "org:2", "org:3", "org:4"]
+        self.assertEqual(
+            organism.get_enriched_pathways(["org:1", "org:3"], reference),
+            online.get_enriched_pathways(["org:1", "org:3"], reference))
+        self.assertEqual(sorted(organism.api.get_genes_pathway_organism("org")),
+                         sorted(online.api.get_genes_pathway_organism("org")))
+
+    def test_pathways(self):
+        # the KGML files are read from the snapshot
+        shutil.rmtree(conf.params["cache.path"])
+        organism = kegg.Organism.from_snapshot(self.snapshot_path)
+        self.assertEqual(organism.get_genes_by_pathway("path:org00020"),
+                         ["org:1", "org:3"])
+        self.assertEqual(organism.get_compounds_by_pathway("path:org00010"),
+                         ["cpd:C00022"])
+        pathway = organism.pathway("path:org00010")
+        self.assertEqual(pathway.title, "Pathway org00010")
+        self.assertRaises(KeyError, organism.pathway, "path:org99999")
+
+    def test_snapshot(self):
+        snapshot = offline.OrganismSnapshot(self.snapshot_path)
+        self.assertRaises(ValueError, snapshot.list, "hsa")
+        self.assertRaises(ValueError, snapshot.conv, "org", "uniprot")
+        self.assertEqual(snapshot.conv("org", "ncbi-geneid"),
+                         Api().conv("org", "ncbi-geneid"))
+
+        # a different layout version
+        meta_path = os.path.join(self.snapshot_path, "tables", "meta.json")
+        with open(meta_path) as f:
+            meta = json.load(f)
+        meta["version"] = "kegg-organism-0"
+        with open(meta_path, "w") as f:
+            json.dump(meta, f)
+        self.assertRaises(ValueError, offline.OrganismSnapshot,
+                          self.snapshot_path)
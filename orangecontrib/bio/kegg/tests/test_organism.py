@@ -0,0 +1,90 @@
+import unittest
+
+from orangecontrib.bio import kegg
+from orangecontrib.bio.utils import stats
+
+
+LINKS = [("org:1", "path:org00010"), ("org:1", "path:org00020"),
+         ("org:2", "path:org00010"), ("org:3", "path:org00030"),
+         ("org:4", "path:org00010"), ("org:4", "path:org00030"),
+         ("org:5", "path:org00020"), ("org:2", "path:org00010")]
+
+
+class Api(object):
+    calls = 0
+
+    def get_genes_pathway_organism(self, org):
+        self.calls += 1
+        return list(LINKS)
+
+
+class TestOrganism(unittest.TestCase):
+    def setUp(self):
+        self.organism = kegg.Organism.__new__(kegg.Organism)
+        self.organism.org_code = "org"
+        self.organism.api = Api()
+
+    def enrichment(self, genes, reference, prob):
+        pathways = {}
+        for gene, pid in set(LINKS):
+            pathways.setdefault(pid, set()).add(gene)
+        res = {}
+        for pid, pgenes in pathways.items():
+            hits = [g for g in genes if g in pgenes]
+            if hits:
+                m = len(reference & pgenes)
+                res[pid] = (hits, prob.p_value(len(hits), len(reference), m,
+                                               len(genes)), m)
+        return res
+
+    def assertResultsEqual(self, result, expected):
+        self.assertEqual(sorted(result), sorted(expected))
+        for pid in expected:
+            self.assertEqual(result[pid][0], expected[pid][0])
+            self.assertAlmostEqual(result[pid][1], expected[pid][1])
+            self.assertEqual(result[pid][2], expected[pid][2])
+
+    def test_enriched_pathways(self):
+        genes = ["org:4", "org:1", "org:9", "org:4"]
+        reference = set(["org:1", "org:2", "org:3", "org:4", "org:6"])
+        for prob in [stats.Binomial(), stats.Hypergeometric()]:
+            result = self.organism.get_enriched_pathways(
+                genes, reference=reference, prob=prob)
+            self.assertResultsEqual(
+                result, self.enrichment(genes, reference, prob))
+        self.assertEqual(result["path:org00010"][0],
+                         ["org:4", "org:1", "org:4"])
+        self.assertEqual(result["path:org00020"][2], 1)
+        # the link table is retrieved once
+        self.assertEqual(self.organism.api.calls, 1)
+
+        self.assertEqual(self.organism.get_enriched_pathways(
+            ["org:9"], reference=reference), {})
+        # any iterable of genes
+        unordered = self.organism.get_enriched_pathways(
+            set(genes), reference=reference)
+        self.assertResultsEqual(
+            dict((pid, (sorted(g), p, m))
+                 for pid, (g, p, m) in unordered.items()),
+            self.organism.get_enriched_pathways(
+                sorted(set(genes)), reference=reference))
+        self.assertEqual(self.organism.get_enriched_pathways(
+            (g for g in genes), reference=reference, prob=prob), result)
+
+    def test_p_value_fallback(self):
+        class Prob(object):
+            def p_value(self, k, N, m, n):
+                return float(k) / n
+
+        result = self.organism.get_enriched_pathways(
+            ["org:1", "org:3"], reference=["org:1", "org:3"], prob=Prob())
+        self.assertEqual(result["path:org00030"], (["org:3"], 0.5, 1))
+
+    def test_pathways_by_genes(self):
+        organism = self.organism
+        self.assertEqual(organism.get_pathways_by_genes(["org:1", "org:4"]),
+                         ["path:org00010"])
+        self.assertEqual(organism.get_pathways_by_genes(["org:1"]),
+                         ["path:org00010", "path:org00020"])
+        self.assertEqual(organism.get_pathways_by_genes(["org:1", "org:9"]),
+                         [])
@@ -0,0 +1,330 @@
+import os
+import shutil
+import tempfile
+import unittest
+import random
+
+import numpy
+
+from orangecontrib.bio.geneset import GeneSet
+from orangecontrib.bio.utils import enrichment, expression
+
+
+class TestEnrichmentScores(unittest.TestCase):
+    def setUp(self):
+        rand = random.Random(42)
+        self.ngenes = 200
+        lcor = [rand.gauss(0, 1) for _ in range(self.ngenes)]
+        # genes without correlation (not in the ranking)
+        self.unranked = list(range(190, 200))
+        for i in self.unranked:
+            lcor[i] = 0.0
+        self.lcor = lcor
+        self.ordered = enrichment.orderedPointersCorr(lcor)
+
+        subsets = [rand.sample(range(self.ngenes), rand.randint(1, 60))
+                   for _ in range(100)]
+        # duplicated members, single genes, an empty set and sets of
+        # genes that are not ranked
+        subsets += [[3, 3, 7, 7, 7], [self.ordered[0]], [self.ordered[-1]],
+                    [], self.unranked, self.unranked[:1],
+                    list(range(self.ngenes - 1))]
+        self.subsets = subsets
+
+    def _reference(self, p=1.0, rev2=None):
+        return [enrichment.enrichmentScoreRanked(
+                    s, self.lcor, self.ordered, p=p, rev2=rev2)[0]
+                for s in self.subsets]
+
+    def test_equivalence(self):
+        for p in [1.0, 0.5, 2.0]:
+            scores = enrichment.enrichmentScoresRanked(
+                self.subsets, self.lcor, self.ordered, p=p)
+            self.assertEqual(scores.tolist(), self._reference(p), msg=p)
+
+    def test_special_sets(self):
+        scores = enrichment.enrichmentScoresRanked(
+            self.subsets, self.lcor, self.ordered)
+        empty = self.subsets.index([])
+        self.assertEqual(scores[empty], 0.0)
+        self.assertEqual(
+            enrichment.enrichmentScoreRanked([], self.lcor, self.ordered),
+            (0.0, None))
+        unranked = self.subsets.index(self.unranked)
+        self.assertEqual(scores[unranked], 0.0)
+        self.assertEqual(scores[unranked + 1], 0.0)
+
+    def test_rev2(self):
+        rev2 = numpy.argsort(self.ordered)
+        for p in [1.0, 0.5, 2.0]:
+            scores = enrichment.enrichmentScoresRanked(
+                self.subsets, self.lcor, self.ordered, p=p, rev2=rev2)
+            self.assertEqual(scores.tolist(), self._reference(p, rev2))
+            self.assertEqual(scores.tolist(), self._reference(p))
+
+    def test_membership(self):
+        members = enrichment._SetMembership(self.subsets, chunk=500)
+        self.assertGreater(len(members.chunks), 1)
+        self.assertEqual(len(members), len(self.subsets))
+        self.assertEqual(members.sizes.tolist(),
+                         [len(set(s)) for s in self.subsets])
+        scores = enrichment.enrichmentScoresRanked(
+            members, self.lcor, self.ordered)
+        self.assertEqual(scores.tolist(), self._reference())
+
+    def test_all_genes(self):
+        # a set of all genes has no genes outside it
+        self.assertRaises(ZeroDivisionError,
+                          enrichment.enrichmentScoresRanked,
+                          [range(self.ngenes)], self.lcor, self.ordered)
+
+
+def shuffle_class(values, rands=0):
+    # the shuffling of gsea.shuffleClass and gsea.shuffleAttribute
+    # (which need Orange 2 tables)
+    rand = random.Random(rands)
+    locations = list(range(len(values)))
+    rand.shuffle(locations)
+    l = [None]*len(values)
+    for i in range(len(values)):
+        l[locations[i]] = values[i]
+    return l
+
+
+class TestShuffle(unittest.TestCase):
+    def test_shuffle_labels(self):
+        labels = numpy.array([0] * 10 + [1] * 7 + [-1] * 3)
+        for seed in [0, 1, 2000, 2099]:
+            shuffled = enrichment.shuffleLabels(labels, seed)
+            self.assertEqual(shuffled.tolist(), shuffle_class(labels, seed))
+            self.assertEqual(sorted(shuffled), sorted(labels))
+        values = numpy.arange(20.0)
+        self.assertEqual(enrichment.shuffleLabels(values, 5).tolist(),
+                         shuffle_class(values, 5))
+
+
+def shuffle_rows(data, seed):
+    X, labels = data
+    return X[enrichment.shuffleLabels(numpy.arange(len(X)), seed)], labels
+
+
+def rank_rows(data):
+    return expression.signal_to_noise(*data).tolist()
+
+
+class TestPermutationNulls(unittest.TestCase):
+    def setUp(self):
+        rand = numpy.random.RandomState(0)
+        self.X = rand.normal(size=(12, 80))
+        self.labels = numpy.array([0] * 6 + [1] * 6)
+        self.X[self.labels == 0, :10] += 1.5
+        self.lcor = expression.signal_to_noise(self.X, self.labels).tolist()
+        self.members = enrichment._SetMembership(
+            [range(10), range(5, 25), range(40, 50), [70]])
+
+    def _test_jobs(self, args, n=7):
+        serial = enrichment._permutationNulls(args, n, n_jobs=1)
+        self.assertEqual(len(serial), len(self.members))
+        self.assertTrue(all(len(null) == n for null in serial))
+        calls = []
+        parallel = enrichment._permutationNulls(
+            args, n, n_jobs=2, callback=lambda: calls.append(1))
+        self.assertEqual(parallel, serial)
+        self.assertEqual(len(calls), n)
+        return serial
+
+    def test_attributes(self):
+        self._test_jobs((None, None, self.lcor, self.members, "attributes"))
+
+    def test_matrix(self):
+        nulls = self._test_jobs(((self.X, self.labels),
+                                 expression.signal_to_noise, self.lcor,
+                                 self.members, "matrix"))
+        # the first set is enriched in the data, not in the permutations
+        es = enrichment.enrichmentScoresRanked(
+            self.members, self.lcor,
+            enrichment.orderedPointersCorr(self.lcor))
+        self.assertGreater(es[0], max(nulls[0]))
+
+    def test_permutation_function(self):
+        self._test_jobs(((self.X, self.labels), rank_rows, self.lcor,
+                         self.members, shuffle_rows))
+
+    def test_unpicklable(self):
+        # computed serially
+        ranking = lambda data: expression.signal_to_noise(*data).tolist()
+        self._test_jobs(((self.X, self.labels), ranking, self.lcor,
+                         self.members, shuffle_rows))
+
+
+class TestSignificance(unittest.TestCase):
+    def assertSignificance(self, es, nulls, expected):
+        result = enrichment.gseaSignificance(es, nulls)
+        self.assertEqual(len(result), len(expected))
+        for values, expected_values in zip(result, expected):
+            for value, expected_value in zip(values, expected_values):
+                self.assertAlmostEqual(value, expected_value, places=12,
+                                       msg=(values, expected_values))
+        # a matrix of nulls
+        self.assertEqual(enrichment.gseaSignificance(
+            numpy.array(es), numpy.array(nulls, dtype=float)), result)
+        return result
+
+    def test_significance(self):
+        # set 0: p = 1/3 (0.6 of 0.2, 0.6, 0.4), NES = 0.5 / 0.4
+        # set 1: p = 1/2 (-0.6 of -0.2, -0.6), NES = -0.4 / 0.4
+        # normalized nulls: 0.5, 1.5, -1, 1 and -0.5, -1.5, 0.5, 1.5
+        # FDR: (2/5) / (1/1) and (2/3) / (1/1)
+        self.assertSignificance(
+            [0.5, -0.4],
+            [[0.2, 0.6, -0.3, 0.4], [-0.2, -0.6, 0.1, 0.3]],
+            [(0.5, 1.25, 1. / 3, 0.4), (-0.4, -1.0, 0.5, 2. / 3)])
+
+    def test_positive_nulls(self):
+        # no negative nulls: p = 1 and NES = 0 for the negative ES
+        self.assertSignificance(
+            [0.3, -0.2], [[0.1, 0.5], [0.2, 0.4]],
+            [(0.3, 1.0, 0.5, (2. / 4) / (1. / 2)), (-0.2, 0.0, 1.0, 1.0)])
+
+    def test_negative_nulls(self):
+        # the FDR of NES = 0 is undefined without non-negative nulls
+        self.assertSignificance(
+            [-0.3, 0.2], [[-0.1, -0.5], [-0.2, -0.4]],
+            [(-0.3, -1.0, 0.5, 0.5), (0.2, 0.0, 1.0, 1e9)])
+
+    def test_zero(self):
+        self.assertSignificance(
+            [0.0, 0.1], [[0.1, -0.1, 0.0], [0.2, 0.1, -0.3]],
+            [(0.0, 0.0, 1.0, 1.0), (0.1, 2. / 3, 1.0, (3. / 4) / (1. / 2))])
+
+    def test_empty(self):
+        self.assertSignificance(
+            [0.4, -0.1], [[], []],
+            [(0.4, 0.0, 1.0, 1e9), (-0.1, 0.0, 1.0, 1e9)])
+        self.assertEqual(enrichment.gseaSignificance([], []), [])
+
+
+class TestStreamingNulls(unittest.TestCase):
+    def streaming(self, es, nulls):
+        streaming = enrichment._StreamingNulls(es)
+        for scores in numpy.transpose(nulls):
+            streaming.add(scores)
+        streaming.normalize()
+        for scores in numpy.transpose(nulls):
+            streaming.add(scores)
+        # the statistics do not depend on the number of permutations
+        for value in vars(streaming).values():
+            if isinstance(value, numpy.ndarray):
+                self.assertLessEqual(value.size, len(es) + 1)
+        return streaming.significance()
+
+    def assertSame(self, es, nulls):
+        expected = enrichment.gseaSignificance(es, nulls)
+        result = self.streaming(es, nulls)
+        self.assertEqual(len(result), len(expected))
+        for values, expected_values in zip(result, expected):
+            # ES, NES and p-values
+            self.assertEqual(values[:3], expected_values[:3])
+            self.assertAlmostEqual(values[3], expected_values[3], places=12)
+
+    def test_random(self):
+        rand = numpy.random.RandomState(0)
+        nulls = rand.uniform(-0.8, 0.8, size=(60, 100)).round(2)
+        es = rand.uniform(-0.9, 0.9, size=60).round(2)
+        es[:3] = [0.0, es[4], -es[5]]
+        nulls[6] = numpy.abs(nulls[6])
+        nulls[7] = -numpy.abs(nulls[7])
+        self.assertSame(es, nulls)
+
+    def test_special(self):
+        self.assertSame([0.3, -0.2], [[0.1, 0.5], [0.2, 0.4]])
+        self.assertSame([-0.3, 0.2], [[-0.1, -0.5], [-0.2, -0.4]])
+        self.assertSame([0.0, 0.1], [[0.1, -0.1, 0.0], [0.2, 0.1, -0.3]])
+        self.assertSame([0.4, -0.1], numpy.zeros((2, 0)))
+        self.assertEqual(enrichment._StreamingNulls([]).significance(), [])
+
+    def test_significance(self):
+        rand = random.Random(0)
+        lcor = [rand.gauss(0, 1) for _ in range(300)]
+        subsets = [rand.sample(range(300), rand.randint(3, 40))
+                   for _ in range(30)]
+        members = enrichment._SetMembership(subsets)
+        ordered = enrichment.orderedPointersCorr(lcor)
+        es = enrichment.enrichmentScoresRanked(members, lcor, ordered)
+        args = (None, None, lcor, members, "attributes")
+        calls = []
+        expected = enrichment._significance(es, args, 20)
+        result = enrichment._significance(
+            es, args, 20, callback=lambda: calls.append(1), streaming=True)
+        self.assertEqual(len(calls), 40)
+        self.assertEqual([r[:3] for r in result], [r[:3] for r in expected])
+        numpy.testing.assert_allclose([r[3] for r in result],
+                                      [r[3] for r in expected], rtol=1e-12)
+
+
+class TestGenesetMembership(unittest.TestCase):
+    def setUp(self):
+        # attribute B is measured twice
+        self.attributes = ["A", "B", "C", "B", "D", "E"]
+        self.genesets = [
+            GeneSet(genes=["a", "b", "x"], id="1", name="one"),
+            GeneSet(genes=["c", "d", "e", "y", "z"], id="2", name="two"),
+            GeneSet(genes=["x", "y"], id="3", name="three"),
+            GeneSet(genes=["b", "c", "d", "e"], id="4", name="four")]
+        self.matches = [[("a", "A"), ("b", "B")],
+                        [("c", "C"), ("d", "D"), ("e", "E")],
+                        [],
+                        [("b", "B"), ("c", "C"), ("d", "D"), ("e", "E")]]
+        self.membership = enrichment.GenesetMembership(
+            self.attributes, self.genesets, self.matches)
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def assertMembership(self, membership):
+        self.assertEqual(len(membership), 4)
+        self.assertEqual(membership.attributes, tuple(self.attributes))
+        self.assertEqual(membership.genesets, self.genesets)
+        self.assertEqual(membership.sizes.tolist(), [3, 5, 2, 4])
+        self.assertEqual(membership.matched_sizes().tolist(), [2, 3, 0, 4])
+        for i, matches in enumerate(self.matches):
+            self.assertEqual(membership.matches(i), matches)
+        self.assertEqual(membership.indptr.tolist(), [0, 3, 6, 6, 11])
+        self.assertEqual([membership.columns(i).tolist() for i in range(4)],
+                         [[0, 1, 3], [2, 4, 5], [], [1, 3, 2, 4, 5]])
+        self.assertEqual(membership.select().tolist(), [1, 3])
+        self.assertEqual(membership.select(minSize=2, minPart=0.6).tolist(),
+                         [0, 1, 3])
+        self.assertEqual(membership.select(maxSize=3).tolist(), [1])
+
+    def test_membership(self):
+        self.assertMembership(self.membership)
+        self.assertEqual(self.membership.names, ["A", "B", "C", "D", "E"])
+
+    def test_save_load(self):
+        filename = os.path.join(self.path, "membership.pck")
+        self.membership.save(filename)
+        loaded = enrichment.GenesetMembership.load(filename)
+        self.assertIsInstance(loaded, enrichment.GenesetMembership)
+        self.assertMembership(loaded)
+
+        # the loaded membership gives the same enrichment scores
+        lcor = [0.9, 0.5, -0.3, 0.4, -0.8, 0.1]
+        ordered = enrichment.orderedPointersCorr(lcor)
+        scores = [enrichment.enrichmentScoresRanked(
+                      [m.columns(i).tolist() for i in m.select(minSize=2)],
+                      lcor, ordered).tolist()
+                  for m in [self.membership, loaded]]
+        self.assertEqual(scores[0], scores[1])
+        self.assertEqual(len(scores[0]), 3)
+
+    def test_empty(self):
+        membership = enrichment.GenesetMembership(self.attributes, [], [])
+        self.assertEqual(len(membership), 0)
+        self.assertEqual(membership.indptr.tolist(), [0])
+        self.assertEqual(membership.select().tolist(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,172 @@
+import unittest
+
+import numpy
+import numpy.ma
+import scipy.stats
+
+from orangecontrib.bio.utils import expression
+
+
+def finite(value, default):
+    return value if numpy.isfinite(value) else default
+
+
+def class_values(x, labels, value):
+    x = x[labels == value]
+    return x[~numpy.isnan(x)]
+
+
+def signal_to_noise(xa, xb):
+    # as MA_signalToNoise
+    def stdevm(l):
+        m = numpy.mean(l)
+        return max(numpy.std(l, ddof=1), 0.2 * abs(1.0 if m == 0 else m))
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        return finite((numpy.mean(xa) - numpy.mean(xb)) /
+                      (stdevm(xa) + stdevm(xb)), 0.0)
+
+
+def fold_change(xa, xb):
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        return finite(numpy.mean(xa) / numpy.mean(xb), 1.0)
+
+
+class TestRankingFunctions(unittest.TestCase):
+    def setUp(self):
+        rand = numpy.random.RandomState(42)
+        X = rand.normal(loc=2.0, size=(16, 40))
+        X[rand.uniform(size=X.shape) < 0.1] = numpy.nan
+        labels = numpy.array([0, 1] * 7 + [-1, 2])
+        # zero variance (in both classes, equal or different means)
+        X[:, 0] = 3.0
+        X[:, 1] = numpy.where(labels == 0, 1.0, 2.0)
+        X[:, 2] = 0.0
+        # values of one class missing, a single value of one class
+        X[labels == 1, 3] = numpy.nan
+        X[:, 4] = numpy.where(labels == 0, numpy.nan, X[:, 4])
+        X[numpy.flatnonzero(labels == 0)[0], 4] = 1.5
+        X[:, 5] = numpy.nan
+        self.X, self.labels = X, labels
+
+    def _test_genes(self, function, reference, **kwargs):
+        X, labels = self.X, self.labels
+        scores = function(X, labels, **kwargs)
+        self.assertEqual(scores.shape, (X.shape[1],))
+        expected = [reference(class_values(x, labels, 0),
+                              class_values(x, labels, 1))
+                    for x in X.T]
+        numpy.testing.assert_allclose(scores, expected, rtol=1e-9, atol=1e-12)
+
+        # masked values are missing
+        masked = numpy.ma.masked_invalid(X)
+        numpy.testing.assert_array_equal(function(masked, labels, **kwargs),
+                                         scores)
+        # a batch of permuted label vectors
+        rand = numpy.random.RandomState(0)
+        batch = numpy.array([rand.permutation(labels) for _ in range(5)])
+        batch_scores = function(X, batch, **kwargs)
+        self.assertEqual(batch_scores.shape, (5, X.shape[1]))
+        for permuted, s in zip(batch, batch_scores):
+            numpy.testing.assert_allclose(s, function(X, permuted, **kwargs),
+                                          rtol=1e-12, atol=1e-12)
+        return scores
+
+    def test_signal_to_noise(self):
+        scores = self._test_genes(expression.signal_to_noise,
+                                  signal_to_noise)
+        # the standard deviations are at least 0.2 * |mean|
+        self.assertEqual(scores[0], 0.0)
+        self.assertAlmostEqual(scores[1], -1.0 / (0.2 + 0.4))
+        self.assertEqual(scores[2], 0.0)
+        self.assertEqual(scores[5], 0.0)
+        # other classes
+        relabeled = numpy.select([self.labels == 1, self.labels == 0],
+                                 [0, 1], -1)
+        numpy.testing.assert_array_equal(
+            expression.signal_to_noise(self.X, self.labels, a=1, b=0),
+            expression.signal_to_noise(self.X, relabeled))
+
+    def test_signal_to_noise_ranking(self):
+        # MA_signalToNoise (NaN for a class with less than two values)
+        def stdevm(l):
+            m = numpy.mean(l)
+            return max(numpy.std(l, ddof=1), 0.2 * abs(1.0 if m == 0 else m))
+
+        with numpy.errstate(divide="ignore", invalid="ignore"):
+            old = numpy.array(
+                [(numpy.mean(xa) - numpy.mean(xb)) /
+                 (stdevm(xa) + stdevm(xb))
+                 for xa, xb in [(class_values(x, self.labels, 0),
+                                 class_values(x, self.labels, 1))
+                                for x in self.X.T]])
+        scores = expression.signal_to_noise(self.X, self.labels)
+        defined = ~numpy.isnan(old)
+        # constant genes have the same (defined) scores
+        self.assertTrue(numpy.all(defined[[0, 1, 2]]))
+        numpy.testing.assert_allclose(scores[defined], old[defined],
+                                      rtol=1e-9, atol=1e-12)
+        # and the same ranks among the defined genes
+        numpy.testing.assert_array_equal(
+            numpy.argsort(scores[defined], kind="mergesort"),
+            numpy.argsort(old[defined], kind="mergesort"))
+        # undefined scores are 0 instead of NaN
+        numpy.testing.assert_array_equal(numpy.flatnonzero(~defined),
+                                         [3, 4, 5])
+        self.assertTrue(numpy.all(scores[~defined] == 0.0))
+
+    def test_t_test(self):
+        def t(xa, xb):
+            with numpy.errstate(divide="ignore", invalid="ignore"):
+                return finite(scipy.stats.ttest_ind(xa, xb)[0], 0.0)
+
+        def p(xa, xb):
+            with numpy.errstate(divide="ignore", invalid="ignore"):
+                return finite(scipy.stats.ttest_ind(xa, xb)[1], 1.0)
+
+        scores = self._test_genes(expression.t_test, t)
+        self.assertTrue(numpy.all(scores[[0, 1, 2, 3, 5]] == 0.0))
+        probs = self._test_genes(expression.t_test, p, prob=True)
+        self.assertTrue(numpy.all(probs[[0, 2, 3, 5]] == 1.0))
+        # different constant classes
+        self.assertEqual(probs[1], 0.0)
+        self.assertTrue(numpy.all((probs >= 0) & (probs <= 1)))
+
+    def test_fold_change(self):
+        scores = self._test_genes(expression.fold_change, fold_change)
+        self.assertEqual(scores[0], 1.0)
+        self.assertEqual(scores[1], 0.5)
+        self.assertEqual(scores[2], 1.0)
+
+    def test_pearson_correlation(self):
+        rand = numpy.random.RandomState(1)
+        y = rand.normal(size=len(self.X))
+        y[3] = numpy.nan
+        X = self.X.copy()
+        X[:, 6] = 2 * y + 1
+
+        scores = expression.pearson_correlation(X, y)
+        expected = []
+        for x in X.T:
+            present = ~numpy.isnan(x) & ~numpy.isnan(y)
+            with numpy.errstate(divide="ignore", invalid="ignore"):
+                r = numpy.corrcoef(x[present], y[present])[0, 1] \
+                    if present.sum() > 1 else numpy.nan
+            expected.append(finite(r, 0.0))
+        numpy.testing.assert_allclose(scores, expected, rtol=1e-9,
+                                      atol=1e-12)
+        # zero variance and missing genes
+        self.assertEqual(scores[0], 0.0)
+        self.assertEqual(scores[5], 0.0)
+        self.assertAlmostEqual(scores[6], 1.0)
+
+        masked = numpy.ma.masked_invalid(X)
+        numpy.testing.assert_array_equal(
+            expression.pearson_correlation(masked, y), scores)
+        batch = numpy.array([y, y[::-1]])
+        numpy.testing.assert_allclose(
+            expression.pearson_correlation(X, batch)[1],
+            expression.pearson_correlation(X, y[::-1]), rtol=1e-12)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,247 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from orangecontrib.bio import gene
+
+
+ALIASES = [
+    {"ABC1", "abc-1", "1001"},
+    {"DEF2", "1002"},
+    {"GHI3", "ghi", "1003"},
+    {"ghi", "JKL4", "1004"},
+]
+
+TARGETS = ["1001", "DEF2", "ghi3", "1004", "XYZ"]
+
+
+class TestMatcherAliases(unittest.TestCase):
+    def test_match(self):
+        m = gene.MatcherAliases(ALIASES).set_targets(TARGETS)
+        self.assertEqual(m.match("abc1"), ["1001"])
+        self.assertEqual(m.match("ABC-1"), ["1001"])
+        self.assertEqual(m.match("1002"), ["DEF2"])
+        self.assertEqual(sorted(m.match("GHI")), ["1004", "ghi3"])
+        self.assertEqual(m.match("XYZ"), [])
+        self.assertEqual(m.match("unknown"), [])
+        self.assertEqual(m.umatch("jkl4"), "1004")
+        self.assertIsNone(m.umatch("ghi"))
+        self.assertIsNone(m.umatch("unknown"))
+
+    def test_case_sensitive(self):
+        m = gene.MatcherAliases(ALIASES, ignore_case=False) \
+            .set_targets(TARGETS)
+        self.assertEqual(m.match("ABC1"), ["1001"])
+        self.assertEqual(m.match("abc1"), [])
+        self.assertEqual(m.match("GHI3"), [])
+
+    def test_match_many(self):
+        m = gene.MatcherAliases(ALIASES).set_targets(TARGETS)
+        genes = ["abc1", "GHI", "1003", "unknown", "def2"]
+        self.assertEqual(m.match_many(genes), [m.match(g) for g in genes])
+
+    def test_sequence(self):
+        mat = gene.matcher([gene.MatcherAliases(ALIASES)])
+        m = mat.set_targets(TARGETS)
+        self.assertIsNotNone(m.direct)
+        # direct matches come first
+        self.assertEqual(m.match("1004"), ["1004"])
+        self.assertEqual(m.match("xyz"), ["XYZ"])
+        self.assertEqual(sorted(m.match("ghi")), ["1004", "ghi3"])
+        self.assertEqual(m.umatch("abc-1"), "1001")
+        genes = ["abc1", "GHI", "1003", "unknown", "xyz"]
+        self.assertEqual(m.match_many(genes), [m.match(g) for g in genes])
+        self.assertEqual(mat.match_many(genes), m.match_many(genes))
+
+    def test_sequence_mixed_case(self):
+        mat = gene.matcher([gene.MatcherAliases(ALIASES, ignore_case=False)])
+        m = mat.set_targets(TARGETS)
+        self.assertIsNone(m.direct)
+        self.assertEqual(m.match("xyz"), ["XYZ"])
+        self.assertEqual(m.match("ABC1"), ["1001"])
+        self.assertEqual(m.match("abc1"), [])
+        self.assertEqual(m.match_many(["xyz", "abc1"]), [["XYZ"], []])
+
+
+class TestJoinSets(unittest.TestCase):
+    def _groups(self, groups):
+        return sorted(sorted(g) for g in groups)
+
+    def test_join_sets(self):
+        set1 = [{"a", "b"}, {"c"}, {"d", "e"}]
+        set2 = [{"a", "c"}, {"F"}, {"x"}]
+        self.assertEqual(
+            self._groups(gene.join_sets(set1, set2)),
+            [["F"], ["a", "b", "c"], ["a", "c"], ["d", "e"], ["x"]])
+        self.assertEqual(
+            self._groups(gene.join_sets(set1, set2)),
+            self._groups(gene.join_sets(set2, set1)))
+
+    def test_join_sets_lower(self):
+        set1 = [{"ABC", "1"}, {"def"}]
+        set2 = [{"abc", "2"}, {"DEF"}]
+        self.assertEqual(
+            self._groups(gene.join_sets(set1, set2)),
+            [["1", "ABC"], ["2", "abc"], ["DEF"], ["def"]])
+        self.assertEqual(
+            self._groups(gene.join_sets(set1, set2, lower=True)),
+            [["1", "2", "ABC", "abc"], ["DEF", "def"]])
+
+    def test_join_sets_l(self):
+        lsets = [[{"a", "b"}, {"c"}], [{"b", "d"}], [{"d", "e"}, {"c", "f"}],
+                 []]
+        joined = gene.join_sets_l(lsets)
+        self.assertEqual(self._groups(joined),
+                         [["a", "b", "d", "e"], ["c", "f"]])
+        self.assertEqual(
+            self._groups(joined),
+            self._groups(gene.join_sets(
+                gene.join_sets(lsets[0], lsets[1]), lsets[2])))
+
+    def test_alias_groups(self):
+        groups = gene._join_interned([[{"a", "b"}, {"c"}], [{"b", "d"}]])
+        self.assertEqual(len(groups), 2)
+        self.assertEqual(list(groups), [groups[0], groups[1]])
+        self.assertEqual(groups[-1], groups[1])
+        self.assertEqual(self._groups(groups), [["a", "b", "d"], ["c"]])
+        mapping = gene.create_mapping(groups)
+        self.assertEqual(mapping["d"], mapping["a"])
+
+
+class AliasesTest(gene.MatcherAliasesPickled):
+    created = 0
+
+    def filename(self):
+        return "test_aliases"
+
+    def create_aliases_version(self):
+        return self.version
+
+    def create_aliases(self):
+        AliasesTest.created += 1
+        return ALIASES
+
+    def __init__(self, version="v1", ignore_case=True):
+        self.version = version
+        gene.MatcherAliasesPickled.__init__(self, ignore_case=ignore_case)
+
+
+class TestAliasIndex(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.saved_path = gene.gene_matcher_path
+        gene.gene_matcher_path = self.path
+        AliasesTest.created = 0
+
+    def tearDown(self):
+        gene.gene_matcher_path = self.saved_path
+        shutil.rmtree(self.path)
+
+    def test_mapping(self):
+        for lower in [False, True]:
+            index = gene._AliasIndex.build(ALIASES, lower=lower)
+            mapping = gene.create_mapping(ALIASES, lower=lower)
+            self.assertEqual(len(index), len(mapping))
+            for key in mapping:
+                self.assertIn(key, index)
+                self.assertEqual(index[key], mapping[key])
+            self.assertNotIn("unknown", index)
+            self.assertEqual(index["unknown"], set())
+            self.assertIsNone(index.get("unknown"))
+            self.assertEqual(list(index.groups), ALIASES)
+
+    def test_snapshot(self):
+        m = AliasesTest().set_targets(TARGETS)
+        self.assertEqual(AliasesTest.created, 1)
+        self.assertTrue(os.path.isdir(AliasesTest().index_path()))
+        self.assertEqual(sorted(m.match("GHI")), ["1004", "ghi3"])
+
+        # reuse the saved index
+        matcher = AliasesTest()
+        m = matcher.set_targets(TARGETS)
+        self.assertEqual(AliasesTest.created, 1)
+        self.assertIsInstance(matcher.mdict, gene._AliasIndex)
+        self.assertEqual(m.match("abc-1"), ["1001"])
+        self.assertEqual(list(matcher.aliases), ALIASES)
+
+        # a different version or case sensitivity
+        AliasesTest(version="v2").set_targets(TARGETS)
+        self.assertEqual(AliasesTest.created, 2)
+        m = AliasesTest(version="v2", ignore_case=False).set_targets(TARGETS)
+        self.assertEqual(AliasesTest.created, 3)
+        self.assertEqual(m.match("abc1"), [])
+        self.assertEqual(m.match("ABC1"), ["1001"])
+
+    def test_snapshot_not_saved(self):
+        # a file in place of the snapshot directory
+        with open(AliasesTest().index_path(), "w") as f:
+            f.write("not a snapshot")
+        matcher = AliasesTest()
+        m = matcher.set_targets(TARGETS)
+        self.assertIsInstance(matcher.mdict, gene._AliasIndex)
+        self.assertEqual(sorted(m.match("GHI")), ["1004", "ghi3"])
+
+    def test_snapshot_saved_meanwhile(self):
+        path = AliasesTest().index_path()
+        index = gene._AliasIndex.build(ALIASES)
+        gene.snapshot.save(path, index.arrays(), "v1")
+        mapped, _ = gene.snapshot.load(path, version="v1")
+        # another process saving the same version keeps the snapshot
+        other = gene._AliasIndex.build(ALIASES[:1])
+        gene.snapshot.save(path, other.arrays(), "v1")
+        arrays, _ = gene.snapshot.load(path, version="v1")
+        self.assertEqual(len(gene._AliasIndex.from_arrays(arrays)),
+                         len(index))
+        self.assertEqual(len(gene._AliasIndex.from_arrays(mapped)),
+                         len(index))
+        # a stale snapshot is replaced
+        gene.snapshot.save(path, other.arrays(), "v2")
+        arrays, _ = gene.snapshot.load(path, version="v2")
+        self.assertEqual(len(gene._AliasIndex.from_arrays(arrays)),
+                         len(other))
+        self.assertEqual(os.listdir(self.path), [os.path.basename(path)])
+
+
+GENE_INFO = (
+    "#tax_id\tGeneID\tSymbol\tLocusTag\tSynonyms\n"
+    "9606\t1\tA1BG\t-\tA1B|ABG\n"
+    "\n"
+    "9606\t2\tA2M\t-\t-\r\n"
+    "9606\t9\tNAT1\t-\tAAC1"
+)
+
+
+class TestGeneInfoIndex(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.fname = os.path.join(self.path, "gene_info.9606.db")
+        with open(self.fname, "wb") as f:
+            f.write(GENE_INFO.encode("utf-8"))
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_index(self):
+        ids, offsets = gene._gene_info_index(self.fname)
+        self.assertEqual(ids, ["1", "2", "9"])
+        self.assertTrue(os.path.isdir(self.fname + ".index"))
+        self.assertEqual(gene._gene_info_index(self.fname), (ids, offsets))
+
+        info = gene.NCBIGeneInfo.__new__(gene.NCBIGeneInfo)
+        info._fname, info._mmap = self.fname, None
+        info.update(zip(ids, offsets))
+        self.assertEqual(info["1"].symbol, "A1BG")
+        self.assertEqual(info["1"].synonyms, ["A1B", "ABG"])
+        self.assertEqual(info["2"].synonyms, [])
+        self.assertEqual(info["9"].synonyms, ["AAC1"])
+        self.assertEqual(sorted(i.symbol for i in info.values()),
+                         ["A1BG", "A2M", "NAT1"])
+        self.assertIsNone(info.get("3"))
+
+    def test_stale_index(self):
+        gene._gene_info_index(self.fname)
+        with open(self.fname, "ab") as f:
+            f.write(b"\n9606\t10\tNAT2\t-\t-\n")
+        ids, _ = gene._gene_info_index(self.fname)
+        self.assertEqual(ids, ["1", "2", "9", "10"])
@@ -0,0 +1,348 @@
+import os
+import io
+import shutil
+import tarfile
+import tempfile
+import unittest
+
+import six
+from six import StringIO, BytesIO
+
+from orangecontrib.bio import go
+
+
+ONTOLOGY = """format-version: 1.2
+subsetdef: goslim_generic "Generic"
+
+[Term]
+id: GO:0000001
+name: root
+namespace: biological_process
+subset: goslim_generic
+
+[Term]
+id: GO:0000002
+name: a
+namespace: biological_process
+is_a: GO:0000001 ! root
+
+[Term]
+id: GO:0000003
+name: b
+namespace: biological_process
+is_a: GO:0000001 ! root
+subset: goslim_generic
+
+[Term]
+id: GO:0000004
+name: c
+namespace: biological_process
+alt_id: GO:0000104
+is_a: GO:0000002 ! a
+relationship: part_of GO:0000003 ! b
+
+[Typedef]
+id: part_of
+name: part of
+
+"""
+
+ANNOTATIONS = [
+    ("G1", "GO:0000004", "IDA"),
+    ("G2", "GO:0000104", "IEA"),
+    ("G3", "GO:0000002", "IDA"),
+    ("G4", "GO:0000003", "TAS"),
+    ("G5", "GO:0000001", "IEA"),
+    ("G6", "GO:0000003", "IEA"),
+]
+
+
+def gaf(annotations):
+    lines = ["!gaf-version: 2.0"]
+    for gene, term, evidence in annotations:
+        lines.append("\t".join(
+            ["DB", "ID" + gene, gene, "", term, "ref", evidence, "", "P",
+             "name", "", "protein", "taxon:1", "20100101", "DB", "", ""]))
+    return "\n".join(lines) + "\n"
+
+
+class TestOntology(unittest.TestCase):
+    def setUp(self):
+        self.ontology = go.Ontology(StringIO(ONTOLOGY))
+
+    def test_parse(self):
+        ont = self.ontology
+        self.assertEqual(len(ont), 4)
+        self.assertTrue(ont.header.startswith("format-version: 1.2\n"))
+        self.assertIn("part_of", ont.typedefs)
+        term = ont["GO:0000104"]
+        self.assertEqual(term.id, "GO:0000004")
+        self.assertEqual(term.name, "c")
+        self.assertEqual(term.related, set([("is_a", "GO:0000002"),
+                                            ("part_of", "GO:0000003")]))
+        self.assertEqual(ont["GO:0000003"].related_to,
+                         set([("part_of", "GO:0000004")]))
+        self.assertEqual(ont.defined_slims_subsets(), ["goslim_generic"])
+
+        # binary stream, missing final blank line
+        other = go.Ontology(BytesIO(ONTOLOGY.rstrip().encode("utf-8")))
+        self.assertEqual(set(other.terms), set(ont.terms))
+        self.assertIn("part_of", other.typedefs)
+
+    def test_parse_file(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(tmpdir, "gene_ontology_edit.obo")
+            with io.open(filename, "w", encoding="utf-8") as f:
+                f.write(ONTOLOGY.replace("name: root", u"name: r\u00f6\u00f6t"))
+            with tarfile.open(filename + ".tar.gz", "w:gz") as tar:
+                tar.add(filename, "gene_ontology_edit.obo")
+
+            progress = []
+            for path in [filename, filename + ".tar.gz", tmpdir]:
+                ont = go.Ontology(path, progress_callback=progress.append)
+                self.assertEqual(len(ont), 4)
+                if six.PY3:
+                    self.assertEqual(ont["GO:0000001"].name,
+                                     u"r\u00f6\u00f6t")
+                self.assertIsNotNone(ont.source_version)
+            self.assertTrue(progress)
+            self.assertTrue(all(0 <= p <= 100 for p in progress))
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_snapshot(self):
+        ont = self.ontology
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmpdir, "ontology.snapshot")
+            ont._save_snapshot(path, "v1")
+            loaded = go.Ontology(StringIO(ONTOLOGY))
+            loaded._load_snapshot(path, "v1")
+            self.assertRaises(ValueError, loaded._load_snapshot, path, "v2")
+        finally:
+            shutil.rmtree(tmpdir)
+
+        self.assertEqual(set(loaded), set(ont))
+        self.assertEqual(loaded.header, ont.header)
+        self.assertEqual(set(loaded.typedefs), set(ont.typedefs))
+        self.assertEqual(loaded.alias_mapper, ont.alias_mapper)
+        self.assertEqual(loaded.named_slims_subset("goslim_generic"),
+                         ont.named_slims_subset("goslim_generic"))
+        for id in ont:
+            self.assertEqual(loaded[id]._lines, ont[id]._lines)
+            self.assertEqual(loaded[id].related, ont[id].related)
+            self.assertEqual(loaded[id].related_to, ont[id].related_to)
+            self.assertEqual(loaded.extract_super_graph([id]),
+                             ont.extract_super_graph([id]))
+        self.assertEqual(loaded["GO:0000104"].name, "c")
+
+    def test_super_graph(self):
+        ont = self.ontology
+        self.assertEqual(ont.extract_super_graph("GO:0000004"),
+                         set(["GO:0000001", "GO:0000002", "GO:0000003",
+                              "GO:0000004"]))
+        self.assertEqual(ont.extract_super_graph(["GO:0000002",
+                                                  "GO:0000003"]),
+                         set(["GO:0000001", "GO:0000002", "GO:0000003"]))
+        self.assertIn("GO:0000104", ont.extract_super_graph(["GO:0000104"]))
+        self.assertEqual(ont.extract_super_graph([]), set())
+        self.assertRaises(KeyError, ont.extract_super_graph, ["GO:0000005"])
+
+    def test_sub_graph(self):
+        ont = self.ontology
+        self.assertEqual(ont.extract_sub_graph("GO:0000003"),
+                         set(["GO:0000003", "GO:0000004"]))
+        self.assertEqual(ont.extract_sub_graph(["GO:0000002",
+                                                "GO:0000003"]),
+                         set(["GO:0000002", "GO:0000003", "GO:0000004"]))
+        self.assertEqual(len(ont.extract_sub_graph(["GO:0000001"])), 4)
+
+    def test_slims_for_term(self):
+        ont = self.ontology
+        ont.set_slims_subset("goslim_generic")
+        self.assertEqual(ont.slims_for_term("GO:0000004"),
+                         set(["GO:0000001", "GO:0000003"]))
+        self.assertEqual(ont.slims_for_term("GO:0000003"),
+                         set(["GO:0000003"]))
+        ont.set_slims_subset(["GO:0000002"])
+        self.assertEqual(ont.slims_for_term("GO:0000004"),
+                         set(["GO:0000002"]))
+        # a subset changed in place (the same size)
+        ont.slims_subset.clear()
+        ont.slims_subset.add("GO:0000003")
+        self.assertEqual(ont.slims_for_term("GO:0000004"),
+                         set(["GO:0000003"]))
+
+    def test_term_depth(self):
+        ont = self.ontology
+        self.assertEqual(ont.term_depth("GO:0000001"), 1)
+        self.assertEqual(ont.term_depth("GO:0000004"), 3)
+        other = go.Ontology(StringIO(
+            ONTOLOGY.replace("is_a: GO:0000002 ! a\n", "")
+                    .replace("relationship: part_of GO:0000003 ! b\n", "")))
+        self.assertEqual(other.term_depth("GO:0000004"), 1)
+
+
+    def test_cycle(self):
+        # b has_part c, c part_of b
+        ont = go.Ontology(StringIO(
+            ONTOLOGY.replace("subset: goslim_generic\n\n[Term]\nid: GO:0000004",
+                             "subset: goslim_generic\n"
+                             "relationship: has_part GO:0000004 ! c\n\n"
+                             "[Term]\nid: GO:0000004")
+            + "[Typedef]\nid: has_part\nname: has part\n"))
+        self.assertEqual(ont.extract_super_graph("GO:0000003"),
+                         set(["GO:0000001", "GO:0000002", "GO:0000003",
+                              "GO:0000004"]))
+        self.assertEqual(ont.extract_super_graph("GO:0000004"),
+                         ont.extract_super_graph("GO:0000003"))
+        self.assertEqual(ont.extract_super_graph(["GO:0000002",
+                                                  "GO:0000003"]),
+                         set(["GO:0000001", "GO:0000002", "GO:0000003",
+                              "GO:0000004"]))
+        self.assertEqual(ont.extract_sub_graph("GO:0000004"),
+                         set(["GO:0000003", "GO:0000004"]))
+        self.assertEqual(ont.extract_sub_graph(["GO:0000002"]),
+                         set(["GO:0000002", "GO:0000003", "GO:0000004"]))
+        self.assertEqual(ont.term_depth("GO:0000003"), 2)
+        self.assertEqual(ont.term_depth("GO:0000004"), 3)
+
+        ont.set_slims_subset("goslim_generic")
+        self.assertEqual(ont.slims_for_term("GO:0000004"),
+                         set(["GO:0000001", "GO:0000003"]))
+        self.assertEqual(ont.slims_for_term("GO:0000003"),
+                         set(["GO:0000003"]))
+        ont.set_slims_subset(["GO:0000002"])
+        self.assertEqual(ont.slims_for_term("GO:0000003"),
+                         set(["GO:0000002"]))
+        self.assertEqual(ont.slims_for_term("GO:0000004"),
+                         set(["GO:0000002"]))
+
+        annotations = go.Annotations(StringIO(gaf(ANNOTATIONS)),
+                                     ontology=ont)
+        self.assertEqual(
+            sorted(a.geneName for a in
+                   annotations.get_all_annotations("GO:0000004")),
+            ["G1", "G2", "G4", "G6"])
+        res = annotations.get_enriched_terms(["G4"], use_fdr=False)
+        self.assertEqual(res["GO:0000004"][2], 4)
+
+
+class TestAnnotations(unittest.TestCase):
+    def setUp(self):
+        self.ontology = go.Ontology(StringIO(ONTOLOGY))
+        self.annotations = go.Annotations(StringIO(gaf(ANNOTATIONS)),
+                                          ontology=self.ontology)
+
+    def test_enriched_terms(self):
+        res = self.annotations.get_enriched_terms(["G1", "G2"],
+                                                  use_fdr=False)
+        self.assertEqual(set(res), set(["GO:0000001", "GO:0000002",
+                                        "GO:0000003", "GO:0000004"]))
+        genes, p, ref = res["GO:0000004"]
+        self.assertEqual(sorted(genes), ["G1", "G2"])
+        self.assertEqual(ref, 2)
+        self.assertEqual(res["GO:0000002"][2], 3)
+        self.assertEqual(res["GO:0000003"][2], 4)
+        self.assertEqual(res["GO:0000001"][2], 6)
+        self.assertAlmostEqual(
+            p, go.stats.Binomial().p_value(2, 6, 2, 2))
+
+        res = self.annotations.get_enriched_terms(
+            ["G1", "G2", "G4"], evidence_codes=["IDA", "TAS"], use_fdr=False)
+        self.assertEqual(res["GO:0000004"][0], ["G1"])
+        self.assertEqual(res["GO:0000003"][2], 2)
+
+        res = self.annotations.get_enriched_terms(
+            ["G1", "G2", "G4"], reference=["G1", "G4", "G5", "G6"],
+            slims_only=True, use_fdr=False)
+        self.assertEqual(set(res), set(["GO:0000001", "GO:0000003"]))
+        self.assertEqual(sorted(res["GO:0000003"][0]), ["G1", "G4"])
+        self.assertEqual(res["GO:0000003"][2], 3)
+
+    def test_enriched_terms_batch(self):
+        queries = [["G1", "G2"], ["G4"], ["G1", "G3", "G6"], []]
+        for reference in [None, ["G1", "G3", "G4", "G6"]]:
+            expected = [self.annotations.get_enriched_terms(
+                genes, reference, aspect="P") for genes in queries]
+            self.assertEqual(self.annotations.get_enriched_terms_batch(
+                queries, reference, aspect="P"), expected)
+            self.assertEqual(self.annotations.get_enriched_terms_batch(
+                queries, reference, aspect="P", n_jobs=2), expected)
+        self.assertEqual(self.annotations.get_enriched_terms_batch([]), [])
+
+    def test_all_annotations(self):
+        genes = lambda term: sorted(a.geneName for a in
+                                    self.annotations.get_all_annotations(term))
+        self.assertEqual(genes("GO:0000004"), ["G1", "G2"])
+        self.assertEqual(genes("GO:0000003"), ["G1", "G2", "G4", "G6"])
+        self.assertEqual(len(genes("GO:0000001")), 6)
+
+    def test_records(self):
+        annotations = self.annotations
+        records = [go.AnnotationRecord(line) for line in
+                   gaf(ANNOTATIONS).splitlines()[1:]]
+        self.assertEqual(len(annotations), 6)
+        self.assertEqual(list(annotations), records)
+        self.assertEqual(annotations[1], records[1])
+        self.assertEqual(annotations[-1], records[-1])
+        self.assertEqual(annotations.annotations[2:4], records[2:4])
+        self.assertIn(records[3], annotations)
+        self.assertEqual(annotations.gene_annotations["G4"], [records[3]])
+        self.assertEqual(annotations.gene_annotations["G7"], [])
+        self.assertEqual(annotations.term_anotations["GO:0000003"],
+                         [records[3], records[5]])
+        self.assertEqual(annotations.gene_names,
+                         set("G%i" % i for i in range(1, 7)))
+        self.assertEqual(annotations.alias_mapper["IDG2"], "G2")
+
+        annotations.add_annotation(records[0]._replace(GO_ID="GO:0000003"))
+        annotations.add_annotation(records[0]._replace(Qualifier="NOT"))
+        self.assertEqual(len(annotations), 7)
+        self.assertEqual(annotations.term_anotations["GO:0000003"][-1].GO_ID,
+                         "GO:0000003")
+        self.assertEqual(len(annotations.gene_annotations["G1"]), 2)
+
+    def test_snapshot(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmpdir, "annotations.snapshot")
+            self.annotations._save_snapshot(path, "v1")
+            loaded = go.Annotations(ontology=self.ontology)
+            loaded._load_snapshot(path, "v1")
+        finally:
+            shutil.rmtree(tmpdir)
+        self.assertEqual(loaded.annotations, self.annotations.annotations)
+        self.assertEqual(loaded.header, self.annotations.header)
+        self.assertEqual(loaded.gene_names, self.annotations.gene_names)
+        self.assertEqual(
+            loaded.get_enriched_terms(["G1", "G2"], use_fdr=False),
+            self.annotations.get_enriched_terms(["G1", "G2"], use_fdr=False))
+
+    def test_index(self):
+        index = self.annotations.get_index()
+        self.assertIs(index, self.annotations.get_index())
+        self.annotations.add_annotation(
+            go.AnnotationRecord(gaf([("G7", "GO:0000004", "IDA")])
+                                .splitlines()[1]))
+        self.assertIsNot(index, self.annotations.get_index())
+
+        tmpdir = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(tmpdir, "index.npz")
+            index = self.annotations.get_index()
+            index.version = "v1"
+            index.save(filename)
+            loaded = go.AnnotationIndex.load(filename, "v1")
+            self.assertEqual(list(loaded.genes), list(index.genes))
+            self.assertEqual(list(loaded.indices), list(index.indices))
+            self.assertRaises(ValueError, go.AnnotationIndex.load,
+                              filename, "v2")
+        finally:
+            shutil.rmtree(tmpdir)
+
+        # the same annotations with different ontologies
+        paths = set(go._index_path("/a.gaf:10:1|%s" % ontology)
+                    for ontology in ["/o.obo:5:1", "/o.obo:6:2", "/p.obo:5:1"])
+        self.assertEqual(len(paths), 3)
@@ -0,0 +1,112 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from orangecontrib.bio.gene import homology
+
+
+HOMOLOGENE = (
+    "3\t9606\t34\tACADM\t4557231\tNP_000007.1\n"
+    "3\t10090\t11364\tAcadm\t6680618\tNP_031408.1\n"
+    "3\t7955\t406283\tacadm\t41393561\tNP_956533.1\n"
+    "5\t9606\t37\tACADVL\t4557235\tNP_000009.1\n"
+    "5\t10090\t11370\tAcadvl\t6680620\tNP_031409.1\n"
+    "5\t10090\t11371\tAcadvl2\t6680621\tNP_031410.1\n"
+    "6\t9606\t38\tACAT1\t4557237\tNP_000010.1\n"
+    "\n"
+)
+
+
+class TestHomoloGene(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.fname = os.path.join(self.path, "homologene.data")
+        with open(self.fname, "w") as f:
+            f.write(HOMOLOGENE)
+        self.homologene = homology.HomoloGene.__new__(homology.HomoloGene)
+        self.homologene._index = homology._HomologIndex.load(self.fname)
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_all_genes(self):
+        h = self.homologene
+        self.assertEqual(h.all_genes("9606"), ["ACADM", "ACADVL", "ACAT1"])
+        self.assertEqual(h.all_genes("10090"), ["Acadm", "Acadvl", "Acadvl2"])
+        self.assertEqual(h.all_genes("1"), [])
+
+    def test_homologs(self):
+        h = self.homologene
+        self.assertEqual(h.homologs("ACADM", "9606"),
+                         [("9606", "ACADM"), ("10090", "Acadm"),
+                          ("7955", "acadm")])
+        self.assertEqual(h.homologs("ACADM", "10090"), [])
+        self.assertEqual(h.homolog("ACADM", "9606", "7955"), "acadm")
+        self.assertEqual(h.homolog("ACAT1", "9606", "10090"), None)
+        # the last homolog in the organism
+        self.assertEqual(h.homolog("ACADVL", "9606", "10090"), "Acadvl2")
+
+    def test_homologs_many(self):
+        h = self.homologene
+        genes = ["ACADM", "ACAT1", "unknown", "ACADVL"]
+        self.assertEqual(h.homologs_many(genes, "9606", "10090"),
+                         ["Acadm", None, None, "Acadvl2"])
+        self.assertEqual(h.homologs_many(genes, "9606", "10090"),
+                         [h.homolog(g, "9606", "10090") for g in genes])
+        self.assertEqual(h.homologs_many([], "9606", "10090"), [])
+
+    def test_saved_index(self):
+        self.assertTrue(os.path.isdir(self.fname + ".index"))
+        index = homology._HomologIndex.load(self.fname)
+        self.assertEqual(index.taxids, self.homologene._index.taxids)
+        self.assertEqual(index.symbols.tolist(),
+                         self.homologene._index.symbols.tolist())
+
+
+class TestInParanoid(unittest.TestCase):
+    ROWS = [("1", "9606", "A"), ("1", "10090", "a"), ("1", "10090", "a2"),
+            ("2", "9606", "B"), ("2", "7955", "b"), ("3", "9606", "A"),
+            ("3", "7955", "a3"), ("4", "9606", "C")]
+
+    def setUp(self):
+        import sqlite3
+        self.path = tempfile.mkdtemp()
+        self.fname = os.path.join(self.path, "InParanoid.sqlite")
+        con = sqlite3.connect(self.fname)
+        con.execute("create table homologs (groupid text, taxid text, geneid text)")
+        con.executemany("insert into homologs values (?, ?, ?)", self.ROWS)
+        con.commit()
+        con.close()
+        self.inparanoid = homology.InParanoid(self.fname)
+
+    def tearDown(self):
+        self.inparanoid.con.close()
+        shutil.rmtree(self.path)
+
+    def test_orthologs(self):
+        inp = self.inparanoid
+        self.assertEqual(inp.orthologs("A", "9606", "10090"), ["a", "a2"])
+        self.assertEqual(inp.orthologs("A", "9606", "7955"), ["a3"])
+        self.assertEqual(inp.orthologs("A", "9606"),
+                         [("10090", "a"), ("10090", "a2"), ("7955", "a3"),
+                          ("9606", "A")])
+        self.assertEqual(inp.orthologs("C", "9606", "10090"), [])
+        self.assertEqual(inp.orthologs("X", "9606"), [])
+        self.assertEqual(sorted(inp.all_genes("9606")), ["A", "B", "C"])
+
+    def test_orthologs_many(self):
+        inp = self.inparanoid
+        inp.QUERY_GENES = 2
+        genes = ["A", "B", "X", "C", "A"]
+        for taxid in [None, "10090", "7955"]:
+            self.assertEqual(inp.orthologs_many(genes, "9606", taxid),
+                             [inp.orthologs(g, "9606", taxid) for g in genes])
+        self.assertEqual(inp.orthologs_many(genes, "9606", "7955"),
+                         [["a3"], ["b"], [], [], ["a3"]])
+
+    def test_indices(self):
+        indices = [r[0] for r in self.inparanoid.con.execute(
+            "select name from sqlite_master where type='index'")]
+        self.assertEqual(sorted(indices),
+                         sorted(name for name, _ in homology.InParanoid.INDICES))
@@ -0,0 +1,82 @@
+import unittest
+import random
+
+import numpy
+
+from orangecontrib.bio.utils import stats
+
+
+class TestPValues(unittest.TestCase):
+    def _params(self, count=500, seed=42):
+        rand = random.Random(seed)
+        params = []
+        for _ in range(count):
+            N = rand.randint(1, 3000)
+            m = rand.randint(0, N)
+            n = rand.randint(0, N)
+            k = rand.randint(0, min(n, m) + 2)
+            params.append((k, N, m, n))
+        # edge cases
+        params += [(0, 10, 0, 5), (1, 10, 0, 5), (5, 10, 10, 5),
+                   (6, 10, 10, 5), (0, 1, 1, 1), (3, 20, 5, 2)]
+        return params
+
+    def _test_prob(self, prob):
+        params = self._params()
+        k, N, m, n = map(numpy.array, zip(*params))
+        batch = prob.p_values(k, N, m, n)
+        self.assertEqual(batch.shape, (len(params),))
+        for (k, N, m, n), p in zip(params, batch):
+            self.assertAlmostEqual(prob.p_value(k, N, m, n), p, delta=1e-12,
+                                   msg=repr((k, N, m, n)))
+
+    def test_binomial(self):
+        self._test_prob(stats.Binomial())
+
+    def test_hypergeometric(self):
+        self._test_prob(stats.Hypergeometric())
+
+    def test_broadcast(self):
+        prob = stats.Hypergeometric()
+        p = prob.p_values([1, 2, 3], 100, 10, 20)
+        self.assertEqual(p.shape, (3,))
+        self.assertTrue(numpy.all(numpy.diff(p) < 0))
+        self.assertEqual(prob.p_values([], [], [], []).shape, (0,))
+
+
+class TestCorrections(unittest.TestCase):
+    def test_fdr(self):
+        p = numpy.array([0.04, 0.001, 0.5, 0.02, 0.04, 1.0])
+        # step-up Benjamini-Hochberg on the sorted p-values
+        ranked = numpy.sort(p)
+        m = len(p)
+        expected = [min(ranked[j] * m / (j + 1) for j in range(i, m))
+                    for i in range(m)]
+        fdrs = stats.fdr(p)
+        numpy.testing.assert_allclose(numpy.sort(fdrs), expected)
+        self.assertEqual(fdrs[0], fdrs[4])
+        self.assertEqual(fdrs.tolist(), stats.FDR(list(p)))
+
+        numpy.testing.assert_allclose(
+            stats.fdr(p, dependent=True),
+            fdrs * sum(1.0 / i for i in range(1, m + 1)))
+        numpy.testing.assert_allclose(stats.fdr(p, m=12), fdrs * 2)
+        self.assertEqual(stats.fdr(p.reshape(2, 3)).shape, (2, 3))
+        self.assertEqual(stats.fdr([]).shape, (0,))
+        self.assertEqual(stats.FDR([]), [])
+
+    def test_bonferroni(self):
+        numpy.testing.assert_allclose(
+            stats.bonferroni([0.01, 0.2, 0.5]), [0.03, 0.6, 1.0])
+        numpy.testing.assert_allclose(
+            stats.bonferroni([0.01, 0.2], m=10), [0.1, 1.0])
+
+    def test_q_values(self):
+        rand = numpy.random.RandomState(0)
+        p = numpy.concatenate([rand.uniform(size=800),
+                               rand.uniform(0, 0.001, size=200)])
+        pi0 = stats.estimate_pi0(p)
+        self.assertAlmostEqual(pi0, 0.8, delta=0.1)
+        numpy.testing.assert_allclose(stats.q_values(p), stats.fdr(p))
+        numpy.testing.assert_allclose(stats.q_values(p, pi0=None),
+                                      pi0 * stats.fdr(p))
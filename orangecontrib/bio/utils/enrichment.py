@@ -0,0 +1,656 @@
+"""
+Gene sets matched to genes of a data set, their enrichment scores in a
+ranked list of genes, null distributions of the scores over permutations
+and their significance (the parts of :mod:`orangecontrib.bio.gsea` that
+do not depend on Orange).
+"""
+from __future__ import absolute_import
+
+from collections import defaultdict
+import multiprocessing
+import pickle
+import random
+
+import numpy
+
+
+def enrichmentScoreRanked(subset, lcor, ordered, p=1.0, rev2=None):
+    """
+    Input data and subset. 
+    
+    subset: list of attribute indices of the input data belonging
+        to the same set.
+    lcor: correlations with class for each attribute in a list. 
+
+    Returns enrichment score on given data.
+
+    This implementation efficiently handles "sparse" genesets (that
+    cover only a small subset of all genes in the dataset).
+    """
+
+    #print lcor
+
+    subset = set(subset)
+
+    if rev2 is None:
+        def rev(l):
+            return numpy.argsort(l)
+        rev2 = rev(ordered)
+
+    #add if gene is not in the subset
+    notInA = -(1. / (len(lcor)-len(subset)))
+    #base for addition if gene is in the subset
+
+    cors = [ abs(lcor[i])**p for i in subset ] #belowe in numpy
+    sumcors = sum(cors)
+
+    #this should not happen
+    if sumcors == 0.0:
+        return (0.0, None)
+    
+    inAb = 1./sumcors
+
+    ess = [0.0]
+    
+    map = {}
+    for i in subset:
+        orderedpos = rev2[i]
+        map[orderedpos] = inAb*abs(lcor[i]**p)
+        
+    last = 0
+
+    maxSum = minSum = csum = 0.0
+
+    for a,b in sorted(map.items()):
+        diff = a-last
+        csum += notInA*diff
+        last = a+1
+        
+        if csum < minSum:
+            minSum = csum
+        
+        csum += b
+
+        if csum > maxSum:
+            maxSum = csum
+
+    #finish it
+    diff = (len(ordered))-last
+    csum += notInA*diff
+
+    if csum < minSum:
+        minSum = csum
+
+    #print "MY", (maxSum if abs(maxSum) > abs(minSum) else minSum)
+
+    """
+    #BY DEFINITION
+    print("subset", subset)
+
+    for i in ordered:
+        ess.append(ess[-1] + \
+            (inAb*abs(lcor[i]**p) if i in subset else notInA)
+        )
+        if i in subset:
+            print(ess[-2], ess[-1])
+            print(i, (inAb*abs(lcor[i]**p)))
+
+    maxEs = max(ess)
+    minEs = min(ess)
+    
+    print("REAL", (maxEs if abs(maxEs) > abs(minEs) else minEs, ess[1:]))
+
+    """
+    return (maxSum if abs(maxSum) > abs(minSum) else minSum, [])
+
+class _SetMembership(object):
+    """
+    Members of gene sets (attribute indices) in padded integer matrices,
+    one for each chunk of sets of similar size (padded with -1).
+    The members of each set are kept in the iteration order of
+    `set(subset)`, as in :func:`enrichmentScoreRanked`.
+    """
+    def __init__(self, subsets, chunk=2**18):
+        members = [list(set(subset)) for subset in subsets]
+        self.sizes = numpy.array([len(m) for m in members], dtype=int)
+        self.chunks = []  # a list of (set indices, member matrix)
+        order = numpy.argsort(self.sizes, kind="mergesort")
+        start = 0
+        while start < len(order):
+            end = start + 1
+            while end < len(order) and \
+                    (end + 1 - start) * self.sizes[order[end]] <= chunk:
+                end += 1
+            rows = order[start:end]
+            matrix = numpy.full((len(rows), max(self.sizes[rows[-1]], 1)),
+                                -1, dtype=int)
+            for i, r in enumerate(rows):
+                matrix[i, :self.sizes[r]] = members[r]
+            self.chunks.append((rows, matrix))
+            start = end
+
+    def __len__(self):
+        return len(self.sizes)
+
+
+def enrichmentScoresRanked(subsets, lcor, ordered, p=1.0, rev2=None):
+    """
+    Return an array of enrichment scores for all `subsets` (a list of
+    lists of attribute indices or a `_SetMembership`). The scores are
+    the same as those of :func:`enrichmentScoreRanked` for each subset,
+    but the running sums of all sets are computed together with
+    cumulative sums over (chunked) matrices.
+    """
+    if not isinstance(subsets, _SetMembership):
+        subsets = _SetMembership(subsets)
+
+    lcor = numpy.asarray(lcor, dtype=float)
+    if rev2 is None:
+        rev2 = numpy.argsort(ordered)
+    rev2 = numpy.asarray(rev2)
+    nordered = len(ordered)
+
+    if numpy.any(subsets.sizes == len(lcor)):
+        raise ZeroDivisionError("float division by zero")
+    scores = numpy.zeros(len(subsets))
+
+    if p == 1.0:
+        cortab = addtab = numpy.abs(lcor)
+    else:
+        #python's pow (numpy.power can differ in the last bit)
+        cortab = numpy.array([abs(c) ** p for c in lcor.tolist()])
+        addtab = numpy.array([abs(c ** p) for c in lcor.tolist()])
+
+    for rows, members in subsets.chunks:
+        nrows, width = members.shape
+        rowsi = numpy.arange(nrows)[:, None]
+        sizes = subsets.sizes[rows]
+        valid = members >= 0
+        index = numpy.where(valid, members, 0)
+
+        #add if gene is not in the subset
+        notInA = -(1. / (len(lcor) - sizes))
+        #sum in the same order as the python sum in enrichmentScoreRanked
+        cors = numpy.where(valid, cortab[index], 0.0)
+        sumcors = numpy.zeros(nrows)
+        for k in range(width):
+            sumcors += cors[:, k]
+        nonzero = sumcors != 0.0
+        with numpy.errstate(divide="ignore"):
+            inAb = 1. / sumcors
+
+        #member positions in the ranked order with their additions
+        pos = numpy.where(valid, rev2[index], nordered)
+        sort = numpy.argsort(pos, axis=1, kind="mergesort")
+        pos = pos[rowsi, sort]
+        with numpy.errstate(invalid="ignore"):
+            add = inAb[:, None] * addtab[index[rowsi, sort]]
+        last = numpy.zeros_like(pos)
+        last[:, 1:] = pos[:, :-1] + 1
+
+        #interleaved steps: a gap of genes not in the subset (even
+        #columns) followed by a gene in the subset (odd columns)
+        steps = numpy.zeros((nrows, 2 * width + 1))
+        steps[:, 0:-1:2] = numpy.where(valid, notInA[:, None] * (pos - last),
+                                       0.0)
+        steps[:, 1::2] = numpy.where(valid, add, 0.0)
+        #finish it
+        lastpos = pos[numpy.arange(nrows), numpy.maximum(sizes - 1, 0)] + 1
+        lastpos[sizes == 0] = 0
+        steps[numpy.arange(nrows), 2 * sizes] = notInA * (nordered - lastpos)
+
+        csum = numpy.cumsum(steps, axis=1)
+        column = numpy.arange(2 * width + 1)
+        gaps = (column % 2 == 0) & (column <= 2 * sizes[:, None])
+        genes = (column % 2 == 1) & (column < 2 * sizes[:, None])
+        minSum = numpy.minimum(
+            numpy.where(gaps, csum, numpy.inf).min(axis=1), 0.0) + 0.0
+        maxSum = numpy.maximum(
+            numpy.where(genes, csum, -numpy.inf).max(axis=1), 0.0) + 0.0
+
+        es = numpy.where(numpy.abs(maxSum) > numpy.abs(minSum), maxSum,
+                         minSum)
+        #this should not happen
+        scores[rows] = numpy.where(nonzero, es, 0.0)
+
+    return scores
+
+
+def orderedPointersCorr(lcor):
+    """
+    Return a list of integers: indexes in original
+    lcor. Elements in the list are ordered by
+    their lcor[i] value. Higher correlations first.
+    """
+    ordered = [ (i,a) for i,a in enumerate(lcor) ] #original pos + correlation
+    ordered.sort(key=lambda x: -x[1]) #sort by correlation, descending
+    ordered = nth(ordered, 0) #contains positions in the original list
+    return ordered
+
+
+def shuffleLabels(labels, rands=0):
+    """
+    Returns a copy of a label array shuffled in the same way as the class
+    values by shuffleClass with the same random seed.
+    """
+    rand = random.Random(rands)
+    locations = list(range(len(labels)))
+    rand.shuffle(locations)
+    shuffled = numpy.empty_like(labels)
+    shuffled[locations] = labels
+    return shuffled
+
+def shuffleList(l, rand=random.Random(0)):
+    """
+    Returns a copy of a shuffled input list.
+    """
+    import copy
+    l2 = copy.copy(l)
+    rand.shuffle(l2)
+    return l2
+
+
+def _permutationScores(args, i):
+    """
+    Return the enrichment scores of all gene sets for the i-th
+    (fixed) permutation.
+
+    args: (data, rankingf, lcor, members, permutation), where
+        permutation is a function permuting the data with a given seed
+        (data is then ranked with rankingf), "matrix" to rank a
+        (X, labels) pair with a matrix ranking function after
+        shuffling the labels, or anything else to shuffle lcor.
+    """
+    data, rankingf, lcor, members, permutation = args
+    if callable(permutation):
+        #a function permuting the data (see gsea.shuffleClass)
+        d2 = permutation(data, 2000+i) #fixed permutation
+        r2 = rankingf(d2)
+    elif permutation == "matrix":
+        #a matrix ranking function (see utils.expression.signal_to_noise)
+        X, labels = data
+        r2 = rankingf(X, shuffleLabels(labels, 2000+i)).tolist()
+    else:
+        r2 = shuffleList(lcor, random.Random(2000+i))
+
+    ordered2 = orderedPointersCorr(r2)
+    rev22 = numpy.argsort(ordered2)
+    return enrichmentScoresRanked(members, r2, ordered2, rev2=rev22).tolist()
+
+
+#arguments of _permutationScores in the worker processes
+_workerArgs = None
+
+def _initPermutationWorker(args):
+    global _workerArgs
+    _workerArgs = args
+
+def _permutationWorker(i):
+    return _permutationScores(_workerArgs, i)
+
+
+def _picklable(obj):
+    try:
+        pickle.dumps(obj, pickle.HIGHEST_PROTOCOL)
+    except Exception:
+        return False
+    return True
+
+
+def _permutationNulls(args, n, n_jobs=1, callback=None, nulls=None):
+    """
+    Return the null distributions (a list of enrichment scores over
+    `n` permutations for each gene set), computing the permutations in
+    `n_jobs` processes. Each permutation has a fixed seed, so the
+    results do not depend on the number of processes. The arguments
+    are passed to the processes with pickle; if that is not possible
+    (e.g. for a ranking function defined with lambda), the permutations
+    are computed in this process.
+
+    If `nulls` (a _StreamingNulls) is given, the scores of each
+    permutation are added to it instead.
+    """
+    members = args[3]
+    if nulls is None:
+        enrichmentNulls = [ [] for a in range(len(members)) ]
+
+    if n_jobs == 1 or n < 2 or not _picklable(args[1]) \
+            or not _picklable(args[4]):
+        pool = None
+        scores = (_permutationScores(args, i) for i in range(n))
+    else:
+        processes = n_jobs or multiprocessing.cpu_count()
+        pool = multiprocessing.Pool(processes, _initPermutationWorker,
+                                    (args,))
+        #results are returned in the order of permutations
+        scores = pool.imap(_permutationWorker, range(n),
+                           chunksize=max(n // (4 * processes), 1))
+
+    try:
+        for esns in scores:
+            if nulls is not None:
+                nulls.add(esns)
+            else:
+                for si,esn in enumerate(esns):
+                    enrichmentNulls[si].append(esn)
+            runOptCallbacks(callback)
+    finally:
+        if pool is not None:
+            pool.terminate()
+
+    return nulls if nulls is not None else enrichmentNulls
+
+
+def runOptCallbacks(callback):
+    if callback is not None:
+        try:
+            [ a() for a in callback ]
+        except:
+            callback()
+
+
+def _meanNull(nulls, mask):
+    """
+    Means of the selected (`mask`) null scores for each gene set (row),
+    summed in the permutation order as with python's sum. NaN where
+    none are selected.
+    """
+    sums = numpy.zeros(nulls.shape[0])
+    for j in range(nulls.shape[1]):
+        sums += numpy.where(mask[:, j], nulls[:, j], 0.0)
+    counts = mask.sum(axis=1)
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        return sums / counts
+
+
+def _ratio(num, den, default):
+    """num / den with `default` where den is 0."""
+    num = numpy.asarray(num, dtype=float)
+    den = numpy.asarray(den, dtype=float)
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        return numpy.where(den != 0, num / den, default)
+
+
+def _normalize(s, meanPos, meanNeg):
+    """
+    Normalize scores `s` (a vector or a matrix with a row for each gene
+    set) by dividing by the mean of positive or negative null scores of
+    the gene set.
+    """
+    shape = (-1,) + (1,) * (s.ndim - 1)
+    normalized = numpy.where(s >= 0,
+                             _ratio(s, meanPos.reshape(shape), 0.0),
+                             _ratio(-s, meanNeg.reshape(shape), 0.0))
+    normalized[s == 0] = 0.0
+    #0 if according mean value is uncalculable
+    normalized[numpy.isnan(normalized)] = 0.0
+    return normalized
+
+
+def _tails(nes, values):
+    """
+    Return the numbers of sorted `values` at least as extreme as
+    normalized enrichment scores `nes` (>= nes for nes >= 0, <= nes for
+    nes < 0) and the numbers of values of the same sign as nes.
+    """
+    pos = nes >= 0
+    higher = numpy.where(
+        pos, len(values) - numpy.searchsorted(values, nes, side="left"),
+        numpy.searchsorted(values, nes, side="right"))
+    zero = numpy.searchsorted(values, 0, side="left")
+    return higher, numpy.where(pos, len(values) - zero, zero)
+
+
+def _nesFdr(nes, nvals=None, nullTails=None):
+    """
+    Return FDR q-values of normalized enrichment scores `nes` given
+    the sorted normalized null scores `nvals` (or their counts
+    `nullTails`, see _tails).
+
+    Use this null distribution to compute an FDR q value, for a given NES(S) =
+    NES* >= 0. The FDR is the ratio of the percantage of all (S,pi) with
+    NES(S,pi) >= 0, whose NES(S,pi) >= NES*, divided by the percentage of
+    observed S wih NES(S) >= 0, whose NES(S) >= NES*, and similarly if NES(S)
+    = NES* <= 0.
+    """
+    if nullTails is None:
+        nullTails = _tails(nes, nvals)
+    higher, sameSign = nullTails
+    top = _ratio(higher, sameSign, numpy.nan) #p value
+    higher, sameSign = _tails(nes, numpy.sort(nes))
+    down = _ratio(higher, sameSign, numpy.nan)
+    fdrs = _ratio(top, down, numpy.nan)
+    fdrs[numpy.isnan(fdrs)] = 1000000000.0
+    return fdrs
+
+
+def gseaSignificance(enrichmentScores, enrichmentNulls):
+    """
+    Return a list of (ES, NES, p-value, FDR) tuples for enrichment scores
+    of gene sets and their null distributions (a sets x permutations
+    matrix or a list of lists).
+    """
+    es = numpy.asarray(enrichmentScores, dtype=float)
+    if not len(es):
+        return []
+    nulls = numpy.asarray(enrichmentNulls, dtype=float).reshape(len(es), -1)
+
+    #nominal p-values from the positive or negative portion of the null
+    #distribution corresponding to the sign of the observed ES(S)
+    neg = (es < 0)[:, None]
+    enrichmentPVals = _ratio(
+        numpy.where(neg, nulls <= es[:, None], nulls >= es[:, None]).sum(1),
+        numpy.where(neg, nulls < 0, nulls >= 0).sum(1), 1.0)
+
+    #normalize the ES(S,pi) and the observed ES(S), separetely rescaling
+    #the positive and negative scores by divident by the mean of the 
+    #ES(S,pi)
+    meanPos = _meanNull(nulls, nulls >= 0)
+    meanNeg = _meanNull(nulls, nulls < 0)
+    nEnrichmentScores = _normalize(es, meanPos, meanNeg)
+    nEnrichmentNulls = _normalize(nulls, meanPos, meanNeg)
+
+    fdrs = _nesFdr(nEnrichmentScores, numpy.sort(nEnrichmentNulls, axis=None))
+
+    return list(zip(es.tolist(), nEnrichmentScores.tolist(),
+                    enrichmentPVals.tolist(), fdrs.tolist()))
+
+
+class _StreamingNulls(object):
+    """
+    Statistics of null enrichment scores of gene sets, updated one
+    permutation at a time, so that the memory use does not depend on
+    the number of permutations.
+
+    The null scores of the same (fixed) permutations are added twice.
+    The first pass counts and sums the positive and negative null
+    scores of each gene set (for p-values and normalized enrichment
+    scores). After `normalize`, the second pass counts the normalized
+    null scores between consecutive sorted normalized enrichment scores
+    (for the FDR). The results are the same as with gseaSignificance on
+    all null scores.
+    """
+    def __init__(self, enrichmentScores):
+        self.es = numpy.asarray(enrichmentScores, dtype=float)
+        nsets = len(self.es)
+        self.posCount = numpy.zeros(nsets, dtype=int)
+        self.negCount = numpy.zeros(nsets, dtype=int)
+        self.posSum = numpy.zeros(nsets)
+        self.negSum = numpy.zeros(nsets)
+        #null scores at least as extreme as the observed one (same sign)
+        self.extreme = numpy.zeros(nsets, dtype=int)
+        #normalized enrichment scores (known after the first pass)
+        self.nes = None
+
+    def add(self, scores):
+        """Add null scores of all gene sets for one permutation."""
+        scores = numpy.asarray(scores, dtype=float)
+        if self.nes is not None:
+            self._addNormalized(scores)
+            return
+        pos = scores >= 0
+        neg = scores < 0
+        self.posCount += pos
+        self.negCount += neg
+        self.posSum += numpy.where(pos, scores, 0.0)
+        self.negSum += numpy.where(neg, scores, 0.0)
+        self.extreme += numpy.where(self.es < 0, scores <= self.es,
+                                    scores >= self.es)
+
+    def normalize(self):
+        """
+        Compute the normalized enrichment scores (at the end of the first
+        pass); further null scores are added to the second pass.
+        """
+        with numpy.errstate(divide="ignore", invalid="ignore"):
+            self.meanPos = self.posSum / self.posCount
+            self.meanNeg = self.negSum / self.negCount
+        self.nes = _normalize(self.es, self.meanPos, self.meanNeg)
+        self.sortedNes = numpy.sort(self.nes)
+        #normalized null scores with the given number of sorted
+        #normalized enrichment scores <= (higher) or < (lower) them
+        self.higher = numpy.zeros(len(self.es) + 1, dtype=numpy.int64)
+        self.lower = numpy.zeros(len(self.es) + 1, dtype=numpy.int64)
+        self.nullPos = self.nullNeg = 0
+
+    def _addNormalized(self, scores):
+        nvals = _normalize(scores, self.meanPos, self.meanNeg)
+        self.higher += numpy.bincount(
+            numpy.searchsorted(self.sortedNes, nvals, side="right"),
+            minlength=len(self.higher))
+        self.lower += numpy.bincount(
+            numpy.searchsorted(self.sortedNes, nvals, side="left"),
+            minlength=len(self.lower))
+        pos = int(numpy.count_nonzero(nvals >= 0))
+        self.nullPos += pos
+        self.nullNeg += len(nvals) - pos
+
+    def significance(self):
+        """Return a list of (ES, NES, p-value, FDR) tuples (see
+        gseaSignificance)."""
+        es = self.es
+        if not len(es):
+            return []
+        if self.nes is None:
+            self.normalize()
+        enrichmentPVals = _ratio(
+            self.extreme, numpy.where(es < 0, self.negCount, self.posCount),
+            1.0)
+
+        #the numbers of normalized null scores >= and <= each of the
+        #sorted normalized enrichment scores
+        higher = numpy.cumsum(self.higher[::-1])[::-1][1:]
+        lower = numpy.cumsum(self.lower)[:-1]
+        index = numpy.searchsorted(self.sortedNes, self.nes)
+        pos = self.nes >= 0
+        nullTails = (numpy.where(pos, higher[index], lower[index]),
+                     numpy.where(pos, self.nullPos, self.nullNeg))
+        fdrs = _nesFdr(self.nes, nullTails=nullTails)
+
+        return list(zip(es.tolist(), self.nes.tolist(),
+                        enrichmentPVals.tolist(), fdrs.tolist()))
+
+
+def _significance(enrichmentScores, args, n, n_jobs=1, callback=None,
+                  streaming=False):
+    """
+    Compute the null distributions (see _permutationNulls) and return
+    the significance of enrichment scores (see gseaSignificance).
+    With `streaming`, the permutations are computed twice (see
+    _StreamingNulls) and `callback` is called 2 * n times.
+    """
+    if streaming:
+        nulls = _StreamingNulls(enrichmentScores)
+        _permutationNulls(args, n, n_jobs, callback, nulls)
+        nulls.normalize()
+        _permutationNulls(args, n, n_jobs, callback, nulls)
+        return nulls.significance()
+    else:
+        nulls = _permutationNulls(args, n, n_jobs, callback)
+        return gseaSignificance(enrichmentScores, nulls)
+
+
+class GenesetMembership(object):
+    """
+    Gene sets matched to the genes (attributes) of a data set, compiled
+    into CSR arrays: the attribute indices of the i-th gene set are
+    ``indices[indptr[i]:indptr[i+1]]`` and its matches (pairs of a gene
+    from the gene set and the matched attribute name) are from
+    ``match_indptr[i]`` to ``match_indptr[i+1]``.
+
+    Obtain it with :obj:`orangecontrib.bio.gsea.GSEA.membership`. It can
+    be pickled (see :obj:`save` and :obj:`load`) and reused on data with
+    the same attributes (and with the same gene matcher) with
+    :obj:`orangecontrib.bio.gsea.GSEA.setMembership`.
+    """
+
+    def __init__(self, attributes, genesets, matches):
+        """
+        attributes: attribute names of the data.
+        genesets: a list of gene sets.
+        matches: a list of (gene, attribute name) matches for each gene set.
+        """
+        self.attributes = tuple(attributes)
+        self.genesets = list(genesets)
+        self.sizes = numpy.array([len(g.genes) for g in self.genesets],
+                                 dtype=int)
+
+        lengths = [len(m) for m in matches]
+        self.match_indptr = numpy.zeros(len(lengths) + 1, dtype=int)
+        numpy.cumsum(lengths, out=self.match_indptr[1:])
+        self.match_genes = [gene for m in matches for gene, _ in m]
+        self.names = sorted(set(name for m in matches for _, name in m))
+        nameIndex = dict((name, i) for i, name in enumerate(self.names))
+        self.match_names = numpy.array(
+            [nameIndex[name] for m in matches for _, name in m], dtype=int)
+
+        #attribute indices of matched names (there can be many)
+        positions = defaultdict(list)
+        for i, name in enumerate(self.attributes):
+            positions[name].append(i)
+        namePositions = [positions[name] for name in self.names]
+        columns = [namePositions[n] for n in self.match_names.tolist()]
+        ends = numpy.zeros(len(columns) + 1, dtype=int)
+        numpy.cumsum([len(c) for c in columns], out=ends[1:])
+        self.indptr = ends[self.match_indptr]
+        self.indices = numpy.array([i for c in columns for i in c],
+                                   dtype=int)
+
+    def __len__(self):
+        return len(self.genesets)
+
+    def matched_sizes(self):
+        """Numbers of matched genes of gene sets."""
+        return numpy.diff(self.match_indptr)
+
+    def matches(self, i):
+        """A list of (gene, attribute name) matches of the i-th gene set."""
+        start, end = self.match_indptr[i], self.match_indptr[i + 1]
+        return [(gene, self.names[name]) for gene, name in
+                zip(self.match_genes[start:end],
+                    self.match_names[start:end].tolist())]
+
+    def columns(self, i):
+        """Attribute indices of the i-th gene set."""
+        return self.indices[self.indptr[i]:self.indptr[i + 1]]
+
+    def select(self, minSize=3, maxSize=1000, minPart=0.1):
+        """Indices of gene sets with sizes in limits (see
+        :obj:`orangecontrib.bio.gsea.GSEA.selectGenesets`)."""
+        matched = self.matched_sizes()
+        with numpy.errstate(divide="ignore", invalid="ignore"):
+            part = matched / self.sizes.astype(float)
+        return numpy.flatnonzero((matched >= minSize) & (matched <= maxSize)
+                                 & (part >= minPart))
+
+    def save(self, filename):
+        with open(filename, "wb") as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, filename):
+        with open(filename, "rb") as f:
+            return pickle.load(f)
+
+
+def nth(l,n): return [ a[n] for a in l ]
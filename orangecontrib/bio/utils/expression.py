@@ -317,6 +317,144 @@ class ExpressionSignificance_MannWhitneyu(ExpressionSignificance_Test):
         
         return list(zip(self.keys, results))
 
+def _centered_data(X):
+    """
+    Return `(Xc, valid, center)` for an expression matrix `X` (samples
+    x genes, with NaN or masked missing values): the data centered by
+    gene means (0 where missing), a float mask of present values and
+    the gene means.
+    """
+    if isinstance(X, ma.MaskedArray):
+        X = X.astype(float).filled(np.nan)
+    X = np.asarray(X, dtype=float)
+    valid = ~np.isnan(X)
+    count = valid.sum(axis=0)
+    center = np.where(valid, X, 0.0).sum(axis=0) / np.maximum(count, 1)
+    Xc = np.where(valid, X - center, 0.0)
+    return Xc, valid.astype(float), center
+
+
+def _label_matrix(labels):
+    labels = np.asarray(labels)
+    return np.atleast_2d(labels), labels.ndim == 1
+
+
+def _class_moments(data, groups):
+    """
+    Return the number of values, means and variances (ddof=1) of genes
+    for samples selected by each row of a float mask `groups`
+    (permutations x samples).
+    """
+    Xc, valid, center = data
+    n = groups.dot(valid)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = groups.dot(Xc) / n
+        var = (groups.dot(Xc ** 2) - n * mean ** 2) / (n - 1)
+    return n, mean + center, np.maximum(var, 0.0)
+
+
+def _two_class_moments(X, labels, a, b):
+    labels, single = _label_matrix(labels)
+    data = _centered_data(X)
+    return (_class_moments(data, (labels == a).astype(float)),
+            _class_moments(data, (labels == b).astype(float)), single)
+
+
+def _result(scores, single, default):
+    scores = np.where(np.isfinite(scores), scores, default)
+    return scores[0] if single else scores
+
+
+def signal_to_noise(X, labels, a=0, b=1):
+    """
+    Signal to noise ratio of all genes (columns of `X`) for a batch of
+    label vectors (see :class:`MA_signalToNoise`).
+
+    :param X: Expression matrix (samples x genes) with NaN (or masked)
+        missing values.
+    :param labels: Class indices of samples, either a single vector or a
+        (permutations x samples) matrix of permuted labels.
+    :param a: Class index of the first group.
+    :param b: Class index of the second group.
+    :return: A (permutations x genes) score matrix (a vector for a single
+        label vector). Undefined scores are 0.
+    """
+    (_, mean_a, var_a), (_, mean_b, var_b), single = _two_class_moments(X, labels, a, b)
+
+    def stdevm(m, var):
+        #return minmally 0.2*|mi|, where mi=0 is adjusted to mi=1
+        return np.maximum(np.sqrt(var), 0.2 * np.abs(np.where(m == 0, 1.0, m)))
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        scores = (mean_a - mean_b) / (stdevm(mean_a, var_a) +
+                                     stdevm(mean_b, var_b))
+    return _result(scores, single, 0.0)
+
+
+def t_test(X, labels, a=0, b=1, prob=False):
+    """
+    Two sample (equal variance) t-test statistics (or two-sided p-values
+    if `prob` is True) of all genes for a batch of label vectors (see
+    :class:`MA_t_test`). Parameters are as for :func:`signal_to_noise`.
+    Undefined statistics are 0 (p-values 1).
+    """
+    (na, mean_a, var_a), (nb, mean_b, var_b), single = _two_class_moments(X, labels, a, b)
+    df = na + nb - 2
+
+    def sumsq(n, var):
+        #a single value has no deviation (its variance is undefined)
+        return np.where(n > 1, (n - 1) * var, 0.0)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        svar = (sumsq(na, var_a) + sumsq(nb, var_b)) / df
+        t = (mean_a - mean_b) / np.sqrt(svar * (1.0 / na + 1.0 / nb))
+    if prob:
+        with np.errstate(invalid="ignore"):
+            p = 2 * scipy.stats.t.sf(np.abs(t), df)
+        return _result(p, single, 1.0)
+    return _result(t, single, 0.0)
+
+
+def fold_change(X, labels, a=0, b=1):
+    """
+    Ratios of class means of all genes for a batch of label vectors (see
+    :class:`MA_fold_change`). Parameters are as for
+    :func:`signal_to_noise`. Undefined ratios are 1.
+    """
+    (_, mean_a, _), (_, mean_b, _), single = _two_class_moments(X, labels, a, b)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        scores = mean_a / mean_b
+    return _result(scores, single, 1.0)
+
+
+def pearson_correlation(X, labels):
+    """
+    Pearson correlation of all genes with a batch of (numeric) label
+    vectors (see :class:`MA_pearsonCorrelation`). Samples with a NaN
+    label are ignored. Parameters are as for :func:`signal_to_noise`.
+    Undefined correlations are 0.
+    """
+    labels, single = _label_matrix(labels)
+    Xc, valid, _ = _centered_data(X)
+    labels = labels.astype(float)
+    present = ~np.isnan(labels)
+    labels = np.where(present, labels, 0.0)
+    labels -= labels.sum(axis=1, keepdims=True) / \
+        np.maximum(present.sum(axis=1, keepdims=True), 1)
+    labels *= present
+    present = present.astype(float)
+
+    n = present.dot(valid)
+    sx, sxx = present.dot(Xc), present.dot(Xc ** 2)
+    sy, syy = labels.dot(valid), (labels ** 2).dot(valid)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cov = labels.dot(Xc) - sx * sy / n
+        varx = sxx - sx ** 2 / n
+        vary = syy - sy ** 2 / n
+        scores = cov / np.sqrt(varx * vary)
+    return _result(scores, single, 0.0)
+
+
 def attest_ind(a, b, dim=None):
     """ Return the t-test statistics on arrays a and b over the dim axis.
     Returns both the t statistic as well as the p-value
@@ -0,0 +1,172 @@
+"""
+Versioned on-disk snapshots of pre-parsed data.
+
+A snapshot is a directory with one ``.npy`` file per array (so the arrays
+can be memory mapped when loaded) and a ``meta.json`` file holding the
+snapshot version and any additional JSON serializable metadata.
+
+"""
+from __future__ import absolute_import
+
+import os
+import json
+import shutil
+import tempfile
+
+import six
+import numpy
+
+#: Version of the on disk layout.
+FORMAT_VERSION = 1
+
+
+def save(path, arrays, version, meta=None):
+    """
+    Save a dict of `arrays` (and JSON serializable `meta`) to a snapshot
+    directory `path`, replacing an existing snapshot of another version.
+
+    An existing snapshot of the same `version` (for instance saved by
+    another process in the meantime) is kept as it is.
+    """
+    path = os.path.abspath(path)
+    tmpdir = tempfile.mkdtemp(prefix=os.path.basename(path) + ".",
+                              dir=os.path.dirname(path))
+    try:
+        for name, array in six.iteritems(arrays):
+            numpy.save(os.path.join(tmpdir, name + ".npy"),
+                       numpy.asarray(array), allow_pickle=False)
+        with open(os.path.join(tmpdir, "meta.json"), "w") as f:
+            json.dump({"format": FORMAT_VERSION, "version": version,
+                       "arrays": sorted(arrays), "meta": meta or {}}, f)
+        if not _is_current(path, version):
+            if os.path.isdir(path):
+                _discard(path)
+            try:
+                os.rename(tmpdir, path)
+                return
+            except OSError:
+                if not _is_current(path, version):
+                    raise
+        shutil.rmtree(tmpdir, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+        raise
+
+
+def _is_current(path, version):
+    """Is there a complete snapshot of `version` at `path`."""
+    try:
+        with open(os.path.join(path, "meta.json")) as f:
+            info = json.load(f)
+    except (IOError, OSError, ValueError):
+        return False
+    return info.get("format") == FORMAT_VERSION and \
+        info.get("version") == version
+
+
+def _discard(path):
+    """
+    Remove a stale snapshot at `path`. It is first moved out of the way,
+    so `path` is never left half removed while other processes use it.
+    """
+    trash = tempfile.mkdtemp(prefix=os.path.basename(path) + ".",
+                             dir=os.path.dirname(path))
+    try:
+        os.rename(path, os.path.join(trash, "stale"))
+    except OSError:
+        if os.path.exists(path):
+            raise
+        # already removed by another process
+    finally:
+        shutil.rmtree(trash, ignore_errors=True)
+
+
+def load(path, version=None, mmap=True):
+    """
+    Load a snapshot from `path` and return an `(arrays, meta)` tuple.
+
+    Raise `IOError` if the snapshot does not exist and `ValueError` if
+    it was saved with a different `version` (or layout).
+    """
+    with open(os.path.join(path, "meta.json")) as f:
+        info = json.load(f)
+    if info.get("format") != FORMAT_VERSION or \
+            (version is not None and info.get("version") != version):
+        raise ValueError("Stale snapshot %r" % path)
+    mmap_mode = "r" if mmap else None
+    arrays = {}
+    for name in info["arrays"]:
+        array = numpy.load(os.path.join(path, name + ".npy"),
+                           mmap_mode=mmap_mode, allow_pickle=False)
+        # a plain ndarray view of the memory map (numpy.memmap indexing
+        # is much slower)
+        arrays[name] = numpy.asarray(array)
+    return arrays, info["meta"]
+
+
+if six.PY3:
+    def _decode(data):
+        return data.decode("utf-8")
+
+    def _encode(string):
+        return string.encode("utf-8")
+else:
+    def _decode(data):
+        return str(data)
+
+    def _encode(string):
+        if isinstance(string, unicode):
+            return string.encode("utf-8")
+        return string
+
+
+class StringPool(object):
+    """
+    An immutable sequence of strings stored as a single utf-8 encoded
+    byte array with an array of offsets.
+    """
+    def __init__(self, data, offsets):
+        self.data = data
+        self.offsets = offsets
+
+    @classmethod
+    def from_strings(cls, strings):
+        encoded = [_encode(s) for s in strings]
+        offsets = numpy.zeros(len(encoded) + 1, dtype=numpy.int64)
+        numpy.cumsum([len(s) for s in encoded], out=offsets[1:])
+        data = numpy.frombuffer(b"".join(encoded), dtype=numpy.uint8)
+        return cls(data, offsets)
+
+    @classmethod
+    def from_arrays(cls, arrays, name):
+        return cls(arrays[name + "_data"], arrays[name + "_offsets"])
+
+    def arrays(self, name):
+        """Return a dict of arrays for saving the pool under `name`."""
+        return {name + "_data": self.data, name + "_offsets": self.offsets}
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        start, end = self.offsets[index], self.offsets[index + 1]
+        return _decode(self.data[start:end].tobytes())
+
+    def tolist(self):
+        """Return all strings in a list."""
+        data = self.data.tobytes()
+        offsets = self.offsets.tolist()
+        return [_decode(data[start:end])
+                for start, end in zip(offsets[:-1], offsets[1:])]
+
+
+def encode_column(values):
+    """
+    Return an `(codes, pool)` tuple, where `codes` is an integer array
+    indexing into a :class:`StringPool` of unique `values`.
+    """
+    index = {}
+    codes = numpy.fromiter((index.setdefault(v, len(index)) for v in values),
+                           dtype=numpy.int32)
+    pool = sorted(index, key=index.get)
+    return codes, StringPool.from_strings(pool)
@@ -2,6 +2,8 @@ import math
 import threading
 import six
 
+import numpy
+
 
 def _lngamma(z):
     x = 0
@@ -23,6 +25,7 @@ class LogBin(object):
     _lookup = [0.0, 0.0]
     _max_factorial = 1
     _lock = threading.Lock()
+    _array = None
 
     def __init__(self, max=1000):
         self._extend(max)
@@ -55,6 +58,94 @@ class LogBin(object):
         else:
             return _lngamma(n + 1)
 
+    @staticmethod
+    def _lookup_array(max):
+        """ Return the shared log-factorial table (with at least `max`
+        entries) as a numpy array.
+        """
+        LogBin._extend(max)
+        with LogBin._lock:
+            table = LogBin._array
+            if table is None or len(table) != len(LogBin._lookup):
+                table = numpy.array(LogBin._lookup, dtype=float)
+                LogBin._array = table
+        return table
+
+    @staticmethod
+    def _logbin_array(table, n, k):
+        """ Vectorized `_logbin` over integer arrays `n` and `k`. """
+        valid = (k < n) & (k >= 0)
+        n, k = numpy.where(valid, n, 0), numpy.where(valid, k, 0)
+        return numpy.where(valid, table[n] - table[n - k] - table[k], 0.0)
+
+    def _p_values(self, k, N, m, n, lower_tail, upper_tail):
+        """ Shared driver for the vectorized `p_values` methods.
+
+        `lower_tail` and `upper_tail` are `(k, N, m, n) -> (lo, hi)`
+        functions returning the (inclusive) summation bounds the scalar
+        `p_value` uses when starting from 0 or from k respectively.
+        """
+        k, N, m, n = numpy.broadcast_arrays(*[numpy.asarray(a, dtype=int)
+                                              for a in (k, N, m, n)])
+        shape = k.shape
+        k, N, m, n = [a.ravel() for a in (k, N, m, n)]
+        if not k.size:
+            return numpy.zeros(shape, dtype=float)
+
+        table = self._lookup_array(int(max(N.max(), n.max())) + 2)
+
+        ulo, uhi = upper_tail(k, N, m, n)
+        llo, lhi = lower_tail(k, N, m, n)
+        # start from k if that gives the shorter list of values
+        upper = uhi - k + 1 <= k
+        res = numpy.empty(k.shape, dtype=float)
+        res[upper] = _tail_sum(self._log_pmf, table, ulo[upper], uhi[upper],
+                               N[upper], m[upper], n[upper])
+        lower = ~upper
+        res[lower] = 1.0 - _tail_sum(self._log_pmf, table, llo[lower],
+                                     lhi[lower], N[lower], m[lower], n[lower])
+        # if the value is small it is probably inexact due to the limited
+        # precision of floats (see p_value)
+        inexact = lower & (res < 1e-3)
+        res[inexact] = _tail_sum(self._log_pmf, table, ulo[inexact],
+                                 uhi[inexact], N[inexact], m[inexact],
+                                 n[inexact])
+        return res.reshape(shape)
+
+
+def _tail_sum(log_pmf, table, lo, hi, N, m, n, chunk=2 ** 20):
+    """ Return sum(exp(log_pmf(i, N, m, n)) for i in range(lo, hi + 1))
+    for every element of the input arrays.
+
+    The terms of all sums are laid out in one flat array and each sum
+    is accumulated with log-sum-exp (in chunks of at most about `chunk`
+    terms).
+    """
+    counts = numpy.maximum(hi - lo + 1, 0)
+    out = numpy.zeros(len(counts), dtype=float)
+    start = 0
+    while start < len(counts):
+        stop = start + 1 + numpy.searchsorted(
+            numpy.cumsum(counts[start:]), chunk, side="right")
+        stop = min(stop, len(counts))
+        sl = slice(start, stop)
+        c = counts[sl]
+        total = int(c.sum())
+        if total:
+            seg = numpy.repeat(numpy.arange(len(c)), c)
+            offsets = numpy.arange(total) - numpy.repeat(numpy.cumsum(c) - c, c)
+            i = lo[sl][seg] + offsets
+            lp = numpy.minimum(log_pmf(table, i, N[sl][seg], m[sl][seg],
+                                       n[sl][seg]), 0.0)
+            lmax = numpy.full(len(c), -numpy.inf)
+            numpy.maximum.at(lmax, seg, lp)
+            lmax[c == 0] = 0.0
+            s = numpy.bincount(seg, weights=numpy.exp(lp - lmax[seg]),
+                               minlength=len(c))
+            out[sl] = numpy.exp(lmax) * s
+        start = stop
+    return out
+
 class Binomial(LogBin):
     """ `Binomial distribution 
     <http://en.wikipedia.org/wiki/Binomial_distribution>`_ is a discrete
@@ -102,6 +193,32 @@ class Binomial(LogBin):
             else:
                 return value
 
+    @staticmethod
+    def _log_pmf(table, i, N, m, n):
+        p = 1.0 * m / N
+        return (LogBin._logbin_array(table, n, i) + i * numpy.log(p) +
+                (n - i) * numpy.log(1.0 - p))
+
+    def p_values(self, k, N, m, n):
+        """ Vectorized :func:`p_value`. All arguments can be (broadcastable)
+        integer arrays; return an array of probabilities that k or more
+        tests are positive.
+        """
+        k, N, m, n = numpy.broadcast_arrays(*[numpy.asarray(a, dtype=int)
+                                              for a in (k, N, m, n)])
+        res = numpy.empty(k.shape, dtype=float)
+        # degenerate distributions (p == 0 or p == 1)
+        zero, one = (m == 0), (m == N)
+        res[zero] = (k[zero] <= 0)
+        res[one] = (k[one] <= n[one])
+        rest = ~(zero | one)
+        res[rest] = self._p_values(
+            k[rest], N[rest], m[rest], n[rest],
+            lower_tail=lambda k, N, m, n: (numpy.zeros_like(k),
+                                           numpy.minimum(k - 1, n)),
+            upper_tail=lambda k, N, m, n: (numpy.maximum(k, 0), n))
+        return res
+
 class Hypergeometric(LogBin):
     """ `Hypergeometric distribution
     <http://en.wikipedia.org/wiki/Hypergeometric_distribution>`_ is
@@ -144,14 +261,130 @@ class Hypergeometric(LogBin):
             else:
                 return value
 
-## to speed-up FDR, calculate ahead sum([1/i for i in range(1, m+1)]), for m in [1,100000]. For higher values of m use an approximation, with error less or equal to 4.99999157277e-006. (sum([1/i for i in range(1, m+1)])  ~ log(m) + 0.5772..., 0.5572 is an Euler-Mascheroni constant) 
-c = [1.0]
-for m in range(2, 100000):
-    c.append( c[-1] + 1.0/m)
+    @staticmethod
+    def _log_pmf(table, i, N, m, n):
+        return (LogBin._logbin_array(table, m, i) +
+                LogBin._logbin_array(table, N - m, n - i) -
+                LogBin._logbin_array(table, N, n))
+
+    def p_values(self, k, N, m, n):
+        """ Vectorized :func:`p_value`. All arguments can be (broadcastable)
+        integer arrays; return an array of probabilities that k or more
+        tests are positive.
+        """
+        def support(N, m, n):
+            return numpy.maximum(0, n + m - N), numpy.minimum(n, m)
+
+        def lower_tail(k, N, m, n):
+            lo, hi = support(N, m, n)
+            return lo, numpy.minimum(k - 1, hi)
+
+        def upper_tail(k, N, m, n):
+            lo, hi = support(N, m, n)
+            return numpy.maximum(k, lo), hi
+
+        return self._p_values(k, N, m, n, lower_tail, upper_tail)
+
+## to speed-up FDR, sum([1/i for i in range(1, m+1)]) is tabulated (on first use) for m in [1,100000). For higher values of m use an approximation, with error less or equal to 4.99999157277e-006. (sum([1/i for i in range(1, m+1)])  ~ log(m) + 0.5772..., 0.5572 is an Euler-Mascheroni constant)
+_HARMONIC_MAX = 99999
+_harmonic_table = None
+_EULER = 0.57721566490153286060651209008240243104215933593992
+
+
+def _harmonic(m):
+    """Return the m-th harmonic number."""
+    global _harmonic_table
+    if m > _HARMONIC_MAX:
+        return math.log(m) + _EULER
+    if _harmonic_table is None:
+        _harmonic_table = numpy.cumsum(
+            1.0 / numpy.arange(1, _HARMONIC_MAX + 1, dtype=float))
+    return float(_harmonic_table[m - 1])
+
 
 def is_sorted(l):
     return all(l[i] <= l[i+1] for i in range(len(l)-1))
 
+
+def fdr(p_values, dependent=False, m=None):
+    """
+    Benjamini-Hochberg `False Discovery Rate
+    <http://en.wikipedia.org/wiki/False_discovery_rate>`_ correction on
+    an array of p-values (Benjamini-Yekutieli if `dependent` is True).
+
+    :param p_values: an array of p-values.
+    :param dependent: use correction for dependent hypotheses (default False).
+    :param m: number of hypotheses tested (default ``p_values.size``).
+    :return: an array of adjusted p-values (in the same order and shape).
+    """
+    p_values = numpy.asarray(p_values, dtype=float)
+    if not m:
+        m = p_values.size
+    if m <= 0 or not p_values.size:
+        return numpy.zeros(p_values.shape)
+
+    if dependent: # correct q for dependent tests
+        m = m * _harmonic(m)
+
+    order = numpy.argsort(p_values, axis=None, kind="mergesort")
+    fdrs = p_values.ravel()[order] * m
+    fdrs /= numpy.arange(1, fdrs.size + 1, dtype=float)
+    # cumulative minimum from the largest p-value down
+    fdrs = numpy.minimum.accumulate(fdrs[::-1])[::-1]
+    result = numpy.empty(fdrs.size)
+    result[order] = fdrs
+    return result.reshape(p_values.shape)
+
+
+def bonferroni(p_values, m=None):
+    """
+    `Bonferroni correction <http://en.wikipedia.org/wiki/Bonferroni_correction>`_
+    on an array of p-values.
+
+    :param p_values: an array of p-values.
+    :param m: number of hypotheses tested (default ``p_values.size``).
+    :return: an array of adjusted p-values (``min(p * m, 1)``).
+
+    .. note:: Unlike :func:`Bonferroni`, which divides the p-values
+        (a corrected significance level), this returns the adjusted
+        p-values.
+    """
+    p_values = numpy.asarray(p_values, dtype=float)
+    if not m:
+        m = p_values.size
+    return numpy.minimum(p_values * m, 1.0)
+
+
+def estimate_pi0(p_values, lambda_=0.5):
+    """
+    Estimate the proportion of true null hypotheses from an array of
+    p-values (Storey and Tibshirani, 2003) as the fraction of p-values
+    above `lambda_`, relative to the expected fraction ``1 - lambda_``.
+    """
+    p_values = numpy.asarray(p_values, dtype=float)
+    if not p_values.size:
+        return 1.0
+    pi0 = numpy.count_nonzero(p_values > lambda_) / \
+        (p_values.size * (1.0 - lambda_))
+    return float(min(pi0, 1.0))
+
+
+def q_values(p_values, pi0=1.0):
+    """
+    Storey q-values for an array of p-values.
+
+    :param p_values: an array of p-values.
+    :param pi0:
+        The proportion of true null hypotheses. If `None` it is estimated
+        with :func:`estimate_pi0`. With the default (1) the q-values equal
+        the Benjamini-Hochberg adjusted p-values (see :func:`fdr`).
+    :return: an array of q-values (in the same order and shape).
+    """
+    if pi0 is None:
+        pi0 = estimate_pi0(p_values)
+    return pi0 * fdr(p_values)
+
+
 def FDR(p_values, dependent=False, m=None, ordered=False):
     """
     `False Discovery Rate <http://en.wikipedia.org/wiki/False_discovery_rate>`_ correction on a list of p-values.
@@ -159,42 +392,15 @@ def FDR(p_values, dependent=False, m=None, ordered=False):
     :param p_values: a list of p-values.
     :param dependent: use correction for dependent hypotheses (default False).
     :param m: number of hypotheses tested (default ``len(p_values)``).
-    :param ordered: prevent sorting of p-values if they are already sorted (default False).
-    """
-
-    if not ordered:
-        ordered = is_sorted(p_values)
-
-    if not ordered:
-        joined = [ (v,i) for i,v in enumerate(p_values) ]
-        joined.sort()
-        p_values = [ p[0] for p in joined ]
-        indices = [ p[1] for p in joined ]
+    :param ordered: the p-values are already sorted (unused, kept for compatibility).
 
+    .. seealso:: :func:`fdr` for the array version
+    """
     if not m:
         m = len(p_values)
-    if m <= 0 or not p_values:
+    if m <= 0 or not len(p_values):
         return []
-
-    if dependent: # correct q for dependent tests
-        k = c[m-1] if m <= len(c) else math.log(m) + 0.57721566490153286060651209008240243104215933593992
-        m = m * k
-
-    tmp_fdrs = [p*m/(i+1.0) for (i, p) in enumerate(p_values)]
-    fdrs = []
-    cmin = tmp_fdrs[-1]
-    for f in reversed(tmp_fdrs):
-        cmin = min(f, cmin)
-        fdrs.append( cmin)
-    fdrs.reverse()
-
-    if not ordered:
-        new = [ None ] * len(fdrs)
-        for v,i in zip(fdrs, indices):
-            new[i] = v
-        fdrs = new
-
-    return fdrs
+    return fdr(p_values, dependent, m).tolist()
 
 def Bonferroni(p_values, m=None):
     """
@@ -311,6 +311,9 @@ class OWGsea(OWWidget):
         
         self.data = None
         self.geneSets = {}
+        #compiled gene set membership of the last computation
+        self.membershipKey = None
+        self.membership = None
 
         self.tabs = OWGUI.tabWidget(self.controlArea)
 
@@ -642,10 +645,19 @@ class OWGsea(OWWidget):
 
             gso = obiGsea.GSEA(self.data, matcher=genematcher, **dkwargs)
 
-            
-            for gs in self.geneSets:
-                gso.addGenesets([gs])
-                qApp.processEvents()
+            #reuse matched gene sets if the data genes did not change
+            #(and neither did the gene sets, e.g. an updated collection)
+            membershipKey = (organism, frozenset(self.geneSets))
+            try:
+                if membershipKey != self.membershipKey:
+                    raise ValueError("Different gene sets")
+                gso.setMembership(self.membership)
+            except ValueError:
+                for gs in self.geneSets:
+                    gso.addGenesets([gs])
+                    qApp.processEvents()
+                self.membershipKey = membershipKey
+                self.membership = gso.membership()
 
             self.res = gso.compute(n=self.perms, callback=pb.advance, **kwargs)
             
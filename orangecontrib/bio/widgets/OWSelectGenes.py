@@ -466,7 +466,7 @@ class OWSelectGenes(OWWidget):
 
         def ncbi_gene_info(taxid=self.taxid):
             try:
-                return (taxid, geneinfo.NCBIGeneInfo(taxid))
+                return (taxid, geneinfo.NCBIGeneInfo(taxid, indexed=True))
             except BaseException:
                 sys.excepthook(*sys.exc_info())
                 raise
@@ -115,7 +115,7 @@ class Link(object):
 
 @lru_cache(maxsize=2)
 def get_ncbi_info(taxid):
-    return gene.NCBIGeneInfo(taxid)
+    return gene.NCBIGeneInfo(taxid, indexed=True)
 
 
 def ncbi_info(taxid, genes, advance=None):
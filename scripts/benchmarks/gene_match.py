@@ -0,0 +1,77 @@
+"""
+Benchmark gene matching (`gene.Matcher.match` and `match_many`) against
+the previous implementation, which collected matches from the sets of
+aliases of each input gene.
+
+Usage::
+
+    python gene_match.py [organism [genes]]
+
+Defaults to human (9606) and 20000 genes. The gene names (and targets)
+are sampled from the aliases of the NCBI matcher. Matchers are built
+(and their aliases downloaded) before timing.
+
+"""
+from __future__ import print_function
+
+import sys
+import time
+import random
+from functools import reduce
+
+from orangecontrib.bio import gene
+
+
+def legacy_match(match, name):
+    if isinstance(match, gene.MatchSequence):
+        for m in match.ms:
+            mat = legacy_match(m, name)
+            if mat:
+                return mat
+        return []
+    inputgeneids = match.parent.to_ids(name)
+    return list(set(
+        reduce(lambda x, y: x + y,
+               [match.to_targets[igid] for igid in inputgeneids], [])))
+
+
+def timed(func, *args):
+    start = time.time()
+    result = func(*args)
+    return time.time() - start, result
+
+
+def main(argv):
+    organism = argv[1] if len(argv) > 1 else "9606"
+    ngenes = int(argv[2]) if len(argv) > 2 else 20000
+
+    matchers = [
+        ("GMNCBI", gene.GMNCBI(organism)),
+        ("GMGO", gene.GMGO(organism)),
+        ("joined", gene.matcher([[gene.GMNCBI(organism),
+                                  gene.GMGO(organism)]])),
+    ]
+
+    rand = random.Random(0)
+    names = sorted(set(a for aliases in matchers[0][1].aliases
+                       for a in aliases))
+    targets = rand.sample(names, min(ngenes, len(names)))
+    genes = rand.sample(names, min(ngenes, len(names)))
+
+    for name, matcher in matchers:
+        t_targets, match = timed(matcher.set_targets, targets)
+        t_legacy, legacy = timed(
+            lambda: [legacy_match(match, g) for g in genes])
+        t_match, single = timed(lambda: [match.match(g) for g in genes])
+        t_many, many = timed(match.match_many, genes)
+        assert [set(m) for m in legacy] == [set(m) for m in many], \
+            "results differ"
+        assert single == many, "results differ"
+        print("%s: %i genes, set_targets %.3f s, legacy %.3f s, "
+              "match %.3f s, match_many %.3f s (%.0fx)"
+              % (name, len(genes), t_targets, t_legacy, t_match, t_many,
+                 t_legacy / t_many))
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,91 @@
+"""
+Benchmark `go.Ontology.parse_file` against the previous (read all, split
+stanzas with a regex, parse each stanza) implementation.
+
+Usage::
+
+    python go_obo_parse.py [path to gene_ontology_edit.obo(.tar.gz)]
+
+By default the GO ontology tarball from the server files is used
+(downloading it if necessary).
+
+"""
+from __future__ import print_function
+
+import sys
+import re
+import time
+import tarfile
+import gc
+
+import six
+
+from orangecontrib.bio import go
+from orangecontrib.bio.utils import serverfiles
+
+
+def legacy_parse(filename):
+    ontology = go.Ontology.__new__(go.Ontology)
+    ontology.terms, ontology.typedefs, ontology.instances = {}, {}, {}
+    if tarfile.is_tarfile(filename):
+        f = tarfile.open(filename).extractfile("gene_ontology_edit.obo")
+    else:
+        f = open(filename, "rb")
+    data = f.readlines()
+    if six.PY3:
+        data = [line.decode("utf-8") for line in data]
+    data = "".join([line for line in data if not line.startswith("!")])
+    ontology.header = data[: data.index("[Term]")]
+    data = re.findall("\[.+?\].*?\n\n", data, re.DOTALL)
+    for block in go.builtinOBOObjects + data:
+        if block.startswith("[Term]"):
+            term = go.Term(block, ontology)
+            ontology.terms[term.id] = term
+        elif block.startswith("[Typedef]"):
+            typedef = go.Typedef(block, ontology)
+            ontology.typedefs[typedef.id] = typedef
+        elif block.startswith("[Instance]"):
+            instance = go.Instance(block, ontology)
+            ontology.instances[instance.id] = instance
+    for id, term in ontology.terms.items():
+        for typeId, parent in term.related:
+            ontology.terms[parent].related_to.add((typeId, id))
+    return ontology
+
+
+def streaming_parse(filename):
+    ontology = go.Ontology.__new__(go.Ontology)
+    ontology.terms, ontology.typedefs, ontology.instances = {}, {}, {}
+    ontology.parse_file(filename)
+    return ontology
+
+
+def bench(func, filename, repeat=3):
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.time()
+        result = func(filename)
+        times.append(time.time() - start)
+    return min(times), result
+
+
+def main(argv):
+    if len(argv) > 1:
+        filename = argv[1]
+    else:
+        filename = serverfiles.localpath_download(
+            "GO", "gene_ontology_edit.obo.tar.gz")
+
+    t_legacy, legacy = bench(legacy_parse, filename)
+    t_stream, stream = bench(streaming_parse, filename)
+    assert set(legacy.terms) == set(stream.terms)
+
+    print("%i terms in %s" % (len(stream.terms), filename))
+    print("legacy parser:    %.3f s" % t_legacy)
+    print("streaming parser: %.3f s (%.1fx)" % (t_stream,
+                                                t_legacy / t_stream))
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,105 @@
+"""
+Benchmark `gsea.gseaSignificance` (normalization, p-values and FDR of
+enrichment scores) against the previous list based implementation.
+
+Usage::
+
+    python gsea_significance.py [sets [permutations [legacy sets]]]
+
+Defaults to 5000 gene sets and 1000 permutations. The previous
+implementation is quadratic in the number of permutations, so it is only
+run (and compared) on the first 20 gene sets.
+
+"""
+from __future__ import print_function
+
+import sys
+import time
+
+import numpy
+
+from orangecontrib.bio import gsea
+
+
+def legacy_significance(enrichmentScores, enrichmentNulls):
+    mean = lambda l: float(sum(l)) / len(l)
+
+    enrichmentPVals = []
+    nEnrichmentScores = []
+    nEnrichmentNulls = []
+    for es, enrNull in zip(enrichmentScores, enrichmentNulls):
+        enrichmentPVals.append(gsea.gseapval(es, enrNull))
+
+        def normalize(s):
+            try:
+                if s == 0:
+                    return 0.0
+                if s >= 0:
+                    return s / mean([a for a in enrNull if a >= 0])
+                else:
+                    return -s / mean([a for a in enrNull if a < 0])
+            except:
+                return 0.0
+
+        nEnrichmentScores.append(normalize(es))
+        nEnrichmentNulls.append([normalize(s) for s in enrNull])
+
+    vals = sum(nEnrichmentNulls, [])
+    nvals = numpy.array(sorted(vals))
+    nnes = numpy.array(sorted(nEnrichmentScores))
+
+    fdrs = []
+    for nes in nEnrichmentScores:
+        if nes >= 0:
+            allPos = int(len(vals) - numpy.searchsorted(nvals, 0, side="left"))
+            allHigherAndPos = int(len(vals) - numpy.searchsorted(nvals, nes, side="left"))
+            nesPos = len(nnes) - int(numpy.searchsorted(nnes, 0, side="left"))
+            nesHigherAndPos = len(nnes) - int(numpy.searchsorted(nnes, nes, side="left"))
+        else:
+            allPos = int(numpy.searchsorted(nvals, 0, side="left"))
+            allHigherAndPos = int(numpy.searchsorted(nvals, nes, side="right"))
+            nesPos = int(numpy.searchsorted(nnes, 0, side="left"))
+            nesHigherAndPos = int(numpy.searchsorted(nnes, nes, side="right"))
+        try:
+            top = allHigherAndPos / float(allPos)
+            down = nesHigherAndPos / float(nesPos)
+            fdrs.append(top / down)
+        except:
+            fdrs.append(1000000000.0)
+
+    return list(zip(enrichmentScores, nEnrichmentScores, enrichmentPVals,
+                    fdrs))
+
+
+def random_scores(nsets, nperm, seed=0):
+    rstate = numpy.random.RandomState(seed)
+    es = rstate.normal(0, 0.4, size=nsets)
+    nulls = rstate.normal(0, 0.3, size=(nsets, nperm))
+    return es.tolist(), nulls.tolist()
+
+
+def timed(func, *args):
+    start = time.time()
+    result = func(*args)
+    return time.time() - start, result
+
+
+def main(argv):
+    nsets = int(argv[1]) if len(argv) > 1 else 5000
+    nperm = int(argv[2]) if len(argv) > 2 else 1000
+    nlegacy = int(argv[3]) if len(argv) > 3 else 20
+
+    es, nulls = random_scores(nsets, nperm)
+    t_new, _ = timed(gsea.gseaSignificance, es, nulls)
+    print("%i sets x %i permutations: %.3f s" % (nsets, nperm, t_new))
+
+    es, nulls = es[:nlegacy], nulls[:nlegacy]
+    t_legacy, legacy = timed(legacy_significance, es, nulls)
+    t_new, new = timed(gsea.gseaSignificance, es, nulls)
+    assert legacy == new, "results differ"
+    print("%i sets x %i permutations: legacy %.3f s, new %.3f s (%.0fx)"
+          % (nlegacy, nperm, t_legacy, t_new, t_legacy / t_new))
+
+
+if __name__ == "__main__":
+    main(sys.argv)
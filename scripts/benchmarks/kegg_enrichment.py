@@ -0,0 +1,97 @@
+"""
+Benchmark `kegg.Organism.get_enriched_pathways` against the previous
+implementation, which looked up the pathways of each query gene and the
+genes of each hit pathway one at a time and computed the p-values one
+pathway at a time.
+
+Usage::
+
+    python kegg_enrichment.py [genes [pathways]]
+
+Defaults to a reference of 20000 genes in 300 pathways and a 2000 gene
+query. The link table is synthetic and served from memory, so the
+timings exclude KEGG requests (the previous implementation made one
+cached request per query gene and per hit pathway).
+
+"""
+from __future__ import print_function
+
+import sys
+import time
+import random
+from collections import defaultdict
+
+from orangecontrib.bio import kegg
+from orangecontrib.bio.utils import stats
+
+
+class Api(object):
+    def __init__(self, links):
+        self.links = links
+
+    def get_genes_pathway_organism(self, org):
+        return self.links
+
+
+def legacy_enriched_pathways(links, genes, reference, prob):
+    gene_pathways = defaultdict(list)
+    pathway_genes = defaultdict(list)
+    for gene, pid in links:
+        gene_pathways[gene].append(pid)
+        pathway_genes[pid].append(gene)
+
+    reference = set(reference)
+    all_pathways = defaultdict(lambda: [[], 1.0, []])
+    pathways_for_gene = [list(gene_pathways.get(gene, [])) for gene in genes]
+    for gene, pathways in zip(genes, pathways_for_gene):
+        for pid in pathways:
+            if pathway_genes[pid]:
+                all_pathways[pid][0].append(gene)
+
+    for pid, entry in all_pathways.items():
+        entry[2].extend(reference.intersection(pathway_genes[pid]))
+        entry[1] = prob.p_value(len(entry[0]), len(reference),
+                                len(entry[2]), len(genes))
+    return dict((pid, (genes, p, len(ref)))
+                for pid, (genes, p, ref) in all_pathways.items())
+
+
+def timed(func, *args):
+    start = time.time()
+    result = func(*args)
+    return time.time() - start, result
+
+
+def main(argv):
+    ngenes = int(argv[1]) if len(argv) > 1 else 20000
+    npathways = int(argv[2]) if len(argv) > 2 else 300
+
+    rand = random.Random(0)
+    reference = ["bench:%i" % i for i in range(ngenes)]
+    links = sorted(set(
+        (gene, "path:bench%05i" % rand.randrange(npathways))
+        for gene in reference for _ in range(rand.randrange(4))))
+    genes = rand.sample(reference, ngenes // 10)
+
+    prob = stats.Hypergeometric()
+    organism = kegg.Organism.__new__(kegg.Organism)
+    organism.org_code = "bench"
+    organism.api = Api(links)
+
+    t_legacy, legacy = timed(legacy_enriched_pathways, links, genes,
+                             reference, prob)
+    t_index, _ = timed(organism._pathway_index)
+    t_new, new = timed(organism.get_enriched_pathways, genes, reference,
+                       prob)
+    assert sorted(legacy) == sorted(new), "results differ"
+    for pid in legacy:
+        assert legacy[pid][0] == new[pid][0], "results differ"
+        assert legacy[pid][2] == new[pid][2], "results differ"
+        assert abs(legacy[pid][1] - new[pid][1]) < 1e-9, "results differ"
+    print("%i genes, %i links, %i query genes: legacy %.3f s, "
+          "index %.3f s, get_enriched_pathways %.3f s"
+          % (ngenes, len(links), len(genes), t_legacy, t_index, t_new))
+
+
+if __name__ == "__main__":
+    main(sys.argv)
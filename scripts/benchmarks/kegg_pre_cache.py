@@ -0,0 +1,154 @@
+"""
+Benchmark cold and warm `kegg.Genes.pre_cache` with the sqlite cache
+store against the previous store (a connection per store, a commit per
+stored entry), and serial against concurrent requests.
+
+Usage::
+
+    python kegg_pre_cache.py [genes [latency]]
+
+Defaults to 20000 genes and 0.05 s latency per request. Requests are
+served by a local HTTP stand-in for the KEGG REST API, and the cache is
+kept in a temporary directory.
+
+"""
+from __future__ import print_function
+
+import os
+import sys
+import time
+import shutil
+import sqlite3
+import tempfile
+import threading
+
+import six
+from six.moves import BaseHTTPServer, socketserver
+
+from orangecontrib.bio.kegg import api, caching, conf, service
+from orangecontrib.bio.kegg.databases import Genes
+
+ORGANISM = "bench"
+
+
+class LegacySqlite3Store(caching.Store, caching.DictMixin):
+    def __init__(self, filename):
+        caching.Store.__init__(self)
+        self.con = sqlite3.connect(filename)
+        self.con.execute("CREATE TABLE IF NOT EXISTS cache "
+                         "(key TEXT UNIQUE, value TEXT)")
+        self.con.execute("CREATE INDEX IF NOT EXISTS cache_index "
+                         "ON cache (key)")
+        self.con.commit()
+
+    def __getitem__(self, key):
+        r = self.con.execute("SELECT value FROM cache WHERE key=?",
+                             (key,)).fetchall()
+        if not r:
+            raise KeyError(key)
+        pickle_str = r[0][0]
+        if not six.PY3:
+            pickle_str = str(pickle_str)
+        return caching.pickle.loads(pickle_str)
+
+    def __setitem__(self, key, value):
+        self.con.execute("INSERT OR REPLACE INTO cache VALUES (?, ?)",
+                         (key, caching.pickle.dumps(value)))
+        self.con.commit()
+
+    def __delitem__(self, key):
+        self.con.execute("DELETE FROM cache WHERE key=?", (key,))
+        self.con.commit()
+
+    def close(self):
+        pass
+
+    def __len__(self):
+        return None
+
+    def __iter__(self):
+        return None
+
+
+class LegacyCachedKeggApi(api.CachedKeggApi):
+    def cache_store(self):
+        return LegacySqlite3Store(
+            os.path.join(conf.params["cache.path"], "legacy_cache.sqlite3"))
+
+
+class Server(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+
+def make_handler(ngenes, latency):
+    genes = ["%s:g%i" % (ORGANISM, i) for i in range(ngenes)]
+
+    class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+        def do_GET(self):
+            parts = self.path.strip("/").split("/")
+            if parts[0] == "list":
+                body = "".join("%s\tgene %s\n" % (g, g) for g in genes)
+            elif parts[0] == "get":
+                time.sleep(latency)
+                body = "".join(
+                    "ENTRY       %s            CDS       T00000\n"
+                    "NAME        %s\n///\n" % (g.split(":")[1], g)
+                    for g in parts[1].split("+"))
+            else:
+                self.send_error(404)
+                return
+            body = body.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def timed(func, *args):
+    start = time.time()
+    result = func(*args)
+    return time.time() - start, result
+
+
+def main(argv):
+    ngenes = int(argv[1]) if len(argv) > 1 else 20000
+    latency = float(argv[2]) if len(argv) > 2 else 0.05
+
+    server = Server(("127.0.0.1", 0), make_handler(ngenes, latency))
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+
+    cache_path = tempfile.mkdtemp()
+    service.REST_API = "http://127.0.0.1:%i/" % server.server_address[1]
+    if hasattr(service.slumber_service, "_cached"):
+        del service.slumber_service._cached
+
+    try:
+        for name, api_class, concurrency in [
+                ("legacy store, serial", LegacyCachedKeggApi, "1"),
+                ("serial", api.CachedKeggApi, "1"),
+                ("concurrent", api.CachedKeggApi,
+                 conf.params["service.concurrency"])]:
+            conf.params["cache.path"] = tempfile.mkdtemp(dir=cache_path)
+            conf.params["service.concurrency"] = concurrency
+            genes = Genes(ORGANISM)
+            genes.api = api_class()
+            genes._keys = genes.api.get_genes_by_organism(ORGANISM)
+            t_cold, _ = timed(genes.pre_cache)
+            t_warm, _ = timed(genes.pre_cache)
+            print("%s: %i genes, cold %.3f s, warm %.3f s"
+                  % (name, len(genes._keys), t_cold, t_warm))
+    finally:
+        server.shutdown()
+        shutil.rmtree(cache_path)
+
+
+if __name__ == "__main__":
+    main(sys.argv)